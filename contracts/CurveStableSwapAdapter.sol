@@ -0,0 +1,73 @@
+// SPDX-License-Identifier: GPL-3.0
+
+pragma solidity ^0.7.0;
+
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/IERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/SafeERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/math/SafeMath.sol";
+import "../interfaces/ISwapAdapter.sol";
+import "../interfaces/ICurvePool.sol";
+
+/// @title Curve Stable Swap Adapter
+/// @notice lets HomoraIBSwap quote and swap between the coins of a Curve-style
+/// stable-swap pool, such as 3pool for DAI, USDC and USDT
+contract CurveStableSwapAdapter is ISwapAdapter {
+    using SafeERC20 for IERC20;
+    using SafeMath for uint256;
+
+    ICurvePool public immutable pool;
+
+    /// @dev one plus the index of each coin in the pool, 0 for other tokens
+    mapping(address => uint256) public coinIndex;
+
+    constructor(ICurvePool _pool, uint256 nCoins) public {
+        pool = _pool;
+        for (uint256 idx = 0; idx < nCoins; idx++) {
+            coinIndex[_pool.coins(idx)] = idx + 1;
+        }
+    }
+
+    /// @notice quote `amountIn` of tokenIn to tokenOut with the pool's get_dy,
+    /// or 0 if either token is not in the pool
+    function getAmountOut(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn
+    ) external view override returns (uint256) {
+        uint256 idxIn = coinIndex[tokenIn];
+        uint256 idxOut = coinIndex[tokenOut];
+        if (idxIn == 0 || idxOut == 0 || idxIn == idxOut) {
+            return 0;
+        }
+        return pool.get_dy(int128(idxIn - 1), int128(idxOut - 1), amountIn);
+    }
+
+    /// @notice swap `amountIn` of tokenIn, already sent to this adapter, to
+    /// tokenOut for `to`
+    function swap(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn,
+        uint256 amountOutMin,
+        address to
+    ) external override returns (uint256 amountOut) {
+        uint256 idxIn = coinIndex[tokenIn];
+        uint256 idxOut = coinIndex[tokenOut];
+        require(idxIn != 0 && idxOut != 0, "pair-not-in-pool");
+        // the pool spends the whole allowance, leaving it at 0 as safeApprove
+        // requires
+        IERC20(tokenIn).safeApprove(address(pool), amountIn);
+        // exchange returns nothing on older pools, so measure the output
+        uint256 balanceBefore = IERC20(tokenOut).balanceOf(address(this));
+        pool.exchange(
+            int128(idxIn - 1),
+            int128(idxOut - 1),
+            amountIn,
+            amountOutMin
+        );
+        amountOut = IERC20(tokenOut).balanceOf(address(this)).sub(
+            balanceBefore
+        );
+        IERC20(tokenOut).safeTransfer(to, amountOut);
+    }
+}
@@ -1,6 +1,7 @@
 // SPDX-License-Identifier: GPL-3.0
 
 pragma solidity ^0.7.0;
+pragma experimental ABIEncoderV2;
 
 import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/IERC20.sol";
 import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/SafeERC20.sol";
@@ -11,6 +12,7 @@ import "../interfaces/ISafeBox.sol";
 import "../interfaces/ISafeBoxETH.sol";
 import "../interfaces/ICErc20.sol";
 import "../interfaces/ICyToken.sol";
+import "../interfaces/ISwapAdapter.sol";
 
 /// @title Homora IBToken Swap
 /// @author Sawit Trisirisatayawong (@tansawit)
@@ -18,7 +20,32 @@ contract HomoraIBSwap is Governable {
     using SafeERC20 for IERC20;
     using SafeMath for uint256;
 
-    mapping(address => bool) public isIBToken;
+    struct IBTokenInfo {
+        address uToken; // underlying token, WETH for ibETH
+        bool isETH; // whether the SafeBox takes and returns native ETH
+        bool supported; // whether the ibToken has been registered
+        address cToken; // the cyToken backing the SafeBox
+    }
+
+    struct SwapLeg {
+        address tokenIn;
+        address tokenOut;
+        uint256 amountIn;
+        uint256 amountOutMin;
+    }
+
+    struct SplitRoute {
+        address router;
+        address[] path;
+        uint256 weight;
+    }
+
+    mapping(address => IBTokenInfo) public ibTokenInfo;
+
+    address[] public ibTokens;
+
+    /// @dev the supported ibToken of each underlying token, ibETH for WETH
+    mapping(address => address) public ibTokenOf;
 
     address public immutable IBETHV2;
 
@@ -26,12 +53,76 @@ contract HomoraIBSwap is Governable {
 
     address public immutable WETH;
 
+    address[] public routers;
+
+    mapping(address => bool) public isRouter;
+
+    /// @dev adapters quoting and swapping ERC20 underlyings on venues other
+    /// than UniswapV2-compatible routers
+    address[] public adapters;
+
+    mapping(address => bool) public isAdapter;
+
+    mapping(address => mapping(address => address[])) internal customPaths;
+
+    event RouterAdded(address indexed router);
+
+    event RouterRemoved(address indexed router);
+
+    event AdapterAdded(address indexed adapter);
+
+    event AdapterRemoved(address indexed adapter);
+
+    event PathSet(
+        address indexed tokenIn,
+        address indexed tokenOut,
+        address[] path
+    );
+
+    event RouteSelected(
+        address indexed router,
+        address[] path,
+        uint256 amountIn,
+        uint256 amountOut
+    );
+
+    event Swapped(
+        address indexed sender,
+        address indexed tokenIn,
+        address indexed tokenOut,
+        uint256 amountIn,
+        uint256 underlyingIn,
+        uint256 underlyingOut,
+        uint256 amountOut
+    );
+
     constructor(address _uniswapRouterAddress, address _ibETHAddress) public {
         __Governable__init();
         uniswapRouter = IUniswapV2Router02(_uniswapRouterAddress);
         IBETHV2 = _ibETHAddress;
-        isIBToken[_ibETHAddress] = true;
-        WETH = IUniswapV2Router02(_uniswapRouterAddress).WETH();
+        address weth = IUniswapV2Router02(_uniswapRouterAddress).WETH();
+        WETH = weth;
+        ibTokenInfo[_ibETHAddress] = IBTokenInfo({
+            uToken: weth,
+            isETH: true,
+            supported: true,
+            cToken: SafeBoxETH(_ibETHAddress).cToken()
+        });
+        ibTokens.push(_ibETHAddress);
+        ibTokenOf[weth] = _ibETHAddress;
+        routers.push(_uniswapRouterAddress);
+        isRouter[_uniswapRouterAddress] = true;
+    }
+
+    /// @notice check whether an ibToken is supported
+    /// @param token the address of the ibToken to check
+    function isIBToken(address token) external view returns (bool) {
+        return ibTokenInfo[token].supported;
+    }
+
+    /// @notice get the list of all supported ibTokens
+    function getIBTokens() external view returns (address[] memory) {
+        return ibTokens;
     }
 
     /// @notice add a list of token addresses as supported ibToken
@@ -39,56 +130,166 @@ contract HomoraIBSwap is Governable {
     function addIBTokens(address[] memory tokens) external onlyGov {
         for (uint256 idx = 0; idx < tokens.length; idx++) {
             require(
-                !isIBToken[tokens[idx]] && tokens[idx] != IBETHV2,
+                !ibTokenInfo[tokens[idx]].supported &&
+                    tokens[idx] != IBETHV2,
                 "token-is-ibeth-or-already-supported"
             );
-            isIBToken[tokens[idx]] = true;
 
             SafeBox safebox = SafeBox(tokens[idx]);
-            IERC20(safebox.uToken()).safeApprove(
-                address(uniswapRouter),
-                uint256(-1)
+            address uToken = safebox.uToken();
+            ibTokenInfo[tokens[idx]] = IBTokenInfo({
+                uToken: uToken,
+                isETH: false,
+                supported: true,
+                cToken: safebox.cToken()
+            });
+            ibTokens.push(tokens[idx]);
+            if (ibTokenOf[uToken] == address(0)) {
+                ibTokenOf[uToken] = tokens[idx];
+            }
+
+            for (
+                uint256 idxRouter = 0;
+                idxRouter < routers.length;
+                idxRouter++
+            ) {
+                IERC20(uToken).safeApprove(routers[idxRouter], uint256(-1));
+            }
+            IERC20(uToken).safeApprove(address(safebox), uint256(-1));
+        }
+    }
+
+    /// @notice get the list of all UniswapV2-compatible routers swaps can use
+    function getRouters() external view returns (address[] memory) {
+        return routers;
+    }
+
+    /// @notice add a UniswapV2-compatible router for swaps to choose from
+    /// @param router the address of the router to add
+    function addRouter(address router) external onlyGov {
+        require(!isRouter[router], "router-already-added");
+        require(
+            IUniswapV2Router02(router).WETH() == WETH,
+            "router-weth-mismatch"
+        );
+        routers.push(router);
+        isRouter[router] = true;
+        setRouterAllowance(router, uint256(-1));
+        emit RouterAdded(router);
+    }
+
+    /// @notice remove a router added through addRouter
+    /// @param router the address of the router to remove
+    function removeRouter(address router) external onlyGov {
+        require(isRouter[router], "router-not-added");
+        require(router != address(uniswapRouter), "router-is-default");
+        for (uint256 idx = 0; idx < routers.length; idx++) {
+            if (routers[idx] == router) {
+                routers[idx] = routers[routers.length - 1];
+                routers.pop();
+                break;
+            }
+        }
+        isRouter[router] = false;
+        setRouterAllowance(router, 0);
+        emit RouterRemoved(router);
+    }
+
+    /// @notice get the list of all swap adapters swaps can use
+    function getAdapters() external view returns (address[] memory) {
+        return adapters;
+    }
+
+    /// @notice add a swap adapter whose quotes swaps between ERC20 underlyings
+    /// compare against the routers'
+    /// @param adapter the address of the adapter to add
+    function addAdapter(address adapter) external onlyGov {
+        require(!isAdapter[adapter], "adapter-already-added");
+        adapters.push(adapter);
+        isAdapter[adapter] = true;
+        emit AdapterAdded(adapter);
+    }
+
+    /// @notice remove an adapter added through addAdapter
+    /// @param adapter the address of the adapter to remove
+    function removeAdapter(address adapter) external onlyGov {
+        require(isAdapter[adapter], "adapter-not-added");
+        for (uint256 idx = 0; idx < adapters.length; idx++) {
+            if (adapters[idx] == adapter) {
+                adapters[idx] = adapters[adapters.length - 1];
+                adapters.pop();
+                break;
+            }
+        }
+        isAdapter[adapter] = false;
+        emit AdapterRemoved(adapter);
+    }
+
+    /// @dev set the allowance of `router` on every supported ERC20 underlying
+    function setRouterAllowance(address router, uint256 amount) internal {
+        for (uint256 idx = 0; idx < ibTokens.length; idx++) {
+            IBTokenInfo storage info = ibTokenInfo[ibTokens[idx]];
+            if (!info.isETH) {
+                IERC20(info.uToken).safeApprove(router, amount);
+            }
+        }
+    }
+
+    /// @notice set the path of underlying tokens used to swap tokenIn to
+    /// tokenOut, replacing the default routing through WETH
+    /// @param tokenIn the address of the input ibToken
+    /// @param tokenOut the address of the output ibToken
+    /// @param path the underlying tokens to route through, starting with the
+    /// underlying of tokenIn and ending with that of tokenOut; an empty path
+    /// restores the default routing
+    function setPath(
+        address tokenIn,
+        address tokenOut,
+        address[] calldata path
+    ) external onlyGov {
+        require(tokenIn != tokenOut, "token-in-out-identical");
+        require(ibTokenInfo[tokenIn].supported, "token-in-not-supported");
+        require(ibTokenInfo[tokenOut].supported, "token-out-not-supported");
+        if (path.length > 0) {
+            require(path.length >= 2, "invalid-path-length");
+            require(
+                path[0] == ibTokenInfo[tokenIn].uToken,
+                "invalid-path-start"
+            );
+            require(
+                path[path.length - 1] == ibTokenInfo[tokenOut].uToken,
+                "invalid-path-end"
             );
-            IERC20(safebox.uToken()).safeApprove(address(safebox), uint256(-1));
         }
+        customPaths[tokenIn][tokenOut] = path;
+        emit PathSet(tokenIn, tokenOut, path);
     }
 
+    /// @notice get the path of underlying tokens used to swap tokenIn to
+    /// tokenOut: the path set by governance if any, otherwise through WETH
+    /// @param tokenIn the address of the input ibToken
+    /// @param tokenOut the address of the output ibToken
     function getPath(address tokenIn, address tokenOut)
-        internal
+        public
         view
         returns (address[] memory path)
     {
-        address underlyingTokenIn;
-        address underlyingTokenOut;
-
-        if (tokenIn == IBETHV2) {
-            underlyingTokenIn = uniswapRouter.WETH();
-        } else {
-            underlyingTokenIn = SafeBox(tokenIn).uToken();
+        path = customPaths[tokenIn][tokenOut];
+        if (path.length > 0) {
+            return path;
         }
 
-        if (tokenOut == IBETHV2) {
-            underlyingTokenOut = uniswapRouter.WETH();
-        } else {
-            underlyingTokenOut = SafeBox(tokenOut).uToken();
-        }
+        address underlyingTokenIn = ibTokenInfo[tokenIn].uToken;
+        address underlyingTokenOut = ibTokenInfo[tokenOut].uToken;
 
-        if (
-            underlyingTokenIn == uniswapRouter.WETH() ||
-            underlyingTokenOut == uniswapRouter.WETH()
-        ) {
+        if (underlyingTokenIn == WETH || underlyingTokenOut == WETH) {
             path = new address[](2);
-            if (underlyingTokenIn == uniswapRouter.WETH()) {
-                path[0] = uniswapRouter.WETH();
-                path[1] = underlyingTokenOut;
-            } else {
-                path[0] = underlyingTokenIn;
-                path[1] = uniswapRouter.WETH();
-            }
+            path[0] = underlyingTokenIn;
+            path[1] = underlyingTokenOut;
         } else {
             path = new address[](3);
             path[0] = underlyingTokenIn;
-            path[1] = uniswapRouter.WETH();
+            path[1] = WETH;
             path[2] = underlyingTokenOut;
         }
     }
@@ -103,8 +304,246 @@ contract HomoraIBSwap is Governable {
         address tokenOut,
         uint256 amountIn
     ) public view returns (uint256[] memory) {
-        return
-            uniswapRouter.getAmountsOut(amountIn, getPath(tokenIn, tokenOut));
+        (IUniswapV2Router02 router, uint256[] memory amounts) =
+            getBestAmountsOut(getPath(tokenIn, tokenOut), amountIn);
+        require(address(router) != address(0), "no-route");
+        return amounts;
+    }
+
+    /// @notice get the estimated input amount of each consecutive swap along
+    /// a path needed to receive an exact output amount
+    /// @param tokenIn the address of the input token
+    /// @param tokenOut the address of the output token
+    /// @param amountOut the desired amount of the underlying of tokenOut
+    function getEstimatedAmountsIn(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountOut
+    ) public view returns (uint256[] memory) {
+        (IUniswapV2Router02 router, uint256[] memory amounts) =
+            getBestAmountsIn(getPath(tokenIn, tokenOut), amountOut);
+        require(address(router) != address(0), "no-route");
+        return amounts;
+    }
+
+    /// @dev find the router giving the highest output for `amountIn` along
+    /// `path`, returning a zero router if none can quote it
+    function getBestAmountsOut(address[] memory path, uint256 amountIn)
+        internal
+        view
+        returns (IUniswapV2Router02 bestRouter, uint256[] memory bestAmounts)
+    {
+        uint256 bestAmountOut;
+        for (uint256 idx = 0; idx < routers.length; idx++) {
+            IUniswapV2Router02 router = IUniswapV2Router02(routers[idx]);
+            try router.getAmountsOut(amountIn, path) returns (
+                uint256[] memory amounts
+            ) {
+                if (amounts[amounts.length - 1] > bestAmountOut) {
+                    bestAmountOut = amounts[amounts.length - 1];
+                    bestRouter = router;
+                    bestAmounts = amounts;
+                }
+            } catch {}
+        }
+    }
+
+    /// @dev find the router needing the lowest input to receive `amountOut`
+    /// along `path`, returning a zero router if none can quote it
+    function getBestAmountsIn(address[] memory path, uint256 amountOut)
+        internal
+        view
+        returns (IUniswapV2Router02 bestRouter, uint256[] memory bestAmounts)
+    {
+        uint256 bestAmountIn = uint256(-1);
+        for (uint256 idx = 0; idx < routers.length; idx++) {
+            IUniswapV2Router02 router = IUniswapV2Router02(routers[idx]);
+            try router.getAmountsIn(amountOut, path) returns (
+                uint256[] memory amounts
+            ) {
+                if (amounts[0] < bestAmountIn) {
+                    bestAmountIn = amounts[0];
+                    bestRouter = router;
+                    bestAmounts = amounts;
+                }
+            } catch {}
+        }
+    }
+
+    /// @notice find the adapter giving the highest output for `amountIn` of the
+    /// underlying of tokenIn to the underlying of tokenOut
+    /// @dev adapter quotes may simulate swaps, so this is not a view; call it
+    /// with eth_call. pairs with an ETH side are not quoted
+    /// @param tokenIn the address of the input ibToken
+    /// @param tokenOut the address of the output ibToken
+    /// @param amountIn the amount of the underlying of tokenIn
+    /// @return bestAdapter the best adapter, or zero if none can quote the pair
+    /// @return bestAmountOut the amount of the underlying of tokenOut it quotes
+    function getBestAdapterAmountOut(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn
+    ) public returns (ISwapAdapter bestAdapter, uint256 bestAmountOut) {
+        IBTokenInfo storage infoIn = ibTokenInfo[tokenIn];
+        IBTokenInfo storage infoOut = ibTokenInfo[tokenOut];
+        if (infoIn.isETH || infoOut.isETH) {
+            return (bestAdapter, 0);
+        }
+        for (uint256 idx = 0; idx < adapters.length; idx++) {
+            ISwapAdapter adapter = ISwapAdapter(adapters[idx]);
+            try
+                adapter.getAmountOut(infoIn.uToken, infoOut.uToken, amountIn)
+            returns (uint256 amountOut) {
+                if (amountOut > bestAmountOut) {
+                    bestAmountOut = amountOut;
+                    bestAdapter = adapter;
+                }
+            } catch {}
+        }
+    }
+
+    /// @notice get the output of `router` along `path` for each of a list of
+    /// underlying input amounts, for example to quote the legs of a split swap
+    /// @param router the address of the router to quote
+    /// @param path the underlying tokens to route through
+    /// @param amountsIn the list of input amounts to quote
+    /// @return amountsOut the output for each entry of amountsIn, or 0 where
+    /// the router cannot quote it
+    function getRouteAmountsOut(
+        address router,
+        address[] calldata path,
+        uint256[] calldata amountsIn
+    ) external view returns (uint256[] memory amountsOut) {
+        amountsOut = new uint256[](amountsIn.length);
+        for (uint256 idx = 0; idx < amountsIn.length; idx++) {
+            try
+                IUniswapV2Router02(router).getAmountsOut(amountsIn[idx], path)
+            returns (uint256[] memory amounts) {
+                amountsOut[idx] = amounts[amounts.length - 1];
+            } catch {}
+        }
+    }
+
+    /// @notice get the estimated amount of tokenOut received for each amount
+    /// of tokenIn, converting through the exchange rates of both ibTokens
+    /// @dev quotes the routers only, so once adapters are added swap may return
+    /// more; getBestIBAmountOut also quotes the adapters
+    /// @param tokenIn the address of the input ibToken
+    /// @param tokenOut the address of the output ibToken
+    /// @param amountsIn the list of tokenIn amounts to quote
+    /// @return amountsOut the estimated tokenOut amount for each entry of
+    /// amountsIn, or 0 where the swap cannot be quoted
+    function getEstimatedIBAmountsOut(
+        address tokenIn,
+        address tokenOut,
+        uint256[] calldata amountsIn
+    ) external view returns (uint256[] memory amountsOut) {
+        require(tokenIn != tokenOut, "token-in-out-identical");
+        require(ibTokenInfo[tokenIn].supported, "token-in-not-supported");
+        require(ibTokenInfo[tokenOut].supported, "token-out-not-supported");
+
+        address[] memory path = getPath(tokenIn, tokenOut);
+        uint256 rateIn = exchangeRateStored(tokenIn);
+        uint256 rateOut = exchangeRateStored(tokenOut);
+        amountsOut = new uint256[](amountsIn.length);
+        for (uint256 idx = 0; idx < amountsIn.length; idx++) {
+            amountsOut[idx] = quoteIB(path, amountsIn[idx], rateIn, rateOut);
+        }
+    }
+
+    /// @notice get the estimated output of every pair of supported ibTokens
+    /// @dev quotes the routers only, like getEstimatedIBAmountsOut
+    /// @param amountsIn the amount of each ibToken to quote, in the order of
+    /// getIBTokens
+    /// @return amountsOut amountsOut[i][j] is the estimated amount of the j-th
+    /// ibToken received for amountsIn[i] of the i-th, or 0 where i == j or the
+    /// swap cannot be quoted
+    function getEstimatedIBAmountsOutMatrix(uint256[] calldata amountsIn)
+        external
+        view
+        returns (uint256[][] memory amountsOut)
+    {
+        uint256 count = ibTokens.length;
+        require(amountsIn.length == count, "amounts-length-mismatch");
+
+        uint256[] memory rates = new uint256[](count);
+        for (uint256 idx = 0; idx < count; idx++) {
+            rates[idx] = exchangeRateStored(ibTokens[idx]);
+        }
+
+        amountsOut = new uint256[][](count);
+        for (uint256 idxIn = 0; idxIn < count; idxIn++) {
+            amountsOut[idxIn] = new uint256[](count);
+            for (uint256 idxOut = 0; idxOut < count; idxOut++) {
+                if (idxIn != idxOut) {
+                    amountsOut[idxIn][idxOut] = quoteIB(
+                        getPath(ibTokens[idxIn], ibTokens[idxOut]),
+                        amountsIn[idxIn],
+                        rates[idxIn],
+                        rates[idxOut]
+                    );
+                }
+            }
+        }
+    }
+
+    /// @notice get the estimated amount of tokenOut swap returns for
+    /// `amountIn` of tokenIn, from the best of the routers and the adapters
+    /// @dev adapter quotes may simulate swaps, so this is not a view; call it
+    /// with eth_call
+    /// @param tokenIn the address of the input ibToken
+    /// @param tokenOut the address of the output ibToken
+    /// @param amountIn the amount of tokenIn to quote
+    /// @return the estimated amount of tokenOut, or 0 if the swap cannot be
+    /// quoted
+    function getBestIBAmountOut(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn
+    ) external returns (uint256) {
+        require(tokenIn != tokenOut, "token-in-out-identical");
+        require(ibTokenInfo[tokenIn].supported, "token-in-not-supported");
+        require(ibTokenInfo[tokenOut].supported, "token-out-not-supported");
+
+        uint256 underlyingIn =
+            amountIn.mul(exchangeRateStored(tokenIn)).div(1e18);
+        if (underlyingIn == 0) {
+            return 0;
+        }
+        uint256 underlyingOut;
+        (IUniswapV2Router02 router, uint256[] memory amounts) =
+            getBestAmountsOut(getPath(tokenIn, tokenOut), underlyingIn);
+        if (address(router) != address(0)) {
+            underlyingOut = amounts[amounts.length - 1];
+        }
+        if (adapters.length > 0) {
+            (, uint256 adapterAmountOut) =
+                getBestAdapterAmountOut(tokenIn, tokenOut, underlyingIn);
+            if (adapterAmountOut > underlyingOut) {
+                underlyingOut = adapterAmountOut;
+            }
+        }
+        return underlyingOut.mul(1e18).div(exchangeRateStored(tokenOut));
+    }
+
+    /// @dev quote `amountIn` of ibToken along `path`, returning 0 if the
+    /// router cannot quote it
+    function quoteIB(
+        address[] memory path,
+        uint256 amountIn,
+        uint256 rateIn,
+        uint256 rateOut
+    ) internal view returns (uint256) {
+        uint256 underlyingIn = amountIn.mul(rateIn).div(1e18);
+        if (underlyingIn == 0) {
+            return 0;
+        }
+        (IUniswapV2Router02 router, uint256[] memory amounts) =
+            getBestAmountsOut(path, underlyingIn);
+        if (address(router) == address(0)) {
+            return 0;
+        }
+        return amounts[amounts.length - 1].mul(1e18).div(rateOut);
     }
 
     /// @notice convert an amount of ibToken to that of the underlying token
@@ -115,7 +554,9 @@ contract HomoraIBSwap is Governable {
         view
         returns (uint256)
     {
-        CYToken cyToken = CYToken(SafeBox(ibToken).cToken());
+        address cToken = ibTokenInfo[ibToken].cToken;
+        require(cToken != address(0), "token-not-supported");
+        CYToken cyToken = CYToken(cToken);
         uint256 tokenAmount =
             ibTokenAmount.mul(cyToken.exchangeRateStored()).div(1e18);
         return tokenAmount;
@@ -129,7 +570,9 @@ contract HomoraIBSwap is Governable {
         view
         returns (uint256)
     {
-        CYToken cyToken = CYToken(SafeBox(ibToken).cToken());
+        address cToken = ibTokenInfo[ibToken].cToken;
+        require(cToken != address(0), "token-not-supported");
+        CYToken cyToken = CYToken(cToken);
         uint256 ibTokenAmount =
             tokenAmount.mul(1e18).div(cyToken.exchangeRateStored());
         return ibTokenAmount;
@@ -150,70 +593,757 @@ contract HomoraIBSwap is Governable {
         uint256 deadline
     ) external returns (uint256) {
         require(tokenIn != tokenOut, "token-in-out-identical");
-        require(isIBToken[tokenIn], "token-in-not-supported");
-        require(isIBToken[tokenOut], "token-out-not-supported");
+        require(ibTokenInfo[tokenIn].supported, "token-in-not-supported");
+        require(ibTokenInfo[tokenOut].supported, "token-out-not-supported");
 
-        SafeBox safeboxIn = SafeBox(tokenIn);
-        safeboxIn.transferFrom(msg.sender, address(this), amountIn);
-        safeboxIn.withdraw(amountIn);
+        uint256 underlyingIn = withdrawUnderlying(tokenIn, amountIn);
+        uint256 underlyingOut =
+            swapUnderlying(tokenIn, tokenOut, underlyingIn, deadline);
+        uint256 amountOut = depositUnderlying(tokenOut, underlyingOut);
+        require(amountOut >= amountOutMin, "insufficient-output-amount");
+        SafeBox(tokenOut).transfer(msg.sender, amountOut);
+        emit Swapped(
+            msg.sender,
+            tokenIn,
+            tokenOut,
+            amountIn,
+            underlyingIn,
+            underlyingOut,
+            amountOut
+        );
+        return amountOut;
+    }
 
-        uint256 underlyingBalance;
-        address[] memory path = getPath(tokenIn, tokenOut);
-        uint256 outputAmount;
+    /// @notice swap an ibToken for an exact amount of another ibToken
+    /// @param tokenIn the input ibToken
+    /// @param tokenOut the desired output ibToken
+    /// @param amountOut the amount of tokenOut to receive
+    /// @param amountInMax maximum amount of tokenIn that can be spent
+    /// for the transaction not to revert
+    /// @param deadline timestamp after which the transaction will revert
+    /// @return amountIn the amount of tokenIn spent
+    function swapForExactOut(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountOut,
+        uint256 amountInMax,
+        uint256 deadline
+    ) external returns (uint256 amountIn) {
+        require(tokenIn != tokenOut, "token-in-out-identical");
+        require(ibTokenInfo[tokenIn].supported, "token-in-not-supported");
+        require(ibTokenInfo[tokenOut].supported, "token-out-not-supported");
+
+        // deposit mints floor(underlying * 1e18 / rate), so round up
+        uint256 underlyingOut =
+            amountOut.mul(exchangeRateCurrent(tokenOut)).add(1e18 - 1).div(
+                1e18
+            );
+        IUniswapV2Router02 router;
+        {
+            address[] memory path = getPath(tokenIn, tokenOut);
+            uint256[] memory amounts;
+            (router, amounts) = getBestAmountsIn(path, underlyingOut);
+            require(address(router) != address(0), "no-route");
+            // withdraw redeems floor(amount * rate / 1e18), so round up
+            uint256 rateIn = exchangeRateCurrent(tokenIn);
+            amountIn = amounts[0].mul(1e18).add(rateIn - 1).div(rateIn);
+        }
+        require(amountIn <= amountInMax, "excessive-input-amount");
+
+        uint256 underlyingIn;
+        {
+            uint256 withdrawn = withdrawUnderlying(tokenIn, amountIn);
+            underlyingIn = swapUnderlyingForExactOut(
+                router,
+                tokenIn,
+                tokenOut,
+                underlyingOut,
+                withdrawn,
+                deadline
+            );
+            if (withdrawn > underlyingIn) {
+                sendUnderlying(tokenIn, msg.sender, withdrawn - underlyingIn);
+            }
+        }
+
+        uint256 outputAmount = depositUnderlying(tokenOut, underlyingOut);
+        require(outputAmount >= amountOut, "insufficient-output-amount");
+        SafeBox(tokenOut).transfer(msg.sender, outputAmount);
+        emit Swapped(
+            msg.sender,
+            tokenIn,
+            tokenOut,
+            amountIn,
+            underlyingIn,
+            underlyingOut,
+            outputAmount
+        );
+    }
+
+    /// @notice swap a raw token, or ETH, to an ibToken
+    /// @param tokenIn the input token: the underlying of a supported ibToken,
+    /// or WETH to send native ETH as msg.value
+    /// @param tokenOut the desired output ibToken
+    /// @param amountIn the amount of tokenIn to swap
+    /// @param amountOutMin minimum amount of output tokens that must be received
+    /// for the transaction not to revert
+    /// @param deadline timestamp after which the transaction will revert
+    function zapIn(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn,
+        uint256 amountOutMin,
+        uint256 deadline
+    ) external payable returns (uint256) {
+        address ibTokenIn = ibTokenOf[tokenIn];
+        require(ibTokenIn != address(0), "token-in-not-supported");
+        require(ibTokenInfo[tokenOut].supported, "token-out-not-supported");
 
-        if (tokenIn != IBETHV2) {
-            IERC20 underlying = IERC20(safeboxIn.uToken());
-            underlyingBalance = underlying.balanceOf(address(this));
+        if (ibTokenInfo[ibTokenIn].isETH) {
+            require(msg.value == amountIn, "invalid-eth-amount");
         } else {
-            underlyingBalance = address(this).balance;
+            require(msg.value == 0, "invalid-eth-amount");
+            IERC20(tokenIn).safeTransferFrom(
+                msg.sender,
+                address(this),
+                amountIn
+            );
+        }
+
+        uint256 underlyingOut = amountIn;
+        if (ibTokenIn != tokenOut) {
+            underlyingOut = swapUnderlying(
+                ibTokenIn,
+                tokenOut,
+                amountIn,
+                deadline
+            );
         }
 
-        if (tokenIn != IBETHV2 && tokenOut != IBETHV2) {
-            uniswapRouter.swapExactTokensForTokens(
-                underlyingBalance,
+        uint256 outputAmount = depositUnderlying(tokenOut, underlyingOut);
+        require(outputAmount >= amountOutMin, "insufficient-output-amount");
+        SafeBox(tokenOut).transfer(msg.sender, outputAmount);
+        emit Swapped(
+            msg.sender,
+            tokenIn,
+            tokenOut,
+            amountIn,
+            amountIn,
+            underlyingOut,
+            outputAmount
+        );
+        return outputAmount;
+    }
+
+    /// @notice swap an ibToken to a raw token, or ETH
+    /// @param tokenIn the input ibToken
+    /// @param tokenOut the desired output token: the underlying of a supported
+    /// ibToken, or WETH to receive native ETH
+    /// @param amountIn the amount of tokenIn to swap
+    /// @param amountOutMin minimum amount of output tokens that must be received
+    /// for the transaction not to revert
+    /// @param deadline timestamp after which the transaction will revert
+    function zapOut(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn,
+        uint256 amountOutMin,
+        uint256 deadline
+    ) external returns (uint256) {
+        address ibTokenOut = ibTokenOf[tokenOut];
+        require(ibTokenInfo[tokenIn].supported, "token-in-not-supported");
+        require(ibTokenOut != address(0), "token-out-not-supported");
+
+        uint256 underlyingIn = withdrawUnderlying(tokenIn, amountIn);
+        uint256 outputAmount = underlyingIn;
+        if (tokenIn != ibTokenOut) {
+            outputAmount = swapUnderlying(
+                tokenIn,
+                ibTokenOut,
+                underlyingIn,
+                deadline
+            );
+        }
+
+        require(outputAmount >= amountOutMin, "insufficient-output-amount");
+        sendUnderlying(ibTokenOut, msg.sender, outputAmount);
+        emit Swapped(
+            msg.sender,
+            tokenIn,
+            tokenOut,
+            amountIn,
+            underlyingIn,
+            outputAmount,
+            outputAmount
+        );
+        return outputAmount;
+    }
+
+    /// @notice swap an ibToken to another ibToken, splitting the underlying
+    /// amount across several routes to reduce price impact
+    /// @param tokenIn the input ibToken
+    /// @param tokenOut the desired output ibToken
+    /// @param amountIn the amount of tokenIn to swap
+    /// @param routes the list of (router, path, weight) to split across; each
+    /// route receives its weight's share of the underlying amount
+    /// @param amountOutMin minimum amount of output tokens that must be received
+    /// for the transaction not to revert
+    /// @param deadline timestamp after which the transaction will revert
+    function swapSplit(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn,
+        SplitRoute[] calldata routes,
+        uint256 amountOutMin,
+        uint256 deadline
+    ) external returns (uint256) {
+        require(tokenIn != tokenOut, "token-in-out-identical");
+        require(ibTokenInfo[tokenIn].supported, "token-in-not-supported");
+        require(ibTokenInfo[tokenOut].supported, "token-out-not-supported");
+        uint256 totalWeight = getTotalWeight(tokenIn, tokenOut, routes);
+
+        uint256 underlyingIn = withdrawUnderlying(tokenIn, amountIn);
+        uint256 underlyingOut =
+            swapRoutes(
+                tokenIn,
+                tokenOut,
+                routes,
+                underlyingIn,
+                totalWeight,
+                deadline
+            );
+
+        uint256 outputAmount = depositUnderlying(tokenOut, underlyingOut);
+        require(outputAmount >= amountOutMin, "insufficient-output-amount");
+        SafeBox(tokenOut).transfer(msg.sender, outputAmount);
+        emit Swapped(
+            msg.sender,
+            tokenIn,
+            tokenOut,
+            amountIn,
+            underlyingIn,
+            underlyingOut,
+            outputAmount
+        );
+        return outputAmount;
+    }
+
+    /// @dev check that every route uses an added router and a path from the
+    /// underlying of tokenIn to that of tokenOut, and return their total weight
+    function getTotalWeight(
+        address tokenIn,
+        address tokenOut,
+        SplitRoute[] calldata routes
+    ) internal view returns (uint256 totalWeight) {
+        for (uint256 idx = 0; idx < routes.length; idx++) {
+            address[] calldata path = routes[idx].path;
+            require(isRouter[routes[idx].router], "router-not-added");
+            require(path.length >= 2, "invalid-path-length");
+            require(
+                path[0] == ibTokenInfo[tokenIn].uToken,
+                "invalid-path-start"
+            );
+            require(
+                path[path.length - 1] == ibTokenInfo[tokenOut].uToken,
+                "invalid-path-end"
+            );
+            totalWeight = totalWeight.add(routes[idx].weight);
+        }
+        require(totalWeight > 0, "invalid-weights");
+    }
+
+    /// @dev swap `underlyingIn` across `routes` pro rata to their weight,
+    /// giving the rounding remainder to the last weighted route, and return
+    /// the total underlying of tokenOut received
+    function swapRoutes(
+        address tokenIn,
+        address tokenOut,
+        SplitRoute[] calldata routes,
+        uint256 underlyingIn,
+        uint256 totalWeight,
+        uint256 deadline
+    ) internal returns (uint256 underlyingOut) {
+        uint256 remaining = underlyingIn;
+        uint256 remainingWeight = totalWeight;
+        for (uint256 idx = 0; idx < routes.length; idx++) {
+            if (routes[idx].weight == 0) {
+                continue;
+            }
+            remainingWeight = remainingWeight.sub(routes[idx].weight);
+            uint256 share =
+                remainingWeight == 0
+                    ? remaining
+                    : underlyingIn.mul(routes[idx].weight).div(totalWeight);
+            remaining = remaining.sub(share);
+            underlyingOut = underlyingOut.add(
+                swapAlongPath(
+                    IUniswapV2Router02(routes[idx].router),
+                    tokenIn,
+                    tokenOut,
+                    routes[idx].path,
+                    share,
+                    deadline
+                )
+            );
+        }
+    }
+
+    /// @notice swap several ibToken pairs in a single transaction, sharing
+    /// the withdraw and deposit of legs that use the same SafeBox
+    /// @param legs the list of (tokenIn, tokenOut, amountIn, amountOutMin) to swap
+    /// @param deadline timestamp after which the transaction will revert
+    /// @return amountsOut the amount of tokenOut received by each leg
+    function swapMany(SwapLeg[] calldata legs, uint256 deadline)
+        external
+        returns (uint256[] memory amountsOut)
+    {
+        uint256[] memory underlyingIn = new uint256[](legs.length);
+        for (uint256 idx = 0; idx < legs.length; idx++) {
+            require(
+                legs[idx].tokenIn != legs[idx].tokenOut,
+                "token-in-out-identical"
+            );
+            require(
+                ibTokenInfo[legs[idx].tokenIn].supported,
+                "token-in-not-supported"
+            );
+            require(
+                ibTokenInfo[legs[idx].tokenOut].supported,
+                "token-out-not-supported"
+            );
+            if (isFirstLeg(legs, idx, true)) {
+                withdrawShared(legs, idx, underlyingIn);
+            }
+        }
+
+        uint256[] memory underlyingOut = new uint256[](legs.length);
+        for (uint256 idx = 0; idx < legs.length; idx++) {
+            underlyingOut[idx] = swapUnderlying(
+                legs[idx].tokenIn,
+                legs[idx].tokenOut,
+                underlyingIn[idx],
+                deadline
+            );
+        }
+
+        amountsOut = new uint256[](legs.length);
+        for (uint256 idx = 0; idx < legs.length; idx++) {
+            if (isFirstLeg(legs, idx, false)) {
+                depositShared(legs, idx, underlyingOut, amountsOut);
+            }
+        }
+
+        for (uint256 idx = 0; idx < legs.length; idx++) {
+            emit Swapped(
+                msg.sender,
+                legs[idx].tokenIn,
+                legs[idx].tokenOut,
+                legs[idx].amountIn,
+                underlyingIn[idx],
+                underlyingOut[idx],
+                amountsOut[idx]
+            );
+        }
+    }
+
+    /// @notice swap several ibTokens into one ibToken, depositing all of the
+    /// routed underlying into the output SafeBox at once
+    /// @param tokensIn the input ibTokens
+    /// @param amountsIn the amount of each input ibToken to swap
+    /// @param tokenOut the desired output ibToken, which no input may be
+    /// @param amountOutMin minimum total amount of output tokens that must be
+    /// received for the transaction not to revert
+    /// @param deadline timestamp after which the transaction will revert
+    /// @return amountOut the total amount of tokenOut received
+    function consolidate(
+        address[] calldata tokensIn,
+        uint256[] calldata amountsIn,
+        address tokenOut,
+        uint256 amountOutMin,
+        uint256 deadline
+    ) external returns (uint256 amountOut) {
+        require(tokensIn.length == amountsIn.length, "amounts-length-mismatch");
+        require(ibTokenInfo[tokenOut].supported, "token-out-not-supported");
+        uint256[] memory underlyingIn = new uint256[](tokensIn.length);
+        uint256[] memory underlyingOut = new uint256[](tokensIn.length);
+        uint256 underlyingTotal;
+        for (uint256 idx = 0; idx < tokensIn.length; idx++) {
+            require(tokensIn[idx] != tokenOut, "token-in-out-identical");
+            require(
+                ibTokenInfo[tokensIn[idx]].supported,
+                "token-in-not-supported"
+            );
+            underlyingIn[idx] = withdrawUnderlying(
+                tokensIn[idx],
+                amountsIn[idx]
+            );
+            underlyingOut[idx] = swapUnderlying(
+                tokensIn[idx],
+                tokenOut,
+                underlyingIn[idx],
+                deadline
+            );
+            underlyingTotal = underlyingTotal.add(underlyingOut[idx]);
+        }
+        // emitConsolidated splits the output pro rata to underlyingTotal
+        require(underlyingTotal > 0, "zero-amount-out");
+
+        amountOut = depositUnderlying(tokenOut, underlyingTotal);
+        require(amountOut >= amountOutMin, "insufficient-output-amount");
+        SafeBox(tokenOut).transfer(msg.sender, amountOut);
+        emitConsolidated(
+            tokensIn,
+            amountsIn,
+            tokenOut,
+            underlyingIn,
+            underlyingOut,
+            amountOut
+        );
+    }
+
+    /// @dev emit a Swapped event for each input of a consolidation, reporting
+    /// its share of the output pro rata to its underlying output, with the
+    /// rounding remainder going to the last input
+    function emitConsolidated(
+        address[] calldata tokensIn,
+        uint256[] calldata amountsIn,
+        address tokenOut,
+        uint256[] memory underlyingIn,
+        uint256[] memory underlyingOut,
+        uint256 amountOut
+    ) internal {
+        uint256 underlyingTotal;
+        for (uint256 idx = 0; idx < tokensIn.length; idx++) {
+            underlyingTotal = underlyingTotal.add(underlyingOut[idx]);
+        }
+        uint256 remaining = amountOut;
+        for (uint256 idx = 0; idx < tokensIn.length; idx++) {
+            uint256 share =
+                idx == tokensIn.length - 1
+                    ? remaining
+                    : amountOut.mul(underlyingOut[idx]).div(underlyingTotal);
+            remaining = remaining.sub(share);
+            emit Swapped(
+                msg.sender,
+                tokensIn[idx],
+                tokenOut,
+                amountsIn[idx],
+                underlyingIn[idx],
+                underlyingOut[idx],
+                share
+            );
+        }
+    }
+
+    /// @dev whether no leg before `idx` uses the same input (or output) SafeBox
+    function isFirstLeg(
+        SwapLeg[] calldata legs,
+        uint256 idx,
+        bool byTokenIn
+    ) internal pure returns (bool) {
+        address token = byTokenIn ? legs[idx].tokenIn : legs[idx].tokenOut;
+        for (uint256 prev = 0; prev < idx; prev++) {
+            address prevToken =
+                byTokenIn ? legs[prev].tokenIn : legs[prev].tokenOut;
+            if (prevToken == token) {
+                return false;
+            }
+        }
+        return true;
+    }
+
+    /// @dev withdraw the combined input of every leg sharing the tokenIn of
+    /// `legs[first]` and split the underlying pro rata to their amountIn
+    function withdrawShared(
+        SwapLeg[] calldata legs,
+        uint256 first,
+        uint256[] memory underlyingAmounts
+    ) internal {
+        address tokenIn = legs[first].tokenIn;
+        uint256 totalIn;
+        uint256 last;
+        for (uint256 idx = first; idx < legs.length; idx++) {
+            if (legs[idx].tokenIn == tokenIn) {
+                totalIn = totalIn.add(legs[idx].amountIn);
+                last = idx;
+            }
+        }
+        require(totalIn > 0, "zero-amount-in");
+
+        uint256 underlyingTotal = withdrawUnderlying(tokenIn, totalIn);
+        uint256 remaining = underlyingTotal;
+        for (uint256 idx = first; idx < last; idx++) {
+            if (legs[idx].tokenIn == tokenIn) {
+                uint256 share =
+                    underlyingTotal.mul(legs[idx].amountIn).div(totalIn);
+                underlyingAmounts[idx] = share;
+                remaining = remaining.sub(share);
+            }
+        }
+        underlyingAmounts[last] = remaining;
+    }
+
+    /// @dev deposit the combined underlying output of every leg sharing the
+    /// tokenOut of `legs[first]`, split the minted ibToken pro rata to their
+    /// underlying output and send it to the caller
+    function depositShared(
+        SwapLeg[] calldata legs,
+        uint256 first,
+        uint256[] memory underlyingAmounts,
+        uint256[] memory amountsOut
+    ) internal {
+        address tokenOut = legs[first].tokenOut;
+        uint256 underlyingTotal;
+        uint256 last;
+        for (uint256 idx = first; idx < legs.length; idx++) {
+            if (legs[idx].tokenOut == tokenOut) {
+                underlyingTotal = underlyingTotal.add(underlyingAmounts[idx]);
+                last = idx;
+            }
+        }
+        require(underlyingTotal > 0, "zero-amount-out");
+
+        uint256 outputTotal = depositUnderlying(tokenOut, underlyingTotal);
+        uint256 remaining = outputTotal;
+        for (uint256 idx = first; idx <= last; idx++) {
+            if (legs[idx].tokenOut == tokenOut) {
+                uint256 share =
+                    idx == last
+                        ? remaining
+                        : outputTotal.mul(underlyingAmounts[idx]).div(
+                            underlyingTotal
+                        );
+                require(
+                    share >= legs[idx].amountOutMin,
+                    "insufficient-output-amount"
+                );
+                amountsOut[idx] = share;
+                remaining = remaining.sub(share);
+            }
+        }
+        SafeBox(tokenOut).transfer(msg.sender, outputTotal);
+    }
+
+    /// @dev the underlying balance of this contract for an ibToken
+    function balanceOfUnderlying(IBTokenInfo storage info)
+        internal
+        view
+        returns (uint256)
+    {
+        if (info.isETH) {
+            return address(this).balance;
+        }
+        return IERC20(info.uToken).balanceOf(address(this));
+    }
+
+    /// @dev pull `amount` of ibToken from the caller and redeem it,
+    /// returning the underlying amount received
+    function withdrawUnderlying(address tokenIn, uint256 amount)
+        internal
+        returns (uint256)
+    {
+        IBTokenInfo storage info = ibTokenInfo[tokenIn];
+        uint256 balanceBefore = balanceOfUnderlying(info);
+        SafeBox(tokenIn).transferFrom(msg.sender, address(this), amount);
+        SafeBox(tokenIn).withdraw(amount);
+        return balanceOfUnderlying(info).sub(balanceBefore);
+    }
+
+    /// @dev swap `amountIn` underlying of tokenIn to the underlying of
+    /// tokenOut, returning the amount received
+    function swapUnderlying(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn,
+        uint256 deadline
+    ) internal returns (uint256) {
+        address[] memory path = getPath(tokenIn, tokenOut);
+        IUniswapV2Router02 router = IUniswapV2Router02(routers[0]);
+        if (adapters.length > 0) {
+            (ISwapAdapter adapter, uint256 adapterAmountOut) =
+                getBestAdapterAmountOut(tokenIn, tokenOut, amountIn);
+            uint256[] memory amounts;
+            (router, amounts) = getBestAmountsOut(path, amountIn);
+            if (
+                address(router) == address(0) ||
+                adapterAmountOut > amounts[amounts.length - 1]
+            ) {
+                require(address(adapter) != address(0), "no-route");
+                require(deadline >= block.timestamp, "expired");
+                return
+                    swapAdapter(
+                        adapter,
+                        tokenIn,
+                        tokenOut,
+                        amountIn,
+                        adapterAmountOut
+                    );
+            }
+        } else if (routers.length > 1) {
+            (router, ) = getBestAmountsOut(path, amountIn);
+            require(address(router) != address(0), "no-route");
+        }
+        return
+            swapAlongPath(router, tokenIn, tokenOut, path, amountIn, deadline);
+    }
+
+    /// @dev swap `amountIn` underlying of tokenIn through `adapter`, requiring
+    /// at least its quote `amountOutMin`, and return the amount received
+    function swapAdapter(
+        ISwapAdapter adapter,
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn,
+        uint256 amountOutMin
+    ) internal returns (uint256 amountOut) {
+        address[] memory path = new address[](2);
+        path[0] = ibTokenInfo[tokenIn].uToken;
+        path[1] = ibTokenInfo[tokenOut].uToken;
+        IERC20(path[0]).safeTransfer(address(adapter), amountIn);
+        amountOut = adapter.swap(
+            path[0],
+            path[1],
+            amountIn,
+            amountOutMin,
+            address(this)
+        );
+        emit RouteSelected(address(adapter), path, amountIn, amountOut);
+    }
+
+    /// @dev swap `amountIn` underlying of tokenIn along `path` on `router`,
+    /// returning the amount of the underlying of tokenOut received
+    function swapAlongPath(
+        IUniswapV2Router02 router,
+        address tokenIn,
+        address tokenOut,
+        address[] memory path,
+        uint256 amountIn,
+        uint256 deadline
+    ) internal returns (uint256) {
+        uint256[] memory amounts;
+        if (ibTokenInfo[tokenIn].isETH) {
+            amounts = router.swapExactETHForTokens{value: amountIn}(
                 0,
                 path,
                 address(this),
                 deadline
             );
-        } else if (tokenIn == IBETHV2) {
-            uniswapRouter.swapExactETHForTokens{value: underlyingBalance}(
+        } else if (ibTokenInfo[tokenOut].isETH) {
+            amounts = router.swapExactTokensForETH(
+                amountIn,
                 0,
                 path,
                 address(this),
                 deadline
             );
-        } else if (tokenOut == IBETHV2) {
-            uniswapRouter.swapExactTokensForETH(
-                underlyingBalance,
+        } else {
+            amounts = router.swapExactTokensForTokens(
+                amountIn,
                 0,
                 path,
                 address(this),
                 deadline
             );
         }
+        emit RouteSelected(
+            address(router),
+            path,
+            amountIn,
+            amounts[amounts.length - 1]
+        );
+        return amounts[amounts.length - 1];
+    }
 
-        if (tokenOut == IBETHV2) {
-            SafeBoxETH safeboxOut = SafeBoxETH(tokenOut);
-            safeboxOut.deposit{value: address(this).balance}();
-            outputAmount = safeboxOut.balanceOf(address(this));
-            safeboxOut.transfer(msg.sender, outputAmount);
+    /// @dev swap at most `amountInMax` underlying of tokenIn for exactly
+    /// `amountOut` underlying of tokenOut on `router`, returning the amount
+    /// spent
+    function swapUnderlyingForExactOut(
+        IUniswapV2Router02 router,
+        address tokenIn,
+        address tokenOut,
+        uint256 amountOut,
+        uint256 amountInMax,
+        uint256 deadline
+    ) internal returns (uint256) {
+        address[] memory path = getPath(tokenIn, tokenOut);
+        uint256[] memory amounts;
+        if (ibTokenInfo[tokenIn].isETH) {
+            amounts = router.swapETHForExactTokens{value: amountInMax}(
+                amountOut,
+                path,
+                address(this),
+                deadline
+            );
+        } else if (ibTokenInfo[tokenOut].isETH) {
+            amounts = router.swapTokensForExactETH(
+                amountOut,
+                amountInMax,
+                path,
+                address(this),
+                deadline
+            );
         } else {
-            SafeBox safeboxOut = SafeBox(tokenOut);
-
-            safeboxOut.deposit(
-                IERC20(safeboxOut.uToken()).balanceOf(address(this))
+            amounts = router.swapTokensForExactTokens(
+                amountOut,
+                amountInMax,
+                path,
+                address(this),
+                deadline
             );
-            outputAmount = safeboxOut.balanceOf(address(this));
-            safeboxOut.transfer(msg.sender, outputAmount);
         }
-        require(outputAmount >= amountOutMin, "insufficient-output-amount");
-        return outputAmount;
+        emit RouteSelected(address(router), path, amounts[0], amountOut);
+        return amounts[0];
+    }
+
+    /// @dev deposit `amount` underlying into the tokenOut SafeBox, returning
+    /// the amount of ibToken minted
+    function depositUnderlying(address tokenOut, uint256 amount)
+        internal
+        returns (uint256)
+    {
+        SafeBox safeboxOut = SafeBox(tokenOut);
+        uint256 balanceBefore = safeboxOut.balanceOf(address(this));
+        if (ibTokenInfo[tokenOut].isETH) {
+            SafeBoxETH(tokenOut).deposit{value: amount}();
+        } else {
+            safeboxOut.deposit(amount);
+        }
+        return safeboxOut.balanceOf(address(this)).sub(balanceBefore);
+    }
+
+    /// @dev send `amount` underlying of an ibToken to `to`
+    function sendUnderlying(
+        address ibToken,
+        address to,
+        uint256 amount
+    ) internal {
+        IBTokenInfo storage info = ibTokenInfo[ibToken];
+        if (info.isETH) {
+            (bool success, ) = to.call{value: amount}("");
+            require(success, "eth-transfer-failed");
+        } else {
+            IERC20(info.uToken).safeTransfer(to, amount);
+        }
+    }
+
+    /// @dev the stored exchange rate of the cyToken backing an ibToken
+    function exchangeRateStored(address ibToken)
+        internal
+        view
+        returns (uint256)
+    {
+        return CYToken(ibTokenInfo[ibToken].cToken).exchangeRateStored();
+    }
+
+    /// @dev accrue interest on the cyToken backing an ibToken and return its
+    /// up-to-date exchange rate
+    function exchangeRateCurrent(address ibToken) internal returns (uint256) {
+        return CYToken(ibTokenInfo[ibToken].cToken).exchangeRateCurrent();
     }
 
     receive() external payable {
         require(
-            msg.sender == IBETHV2 || msg.sender == address(uniswapRouter),
+            msg.sender == IBETHV2 || isRouter[msg.sender],
             "unexpected-eth-sender"
         );
     }
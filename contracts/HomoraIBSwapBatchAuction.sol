@@ -0,0 +1,444 @@
+// SPDX-License-Identifier: GPL-3.0
+
+pragma solidity ^0.7.0;
+pragma experimental ABIEncoderV2;
+
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/math/SafeMath.sol";
+import "./HomoraIBSwap.sol";
+import "../interfaces/IUniswapV2Factory.sol";
+import "../interfaces/IUniswapV2Pair.sol";
+
+/// @title Homora IBToken Swap Batch Auction
+/// @notice collects ibToken swap orders and settles them in batches per pair:
+/// opposing orders are matched against each other at the pool mid price, and
+/// only the net imbalance is swapped through HomoraIBSwap
+/// @dev the mid price is each pool's time-weighted average price over a
+/// window of at least `period` and at most `maxPeriod` seconds, to which
+/// reserves set in the settling block contribute nothing, so it cannot be
+/// moved within the settling transaction
+contract HomoraIBSwapBatchAuction {
+    using SafeMath for uint256;
+
+    struct Order {
+        address owner;
+        address tokenIn;
+        address tokenOut;
+        uint256 amountIn;
+        uint256 amountOutMin;
+        uint256 deadline;
+    }
+
+    struct PairPrice {
+        uint256 price0Cumulative;
+        uint256 price1Cumulative;
+        uint256 price0Average; // token1 per token0, UQ112x112
+        uint256 price1Average; // token0 per token1, UQ112x112
+        uint32 timestamp; // when the cumulative prices were observed
+    }
+
+    HomoraIBSwap public immutable homoraSwap;
+
+    /// @dev the minimum number of seconds the mid price is averaged over
+    uint256 public immutable period;
+
+    /// @dev the maximum number of seconds the mid price is averaged over; an
+    /// observation older than this is too stale to average from
+    uint256 public immutable maxPeriod;
+
+    /// @dev the last observation of each UniswapV2 pair along a settled path
+    mapping(address => PairPrice) public pairPrices;
+
+    /// @dev every order ever posted, cleared once filled or cancelled
+    Order[] public orders;
+
+    event OrderPosted(
+        uint256 indexed orderId,
+        address indexed owner,
+        address indexed tokenIn,
+        address tokenOut,
+        uint256 amountIn,
+        uint256 amountOutMin,
+        uint256 deadline
+    );
+
+    event OrderCancelled(uint256 indexed orderId);
+
+    event OrderFilled(uint256 indexed orderId, uint256 amountOut);
+
+    event PriceUpdated(
+        address indexed pair,
+        uint256 price0Average,
+        uint256 price1Average
+    );
+
+    event BatchSettled(
+        address indexed tokenA,
+        address indexed tokenB,
+        uint256 totalA,
+        uint256 totalB,
+        uint256 netIn,
+        uint256 netOut
+    );
+
+    constructor(
+        HomoraIBSwap _homoraSwap,
+        uint256 _period,
+        uint256 _maxPeriod
+    ) public {
+        require(_period > 0 && _period <= _maxPeriod, "invalid-period");
+        homoraSwap = _homoraSwap;
+        period = _period;
+        maxPeriod = _maxPeriod;
+    }
+
+    /// @notice the number of orders ever posted, which is the next order id
+    function ordersLength() external view returns (uint256) {
+        return orders.length;
+    }
+
+    /// @notice escrow `amountIn` of an ibToken as an order to swap it to
+    /// another ibToken in a later batch
+    /// @param tokenIn the input ibToken
+    /// @param tokenOut the desired output ibToken
+    /// @param amountIn the amount of tokenIn to swap
+    /// @param amountOutMin minimum amount of output tokens that must be received
+    /// for the order to be filled, which must not be 0
+    /// @param deadline timestamp after which the order can no longer be filled
+    /// @return orderId the id of the new order
+    function postOrder(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn,
+        uint256 amountOutMin,
+        uint256 deadline
+    ) external returns (uint256 orderId) {
+        require(tokenIn != tokenOut, "token-in-out-identical");
+        require(homoraSwap.isIBToken(tokenIn), "token-in-not-supported");
+        require(homoraSwap.isIBToken(tokenOut), "token-out-not-supported");
+        require(amountIn > 0, "zero-amount-in");
+        require(amountOutMin > 0, "zero-amount-out-min");
+        SafeBox(tokenIn).transferFrom(msg.sender, address(this), amountIn);
+        orderId = orders.length;
+        orders.push(
+            Order({
+                owner: msg.sender,
+                tokenIn: tokenIn,
+                tokenOut: tokenOut,
+                amountIn: amountIn,
+                amountOutMin: amountOutMin,
+                deadline: deadline
+            })
+        );
+        emit OrderPosted(
+            orderId,
+            msg.sender,
+            tokenIn,
+            tokenOut,
+            amountIn,
+            amountOutMin,
+            deadline
+        );
+    }
+
+    /// @notice return an open order's ibTokens to its owner; anyone may cancel
+    /// an order once its deadline has passed
+    /// @param orderId the id of the order to cancel
+    function cancelOrder(uint256 orderId) external {
+        Order storage order = orders[orderId];
+        address owner = order.owner;
+        require(owner != address(0), "order-not-open");
+        require(
+            msg.sender == owner || order.deadline < block.timestamp,
+            "not-order-owner"
+        );
+        SafeBox(order.tokenIn).transfer(owner, order.amountIn);
+        delete orders[orderId];
+        emit OrderCancelled(orderId);
+    }
+
+    /// @notice observe the cumulative prices of the default router's pools
+    /// along the path of a pair, updating the average price of each pool at
+    /// least `period` seconds after its last observation; the mid price of a
+    /// pool is available from its second observation, and is cleared if more
+    /// than `maxPeriod` seconds pass between two observations
+    /// @param tokenIn the input ibToken
+    /// @param tokenOut the output ibToken
+    function updatePrices(address tokenIn, address tokenOut) public {
+        address[] memory path = homoraSwap.getPath(tokenIn, tokenOut);
+        IUniswapV2Factory factory = defaultFactory();
+        for (uint256 idx = 0; idx + 1 < path.length; idx++) {
+            address pair = factory.getPair(path[idx], path[idx + 1]);
+            require(pair != address(0), "no-pair");
+            updatePrice(IUniswapV2Pair(pair));
+        }
+    }
+
+    /// @notice the value of `amountIn` of ibToken tokenIn in ibToken tokenOut at
+    /// the average price of the default router's pools along the pair's path
+    /// as of their last update, without fees or price impact
+    /// @param tokenIn the input ibToken
+    /// @param tokenOut the output ibToken
+    /// @param amountIn the amount of tokenIn to value
+    function getMidAmountOut(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn
+    ) public view returns (uint256) {
+        if (amountIn == 0) {
+            return 0;
+        }
+        address[] memory path = homoraSwap.getPath(tokenIn, tokenOut);
+        IUniswapV2Factory factory = defaultFactory();
+        uint256 amount = homoraSwap.ibToToken(tokenIn, amountIn);
+        for (uint256 idx = 0; idx + 1 < path.length; idx++) {
+            IUniswapV2Pair pair =
+                IUniswapV2Pair(factory.getPair(path[idx], path[idx + 1]));
+            require(address(pair) != address(0), "no-pair");
+            PairPrice storage price = pairPrices[address(pair)];
+            require(price.price0Average > 0, "no-mid-price");
+            if (path[idx] == pair.token0()) {
+                amount = amount.mul(price.price0Average) >> 112;
+            } else {
+                amount = amount.mul(price.price1Average) >> 112;
+            }
+        }
+        return homoraSwap.tokenToIB(tokenOut, amount);
+    }
+
+    /// @dev the factory of HomoraIBSwap's default router
+    function defaultFactory() internal view returns (IUniswapV2Factory) {
+        return
+            IUniswapV2Factory(
+                IUniswapV2Router02(homoraSwap.routers(0)).factory()
+            );
+    }
+
+    /// @dev record a pair's cumulative prices, and their average since the
+    /// previous observation if at least `period` seconds have passed; past
+    /// `maxPeriod` seconds the average would mostly reflect old prices, so it
+    /// is cleared and the window restarts from this observation
+    function updatePrice(IUniswapV2Pair pair) internal {
+        PairPrice storage price = pairPrices[address(pair)];
+        (
+            uint256 price0Cumulative,
+            uint256 price1Cumulative,
+            uint32 timestamp
+        ) = currentCumulativePrices(pair);
+        // the elapsed time and the cumulative prices may overflow
+        uint32 timeElapsed = timestamp - price.timestamp;
+        if (price.timestamp != 0) {
+            if (timeElapsed < period) {
+                return;
+            }
+            if (timeElapsed > maxPeriod) {
+                price.price0Average = 0;
+                price.price1Average = 0;
+            } else {
+                price.price0Average =
+                    (price0Cumulative - price.price0Cumulative) /
+                    timeElapsed;
+                price.price1Average =
+                    (price1Cumulative - price.price1Cumulative) /
+                    timeElapsed;
+            }
+            emit PriceUpdated(
+                address(pair),
+                price.price0Average,
+                price.price1Average
+            );
+        }
+        price.price0Cumulative = price0Cumulative;
+        price.price1Cumulative = price1Cumulative;
+        price.timestamp = timestamp;
+    }
+
+    /// @dev a pair's cumulative prices as of this block, accruing its current
+    /// price since its last update as UniswapV2OracleLibrary does
+    function currentCumulativePrices(IUniswapV2Pair pair)
+        internal
+        view
+        returns (
+            uint256 price0Cumulative,
+            uint256 price1Cumulative,
+            uint32 timestamp
+        )
+    {
+        timestamp = uint32(block.timestamp % 2**32);
+        price0Cumulative = pair.price0CumulativeLast();
+        price1Cumulative = pair.price1CumulativeLast();
+        (uint112 reserve0, uint112 reserve1, uint32 timestampLast) =
+            pair.getReserves();
+        if (timestampLast != timestamp) {
+            require(reserve0 > 0 && reserve1 > 0, "no-liquidity");
+            uint32 timeElapsed = timestamp - timestampLast;
+            price0Cumulative +=
+                ((uint256(reserve1) << 112) / reserve0) *
+                timeElapsed;
+            price1Cumulative +=
+                ((uint256(reserve0) << 112) / reserve1) *
+                timeElapsed;
+        }
+    }
+
+    /// @notice fill a batch of open orders between two ibTokens, in either
+    /// direction; anyone may settle
+    /// @dev the mid price of the pair's pools is updated first, then the
+    /// smaller side is matched in full against the larger side at the mid
+    /// price and the larger side's excess is swapped through HomoraIBSwap,
+    /// for at least the part of its orders' minimum outputs the matched side
+    /// does not cover. each side then shares what it receives pro rata to
+    /// amountIn, with the rounding remainder going to its last order
+    /// @param tokenA one ibToken of the pair
+    /// @param tokenB the other ibToken of the pair
+    /// @param orderIds the orders to fill, in strictly increasing order
+    /// @return amountsOut the amount of output ibToken sent for each order
+    function settle(
+        address tokenA,
+        address tokenB,
+        uint256[] calldata orderIds
+    ) external returns (uint256[] memory amountsOut) {
+        // totals[0] is the tokenA sold to tokenB, totals[1] the tokenB sold
+        // to tokenA, and mins the sum of each side's amountOutMin
+        (uint256[2] memory totals, uint256[2] memory mins) =
+            collect(tokenA, tokenB, orderIds);
+        updatePrices(tokenA, tokenB);
+        (uint256[2] memory proceeds, uint256 netIn, uint256 netOut) =
+            clear(tokenA, tokenB, totals, mins);
+        amountsOut = fill(tokenA, orderIds, totals, proceeds);
+        emit BatchSettled(tokenA, tokenB, totals[0], totals[1], netIn, netOut);
+    }
+
+    /// @dev check that every order is open, unexpired and between tokenA and
+    /// tokenB, and sum the amount sold and the minimum output in each direction
+    function collect(
+        address tokenA,
+        address tokenB,
+        uint256[] calldata orderIds
+    )
+        internal
+        view
+        returns (uint256[2] memory totals, uint256[2] memory mins)
+    {
+        require(tokenA != tokenB, "token-in-out-identical");
+        for (uint256 idx = 0; idx < orderIds.length; idx++) {
+            require(
+                idx == 0 || orderIds[idx] > orderIds[idx - 1],
+                "unsorted-order-ids"
+            );
+            Order storage order = orders[orderIds[idx]];
+            require(order.owner != address(0), "order-not-open");
+            require(order.deadline >= block.timestamp, "order-expired");
+            uint256 side = 0;
+            if (order.tokenIn != tokenA || order.tokenOut != tokenB) {
+                require(
+                    order.tokenIn == tokenB && order.tokenOut == tokenA,
+                    "order-pair-mismatch"
+                );
+                side = 1;
+            }
+            totals[side] = totals[side].add(order.amountIn);
+            mins[side] = mins[side].add(order.amountOutMin);
+        }
+    }
+
+    /// @dev match the two sides at the mid price and swap the excess,
+    /// returning the tokenB owed to A->B orders and the tokenA owed to B->A
+    /// orders, with the amounts swapped in and out
+    function clear(
+        address tokenA,
+        address tokenB,
+        uint256[2] memory totals,
+        uint256[2] memory mins
+    )
+        internal
+        returns (
+            uint256[2] memory proceeds,
+            uint256 netIn,
+            uint256 netOut
+        )
+    {
+        uint256 aInB = getMidAmountOut(tokenA, tokenB, totals[0]);
+        if (aInB >= totals[1]) {
+            // all of B is matched against the A it is worth
+            uint256 matchedA =
+                aInB == 0 ? 0 : totals[0].mul(totals[1]).div(aInB);
+            netIn = totals[0].sub(matchedA);
+            netOut = swapNet(
+                tokenA,
+                tokenB,
+                netIn,
+                mins[0] > totals[1] ? mins[0] - totals[1] : 0
+            );
+            proceeds[0] = totals[1].add(netOut);
+            proceeds[1] = matchedA;
+        } else {
+            // all of A is matched against the B it is worth
+            netIn = totals[1].sub(aInB);
+            netOut = swapNet(
+                tokenB,
+                tokenA,
+                netIn,
+                mins[1] > totals[0] ? mins[1] - totals[0] : 0
+            );
+            proceeds[0] = aInB;
+            proceeds[1] = totals[0].add(netOut);
+        }
+    }
+
+    /// @dev swap `amountIn` of tokenIn through HomoraIBSwap for at least
+    /// `amountOutMin` of tokenOut, returning the amount received
+    function swapNet(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn,
+        uint256 amountOutMin
+    ) internal returns (uint256) {
+        if (amountIn == 0) {
+            return 0;
+        }
+        SafeBox(tokenIn).approve(address(homoraSwap), amountIn);
+        return
+            homoraSwap.swap(
+                tokenIn,
+                tokenOut,
+                amountIn,
+                amountOutMin,
+                block.timestamp
+            );
+    }
+
+    /// @dev pay each order its share of its side's proceeds, enforcing its
+    /// minimum output, and close it
+    function fill(
+        address tokenA,
+        uint256[] calldata orderIds,
+        uint256[2] memory totals,
+        uint256[2] memory proceeds
+    ) internal returns (uint256[] memory amountsOut) {
+        amountsOut = new uint256[](orderIds.length);
+        uint256[2] memory remaining = [totals[0], totals[1]];
+        uint256[2] memory unpaid = [proceeds[0], proceeds[1]];
+        for (uint256 idx = 0; idx < orderIds.length; idx++) {
+            Order memory order = orders[orderIds[idx]];
+            uint256 side = order.tokenIn == tokenA ? 0 : 1;
+            uint256 amountOut;
+            if (remaining[side] == order.amountIn) {
+                amountOut = unpaid[side];
+            } else {
+                amountOut = proceeds[side].mul(order.amountIn).div(
+                    totals[side]
+                );
+            }
+            remaining[side] = remaining[side].sub(order.amountIn);
+            unpaid[side] = unpaid[side].sub(amountOut);
+            require(
+                amountOut >= order.amountOutMin,
+                "insufficient-output-amount"
+            );
+            delete orders[orderIds[idx]];
+            SafeBox(order.tokenOut).transfer(order.owner, amountOut);
+            amountsOut[idx] = amountOut;
+            emit OrderFilled(orderIds[idx], amountOut);
+        }
+    }
+}
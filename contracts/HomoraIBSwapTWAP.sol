@@ -0,0 +1,236 @@
+// SPDX-License-Identifier: GPL-3.0
+
+pragma solidity ^0.7.0;
+pragma experimental ABIEncoderV2;
+
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/math/SafeMath.sol";
+import "./HomoraIBSwap.sol";
+
+/// @title Homora IBToken Swap TWAP Orders
+/// @notice escrows an ibToken amount once and swaps it through HomoraIBSwap in
+/// equal slices at most once per interval; any keeper may execute a due slice
+/// and earns a bounty set by the order's owner, paid out of the slice's output
+contract HomoraIBSwapTWAP {
+    using SafeMath for uint256;
+
+    /// @dev bounties are capped at 1% of each slice's output
+    uint256 public constant MAX_BOUNTY_BPS = 100;
+
+    struct TWAPOrder {
+        address owner;
+        address tokenIn;
+        address tokenOut;
+        uint256 amountPerSlice; // the last slice takes the remainder instead
+        uint256 remaining; // tokenIn still escrowed
+        uint256 slicesLeft;
+        uint256 interval; // minimum seconds between slices
+        uint256 nextExecution; // timestamp from which the next slice is due
+        uint256 minRate; // minimum tokenOut per tokenIn after the bounty, 1e18
+        uint256 bountyBps; // keeper bounty in basis points of the output
+    }
+
+    HomoraIBSwap public immutable homoraSwap;
+
+    /// @dev every order ever created, cleared once completed or cancelled
+    TWAPOrder[] public orders;
+
+    event OrderCreated(
+        uint256 indexed orderId,
+        address indexed owner,
+        address indexed tokenIn,
+        address tokenOut,
+        uint256 amountIn,
+        uint256 slices,
+        uint256 interval,
+        uint256 minRate,
+        uint256 bountyBps
+    );
+
+    event OrderCancelled(uint256 indexed orderId, uint256 refund);
+
+    event SliceExecuted(
+        uint256 indexed orderId,
+        address indexed keeper,
+        uint256 amountIn,
+        uint256 amountOut,
+        uint256 bounty,
+        uint256 slicesLeft
+    );
+
+    constructor(HomoraIBSwap _homoraSwap) public {
+        homoraSwap = _homoraSwap;
+    }
+
+    /// @notice the number of orders ever created, which is the next order id
+    function ordersLength() external view returns (uint256) {
+        return orders.length;
+    }
+
+    /// @notice escrow `amountIn` of ibToken tokenIn to swap to tokenOut in
+    /// `slices` equal slices, the first due immediately
+    /// @param tokenIn the input ibToken
+    /// @param tokenOut the desired output ibToken
+    /// @param amountIn the total amount of tokenIn to swap
+    /// @param slices the number of slices to swap amountIn in
+    /// @param interval the minimum number of seconds between two slices
+    /// @param minRate the minimum amount of tokenOut received per tokenIn in
+    /// each slice, after the bounty, scaled by 1e18, which must not be 0
+    /// @param bountyBps the share of each slice's output paid to its keeper, in
+    /// basis points
+    /// @return orderId the id of the new order
+    function createOrder(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn,
+        uint256 slices,
+        uint256 interval,
+        uint256 minRate,
+        uint256 bountyBps
+    ) external returns (uint256 orderId) {
+        require(tokenIn != tokenOut, "token-in-out-identical");
+        require(homoraSwap.isIBToken(tokenIn), "token-in-not-supported");
+        require(homoraSwap.isIBToken(tokenOut), "token-out-not-supported");
+        require(slices > 0 && amountIn >= slices, "invalid-slices");
+        require(minRate > 0, "zero-min-rate");
+        require(bountyBps <= MAX_BOUNTY_BPS, "bounty-too-high");
+        SafeBox(tokenIn).transferFrom(msg.sender, address(this), amountIn);
+        orderId = orders.length;
+        orders.push(
+            TWAPOrder({
+                owner: msg.sender,
+                tokenIn: tokenIn,
+                tokenOut: tokenOut,
+                amountPerSlice: amountIn / slices,
+                remaining: amountIn,
+                slicesLeft: slices,
+                interval: interval,
+                nextExecution: block.timestamp,
+                minRate: minRate,
+                bountyBps: bountyBps
+            })
+        );
+        emit OrderCreated(
+            orderId,
+            msg.sender,
+            tokenIn,
+            tokenOut,
+            amountIn,
+            slices,
+            interval,
+            minRate,
+            bountyBps
+        );
+    }
+
+    /// @notice return the unswapped remainder of an order to its owner
+    /// @param orderId the id of the order to cancel
+    function cancelOrder(uint256 orderId) external {
+        require(orderId < orders.length, "invalid-order-id");
+        TWAPOrder storage order = orders[orderId];
+        require(order.owner != address(0), "order-not-open");
+        require(msg.sender == order.owner, "not-order-owner");
+        uint256 refund = order.remaining;
+        SafeBox(order.tokenIn).transfer(order.owner, refund);
+        delete orders[orderId];
+        emit OrderCancelled(orderId, refund);
+    }
+
+    /// @notice whether an order is open and its next slice is due
+    /// @param orderId the id of the order to check, which must exist
+    function isDue(uint256 orderId) public view returns (bool) {
+        require(orderId < orders.length, "invalid-order-id");
+        TWAPOrder storage order = orders[orderId];
+        return
+            order.owner != address(0) &&
+            order.nextExecution <= block.timestamp;
+    }
+
+    /// @notice execute the due slice of an order, paying the bounty to the
+    /// caller
+    /// @param orderId the id of the order to execute
+    /// @return amountOut the amount of tokenOut sent to the owner
+    function executeSlice(uint256 orderId)
+        external
+        returns (uint256 amountOut)
+    {
+        require(isDue(orderId), "slice-not-due");
+        bool executed;
+        (executed, amountOut) = execute(orderId, msg.sender);
+        require(executed, "slice-failed");
+    }
+
+    /// @notice execute the due slice of each of a list of orders, skipping
+    /// orders that are not due or whose slice fails, e.g. below its minimum
+    /// rate, and paying the bounties to the caller; reverts if an order id
+    /// does not exist
+    /// @param orderIds the ids of the orders to execute
+    /// @return executed the number of slices executed
+    function executeSlices(uint256[] calldata orderIds)
+        external
+        returns (uint256 executed)
+    {
+        for (uint256 idx = 0; idx < orderIds.length; idx++) {
+            if (isDue(orderIds[idx])) {
+                (bool success, ) = execute(orderIds[idx], msg.sender);
+                if (success) {
+                    executed++;
+                }
+            }
+        }
+    }
+
+    /// @dev swap the next slice of a due order through HomoraIBSwap and pay it
+    /// out, returning false without changing the order if the swap fails
+    function execute(uint256 orderId, address keeper)
+        internal
+        returns (bool, uint256)
+    {
+        TWAPOrder storage order = orders[orderId];
+        uint256 amountIn =
+            order.slicesLeft == 1 ? order.remaining : order.amountPerSlice;
+        // the owner's share of the output must meet the minimum rate, so
+        // require enough output before the bounty, rounding up
+        uint256 amountOutMin =
+            amountIn
+                .mul(order.minRate)
+                .div(1e18)
+                .mul(10000)
+                .add(10000 - order.bountyBps - 1)
+                .div(10000 - order.bountyBps);
+        SafeBox(order.tokenIn).approve(address(homoraSwap), amountIn);
+        try
+            homoraSwap.swap(
+                order.tokenIn,
+                order.tokenOut,
+                amountIn,
+                amountOutMin,
+                block.timestamp
+            )
+        returns (uint256 swapped) {
+            uint256 bounty = swapped.mul(order.bountyBps).div(10000);
+            uint256 amountOut = swapped.sub(bounty);
+            order.remaining = order.remaining.sub(amountIn);
+            order.slicesLeft = order.slicesLeft.sub(1);
+            order.nextExecution = block.timestamp.add(order.interval);
+            SafeBox(order.tokenOut).transfer(order.owner, amountOut);
+            if (bounty > 0) {
+                SafeBox(order.tokenOut).transfer(keeper, bounty);
+            }
+            emit SliceExecuted(
+                orderId,
+                keeper,
+                amountIn,
+                amountOut,
+                bounty,
+                order.slicesLeft
+            );
+            if (order.slicesLeft == 0) {
+                delete orders[orderId];
+            }
+            return (true, amountOut);
+        } catch {
+            SafeBox(order.tokenIn).approve(address(homoraSwap), 0);
+            return (false, 0);
+        }
+    }
+}
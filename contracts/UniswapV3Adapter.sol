@@ -0,0 +1,99 @@
+// SPDX-License-Identifier: GPL-3.0
+
+pragma solidity ^0.7.0;
+pragma experimental ABIEncoderV2;
+
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/IERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/SafeERC20.sol";
+import "./Governable.sol";
+import "../interfaces/ISwapAdapter.sol";
+import "../interfaces/IUniswapV3SwapRouter.sol";
+import "../interfaces/IUniswapV3Quoter.sol";
+
+/// @title Uniswap V3 Swap Adapter
+/// @notice lets HomoraIBSwap quote and swap through the single Uniswap V3 pool
+/// of each pair whose fee tier governance has set
+contract UniswapV3Adapter is ISwapAdapter, Governable {
+    using SafeERC20 for IERC20;
+
+    IUniswapV3SwapRouter public immutable router;
+
+    IUniswapV3Quoter public immutable quoter;
+
+    /// @dev the fee tier of the pool to use for each pair, in hundredths of a
+    /// basis point, stored under both token orders; 0 if the pair is not routed
+    mapping(address => mapping(address => uint24)) public fees;
+
+    event FeeSet(address indexed tokenA, address indexed tokenB, uint24 fee);
+
+    constructor(IUniswapV3SwapRouter _router, IUniswapV3Quoter _quoter)
+        public
+    {
+        __Governable__init();
+        router = _router;
+        quoter = _quoter;
+    }
+
+    /// @notice set the fee tier of the pool to swap tokenA and tokenB through,
+    /// in either direction
+    /// @param tokenA one token of the pair
+    /// @param tokenB the other token of the pair
+    /// @param fee the pool's fee tier, e.g. 500 for 0.05%, or 0 to stop routing
+    /// the pair
+    function setFee(
+        address tokenA,
+        address tokenB,
+        uint24 fee
+    ) external onlyGov {
+        require(tokenA != tokenB, "token-in-out-identical");
+        fees[tokenA][tokenB] = fee;
+        fees[tokenB][tokenA] = fee;
+        emit FeeSet(tokenA, tokenB, fee);
+    }
+
+    /// @notice quote `amountIn` of tokenIn to tokenOut, or 0 if the pair is
+    /// not routed
+    /// @dev the Uniswap V3 quoter simulates the swap and reverts, so this is
+    /// not a view; call it with eth_call
+    function getAmountOut(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn
+    ) external override returns (uint256) {
+        uint24 fee = fees[tokenIn][tokenOut];
+        if (fee == 0) {
+            return 0;
+        }
+        return
+            quoter.quoteExactInputSingle(tokenIn, tokenOut, fee, amountIn, 0);
+    }
+
+    /// @notice swap `amountIn` of tokenIn, already sent to this adapter, to
+    /// tokenOut for `to`
+    function swap(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn,
+        uint256 amountOutMin,
+        address to
+    ) external override returns (uint256) {
+        uint24 fee = fees[tokenIn][tokenOut];
+        require(fee != 0, "fee-not-set");
+        // the router spends the whole allowance, leaving it at 0 as
+        // safeApprove requires
+        IERC20(tokenIn).safeApprove(address(router), amountIn);
+        return
+            router.exactInputSingle(
+                IUniswapV3SwapRouter.ExactInputSingleParams({
+                    tokenIn: tokenIn,
+                    tokenOut: tokenOut,
+                    fee: fee,
+                    recipient: to,
+                    deadline: block.timestamp,
+                    amountIn: amountIn,
+                    amountOutMinimum: amountOutMin,
+                    sqrtPriceLimitX96: 0
+                })
+            );
+    }
+}
@@ -0,0 +1,53 @@
+// SPDX-License-Identifier: GPL-3.0
+
+pragma solidity ^0.7.0;
+
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/ERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/SafeERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/math/SafeMath.sol";
+
+/// @dev test-only cyToken with a settable exchange rate, rounding mint and
+/// redeem the same way as Compound's CToken
+contract MockCyToken is ERC20 {
+    using SafeERC20 for IERC20;
+    using SafeMath for uint256;
+
+    address public immutable underlying;
+
+    uint256 public exchangeRateStored;
+
+    constructor(address _underlying, uint256 _exchangeRate)
+        ERC20("Mock Cream Token", "cyMOCK")
+    {
+        _setupDecimals(8);
+        underlying = _underlying;
+        exchangeRateStored = _exchangeRate;
+    }
+
+    function setExchangeRate(uint256 _exchangeRate) external {
+        exchangeRateStored = _exchangeRate;
+    }
+
+    function exchangeRateCurrent() external view returns (uint256) {
+        return exchangeRateStored;
+    }
+
+    function mint(uint256 mintAmount) external returns (uint256) {
+        IERC20(underlying).safeTransferFrom(
+            msg.sender,
+            address(this),
+            mintAmount
+        );
+        _mint(msg.sender, mintAmount.mul(1e18).div(exchangeRateStored));
+        return 0;
+    }
+
+    function redeem(uint256 redeemTokens) external returns (uint256) {
+        _burn(msg.sender, redeemTokens);
+        IERC20(underlying).safeTransfer(
+            msg.sender,
+            redeemTokens.mul(exchangeRateStored).div(1e18)
+        );
+        return 0;
+    }
+}
@@ -0,0 +1,49 @@
+// SPDX-License-Identifier: GPL-3.0
+
+pragma solidity ^0.7.0;
+
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/ERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/SafeERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/math/SafeMath.sol";
+import "../../interfaces/ICErc20.sol";
+
+/// @dev test-only Alpha Homora V2 SafeBox: ibTokens are minted 1:1 with the
+/// cyTokens the deposit mints
+contract MockSafeBox is ERC20 {
+    using SafeERC20 for IERC20;
+    using SafeMath for uint256;
+
+    ICErc20 public immutable cToken;
+
+    IERC20 public immutable uToken;
+
+    constructor(
+        ICErc20 _cToken,
+        string memory _name,
+        string memory _symbol
+    ) ERC20(_name, _symbol) {
+        _setupDecimals(8);
+        IERC20 _uToken = IERC20(_cToken.underlying());
+        cToken = _cToken;
+        uToken = _uToken;
+        _uToken.safeApprove(address(_cToken), uint256(-1));
+    }
+
+    function deposit(uint256 amount) external {
+        uint256 uBalanceBefore = uToken.balanceOf(address(this));
+        uToken.safeTransferFrom(msg.sender, address(this), amount);
+        uint256 uBalanceAfter = uToken.balanceOf(address(this));
+        uint256 cBalanceBefore = cToken.balanceOf(address(this));
+        require(cToken.mint(uBalanceAfter.sub(uBalanceBefore)) == 0, "!mint");
+        uint256 cBalanceAfter = cToken.balanceOf(address(this));
+        _mint(msg.sender, cBalanceAfter.sub(cBalanceBefore));
+    }
+
+    function withdraw(uint256 amount) external {
+        _burn(msg.sender, amount);
+        uint256 uBalanceBefore = uToken.balanceOf(address(this));
+        require(cToken.redeem(amount) == 0, "!redeem");
+        uint256 uBalanceAfter = uToken.balanceOf(address(this));
+        uToken.safeTransfer(msg.sender, uBalanceAfter.sub(uBalanceBefore));
+    }
+}
@@ -0,0 +1,59 @@
+// SPDX-License-Identifier: GPL-3.0
+
+pragma solidity ^0.7.0;
+
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/ERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/SafeERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/math/SafeMath.sol";
+import "../../interfaces/ICErc20.sol";
+import "../../interfaces/IWETH.sol";
+
+/// @dev test-only Alpha Homora V2 SafeBoxETH, wrapping ETH before minting
+/// the cyWETH backing the ibTokens
+contract MockSafeBoxETH is ERC20 {
+    using SafeERC20 for IERC20;
+    using SafeMath for uint256;
+
+    ICErc20 public immutable cToken;
+
+    IWETH public immutable weth;
+
+    constructor(
+        ICErc20 _cToken,
+        string memory _name,
+        string memory _symbol
+    ) ERC20(_name, _symbol) {
+        _setupDecimals(8);
+        IWETH _weth = IWETH(_cToken.underlying());
+        cToken = _cToken;
+        weth = _weth;
+        IERC20(address(_weth)).safeApprove(address(_cToken), uint256(-1));
+    }
+
+    function uToken() external view returns (address) {
+        return address(weth);
+    }
+
+    function deposit() external payable {
+        weth.deposit{value: msg.value}();
+        uint256 cBalanceBefore = cToken.balanceOf(address(this));
+        require(cToken.mint(msg.value) == 0, "!mint");
+        uint256 cBalanceAfter = cToken.balanceOf(address(this));
+        _mint(msg.sender, cBalanceAfter.sub(cBalanceBefore));
+    }
+
+    function withdraw(uint256 amount) external {
+        _burn(msg.sender, amount);
+        uint256 uBalanceBefore = weth.balanceOf(address(this));
+        require(cToken.redeem(amount) == 0, "!redeem");
+        uint256 uBalanceAfter = weth.balanceOf(address(this));
+        uint256 wethAmount = uBalanceAfter.sub(uBalanceBefore);
+        weth.withdraw(wethAmount);
+        (bool success, ) = msg.sender.call{value: wethAmount}("");
+        require(success, "!withdraw");
+    }
+
+    receive() external payable {
+        require(msg.sender == address(weth), "!weth");
+    }
+}
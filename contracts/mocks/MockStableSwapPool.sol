@@ -0,0 +1,163 @@
+// SPDX-License-Identifier: GPL-3.0
+
+pragma solidity ^0.7.0;
+
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/IERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/SafeERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/math/SafeMath.sol";
+
+/// @dev test-only Curve stable-swap pool with StableSwap3Pool's invariant,
+/// get_dy and exchange math; liquidity is seeded with addLiquidity and admin
+/// fees are not split out
+contract MockStableSwapPool {
+    using SafeERC20 for IERC20;
+    using SafeMath for uint256;
+
+    uint256 constant FEE_DENOMINATOR = 1e10;
+    uint256 constant PRECISION = 1e18;
+
+    address[] public coins;
+
+    uint256[] public balances;
+
+    /// @dev multiplier bringing each coin to 18 decimals, scaled by 1e18
+    uint256[] public rates;
+
+    uint256 public immutable A;
+
+    uint256 public immutable fee;
+
+    constructor(
+        address[] memory _coins,
+        uint256[] memory _decimals,
+        uint256 _A,
+        uint256 _fee
+    ) {
+        require(_coins.length == _decimals.length, "length-mismatch");
+        for (uint256 idx = 0; idx < _coins.length; idx++) {
+            coins.push(_coins[idx]);
+            balances.push(0);
+            rates.push(PRECISION.mul(10**(18 - _decimals[idx])));
+        }
+        A = _A;
+        fee = _fee;
+    }
+
+    /// @dev seed the pool with `amounts` of each coin
+    function addLiquidity(uint256[] calldata amounts) external {
+        for (uint256 idx = 0; idx < coins.length; idx++) {
+            IERC20(coins[idx]).safeTransferFrom(
+                msg.sender,
+                address(this),
+                amounts[idx]
+            );
+            balances[idx] = balances[idx].add(amounts[idx]);
+        }
+    }
+
+    function xp() internal view returns (uint256[] memory result) {
+        result = new uint256[](coins.length);
+        for (uint256 idx = 0; idx < coins.length; idx++) {
+            result[idx] = rates[idx].mul(balances[idx]).div(PRECISION);
+        }
+    }
+
+    function getD(uint256[] memory xp_) internal view returns (uint256) {
+        uint256 nCoins = xp_.length;
+        uint256 S;
+        for (uint256 idx = 0; idx < nCoins; idx++) {
+            S = S.add(xp_[idx]);
+        }
+        if (S == 0) {
+            return 0;
+        }
+        uint256 D = S;
+        uint256 Ann = A.mul(nCoins);
+        for (uint256 iter = 0; iter < 255; iter++) {
+            uint256 D_P = D;
+            for (uint256 idx = 0; idx < nCoins; idx++) {
+                D_P = D_P.mul(D).div(xp_[idx].mul(nCoins));
+            }
+            uint256 Dprev = D;
+            D = Ann.mul(S).add(D_P.mul(nCoins)).mul(D).div(
+                Ann.sub(1).mul(D).add(nCoins.add(1).mul(D_P))
+            );
+            if (D > Dprev ? D - Dprev <= 1 : Dprev - D <= 1) {
+                break;
+            }
+        }
+        return D;
+    }
+
+    function getY(
+        uint256 i,
+        uint256 j,
+        uint256 x,
+        uint256[] memory xp_
+    ) internal view returns (uint256) {
+        uint256 nCoins = xp_.length;
+        uint256 D = getD(xp_);
+        uint256 c = D;
+        uint256 S_;
+        uint256 Ann = A.mul(nCoins);
+        for (uint256 idx = 0; idx < nCoins; idx++) {
+            uint256 _x;
+            if (idx == i) {
+                _x = x;
+            } else if (idx != j) {
+                _x = xp_[idx];
+            } else {
+                continue;
+            }
+            S_ = S_.add(_x);
+            c = c.mul(D).div(_x.mul(nCoins));
+        }
+        c = c.mul(D).div(Ann.mul(nCoins));
+        uint256 b = S_.add(D.div(Ann));
+        uint256 y = D;
+        for (uint256 iter = 0; iter < 255; iter++) {
+            uint256 yPrev = y;
+            y = y.mul(y).add(c).div(y.mul(2).add(b).sub(D));
+            if (y > yPrev ? y - yPrev <= 1 : yPrev - y <= 1) {
+                break;
+            }
+        }
+        return y;
+    }
+
+    function getDy(
+        uint256 i,
+        uint256 j,
+        uint256 dx
+    ) internal view returns (uint256) {
+        uint256[] memory xp_ = xp();
+        uint256 x = xp_[i].add(dx.mul(rates[i]).div(PRECISION));
+        uint256 y = getY(i, j, x, xp_);
+        uint256 dy = xp_[j].sub(y).sub(1).mul(PRECISION).div(rates[j]);
+        return dy.sub(fee.mul(dy).div(FEE_DENOMINATOR));
+    }
+
+    function get_dy(
+        int128 i,
+        int128 j,
+        uint256 dx
+    ) external view returns (uint256) {
+        return getDy(uint256(uint128(i)), uint256(uint128(j)), dx);
+    }
+
+    function exchange(
+        int128 i,
+        int128 j,
+        uint256 dx,
+        uint256 min_dy
+    ) external {
+        uint256 idxIn = uint256(uint128(i));
+        uint256 idxOut = uint256(uint128(j));
+        uint256 dy = getDy(idxIn, idxOut, dx);
+        require(dy >= min_dy, "Exchange resulted in fewer coins than expected");
+        IERC20(coins[idxIn]).safeTransferFrom(msg.sender, address(this), dx);
+        balances[idxIn] = balances[idxIn].add(dx);
+        balances[idxOut] = balances[idxOut].sub(dy);
+        IERC20(coins[idxOut]).safeTransfer(msg.sender, dy);
+    }
+}
@@ -0,0 +1,144 @@
+// SPDX-License-Identifier: GPL-3.0
+
+pragma solidity ^0.7.0;
+
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/IERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/SafeERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/math/SafeMath.sol";
+
+/// @dev test-only UniswapV2 pair with the real constant-product and 0.3% fee
+/// checks and cumulative prices, without liquidity tokens: liquidity is added
+/// by transferring tokens in and calling sync
+contract MockUniswapV2Pair {
+    using SafeERC20 for IERC20;
+    using SafeMath for uint256;
+
+    address public immutable token0;
+
+    address public immutable token1;
+
+    uint112 private reserve0;
+
+    uint112 private reserve1;
+
+    uint32 private blockTimestampLast;
+
+    uint256 public price0CumulativeLast;
+
+    uint256 public price1CumulativeLast;
+
+    constructor(address _token0, address _token1) {
+        token0 = _token0;
+        token1 = _token1;
+    }
+
+    function getReserves()
+        external
+        view
+        returns (
+            uint112,
+            uint112,
+            uint32
+        )
+    {
+        return (reserve0, reserve1, blockTimestampLast);
+    }
+
+    function sync() external {
+        update(
+            IERC20(token0).balanceOf(address(this)),
+            IERC20(token1).balanceOf(address(this))
+        );
+    }
+
+    function swap(
+        uint256 amount0Out,
+        uint256 amount1Out,
+        address to
+    ) external {
+        require(
+            amount0Out > 0 || amount1Out > 0,
+            "UniswapV2: INSUFFICIENT_OUTPUT_AMOUNT"
+        );
+        uint256 _reserve0 = reserve0;
+        uint256 _reserve1 = reserve1;
+        require(
+            amount0Out < _reserve0 && amount1Out < _reserve1,
+            "UniswapV2: INSUFFICIENT_LIQUIDITY"
+        );
+
+        if (amount0Out > 0) IERC20(token0).safeTransfer(to, amount0Out);
+        if (amount1Out > 0) IERC20(token1).safeTransfer(to, amount1Out);
+        uint256 balance0 = IERC20(token0).balanceOf(address(this));
+        uint256 balance1 = IERC20(token1).balanceOf(address(this));
+
+        uint256 amount0In =
+            balance0 > _reserve0 - amount0Out
+                ? balance0 - (_reserve0 - amount0Out)
+                : 0;
+        uint256 amount1In =
+            balance1 > _reserve1 - amount1Out
+                ? balance1 - (_reserve1 - amount1Out)
+                : 0;
+        require(
+            amount0In > 0 || amount1In > 0,
+            "UniswapV2: INSUFFICIENT_INPUT_AMOUNT"
+        );
+        uint256 balance0Adjusted = balance0.mul(1000).sub(amount0In.mul(3));
+        uint256 balance1Adjusted = balance1.mul(1000).sub(amount1In.mul(3));
+        require(
+            balance0Adjusted.mul(balance1Adjusted) >=
+                _reserve0.mul(_reserve1).mul(1000**2),
+            "UniswapV2: K"
+        );
+
+        update(balance0, balance1);
+    }
+
+    function update(uint256 balance0, uint256 balance1) private {
+        require(
+            balance0 <= uint112(-1) && balance1 <= uint112(-1),
+            "UniswapV2: OVERFLOW"
+        );
+        uint32 blockTimestamp = uint32(block.timestamp % 2**32);
+        // the elapsed time and the UQ112x112 cumulative prices may overflow
+        uint32 timeElapsed = blockTimestamp - blockTimestampLast;
+        if (timeElapsed > 0 && reserve0 != 0 && reserve1 != 0) {
+            price0CumulativeLast +=
+                ((uint256(reserve1) << 112) / reserve0) *
+                timeElapsed;
+            price1CumulativeLast +=
+                ((uint256(reserve0) << 112) / reserve1) *
+                timeElapsed;
+        }
+        reserve0 = uint112(balance0);
+        reserve1 = uint112(balance1);
+        blockTimestampLast = blockTimestamp;
+    }
+}
+
+/// @dev test-only UniswapV2 factory
+contract MockUniswapV2Factory {
+    mapping(address => mapping(address => address)) public getPair;
+
+    address[] public allPairs;
+
+    function allPairsLength() external view returns (uint256) {
+        return allPairs.length;
+    }
+
+    function createPair(address tokenA, address tokenB)
+        external
+        returns (address pair)
+    {
+        require(tokenA != tokenB, "UniswapV2: IDENTICAL_ADDRESSES");
+        (address token0, address token1) =
+            tokenA < tokenB ? (tokenA, tokenB) : (tokenB, tokenA);
+        require(token0 != address(0), "UniswapV2: ZERO_ADDRESS");
+        require(getPair[token0][token1] == address(0), "UniswapV2: PAIR_EXISTS");
+        pair = address(new MockUniswapV2Pair(token0, token1));
+        getPair[token0][token1] = pair;
+        getPair[token1][token0] = pair;
+        allPairs.push(pair);
+    }
+}
@@ -0,0 +1,310 @@
+// SPDX-License-Identifier: GPL-3.0
+
+pragma solidity ^0.7.0;
+
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/IERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/SafeERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/math/SafeMath.sol";
+import "../../interfaces/IWETH.sol";
+import "./MockUniswapV2Factory.sol";
+
+/// @dev test-only UniswapV2Router02 covering the swap and quote functions
+/// HomoraIBSwap uses, with UniswapV2Library's amount math
+contract MockUniswapV2Router {
+    using SafeERC20 for IERC20;
+    using SafeMath for uint256;
+
+    address public immutable factory;
+
+    address public immutable WETH;
+
+    modifier ensure(uint256 deadline) {
+        require(deadline >= block.timestamp, "UniswapV2Router: EXPIRED");
+        _;
+    }
+
+    constructor(address _factory, address _WETH) {
+        factory = _factory;
+        WETH = _WETH;
+    }
+
+    receive() external payable {
+        require(msg.sender == WETH, "UniswapV2Router: NOT_WETH");
+    }
+
+    /// @dev seed the pool of tokenA and tokenB, creating it if needed
+    function addLiquidity(
+        address tokenA,
+        address tokenB,
+        uint256 amountA,
+        uint256 amountB
+    ) public {
+        address pair = getOrCreatePair(tokenA, tokenB);
+        IERC20(tokenA).safeTransferFrom(msg.sender, pair, amountA);
+        IERC20(tokenB).safeTransferFrom(msg.sender, pair, amountB);
+        MockUniswapV2Pair(pair).sync();
+    }
+
+    /// @dev seed the pool of token and WETH with the ETH sent
+    function addLiquidityETH(address token, uint256 amountToken)
+        external
+        payable
+    {
+        address pair = getOrCreatePair(token, WETH);
+        IERC20(token).safeTransferFrom(msg.sender, pair, amountToken);
+        IWETH(WETH).deposit{value: msg.value}();
+        IERC20(WETH).safeTransfer(pair, msg.value);
+        MockUniswapV2Pair(pair).sync();
+    }
+
+    function getOrCreatePair(address tokenA, address tokenB)
+        internal
+        returns (address pair)
+    {
+        pair = MockUniswapV2Factory(factory).getPair(tokenA, tokenB);
+        if (pair == address(0)) {
+            pair = MockUniswapV2Factory(factory).createPair(tokenA, tokenB);
+        }
+    }
+
+    function pairFor(address tokenA, address tokenB)
+        internal
+        view
+        returns (address pair)
+    {
+        pair = MockUniswapV2Factory(factory).getPair(tokenA, tokenB);
+        require(pair != address(0), "UniswapV2Library: PAIR_NOT_FOUND");
+    }
+
+    function getReserves(address tokenA, address tokenB)
+        internal
+        view
+        returns (uint256 reserveA, uint256 reserveB)
+    {
+        MockUniswapV2Pair pair = MockUniswapV2Pair(pairFor(tokenA, tokenB));
+        (uint256 reserve0, uint256 reserve1, ) = pair.getReserves();
+        (reserveA, reserveB) = tokenA == pair.token0()
+            ? (reserve0, reserve1)
+            : (reserve1, reserve0);
+    }
+
+    function getAmountOut(
+        uint256 amountIn,
+        uint256 reserveIn,
+        uint256 reserveOut
+    ) public pure returns (uint256) {
+        require(amountIn > 0, "UniswapV2Library: INSUFFICIENT_INPUT_AMOUNT");
+        require(
+            reserveIn > 0 && reserveOut > 0,
+            "UniswapV2Library: INSUFFICIENT_LIQUIDITY"
+        );
+        uint256 amountInWithFee = amountIn.mul(997);
+        uint256 numerator = amountInWithFee.mul(reserveOut);
+        uint256 denominator = reserveIn.mul(1000).add(amountInWithFee);
+        return numerator / denominator;
+    }
+
+    function getAmountIn(
+        uint256 amountOut,
+        uint256 reserveIn,
+        uint256 reserveOut
+    ) public pure returns (uint256) {
+        require(
+            amountOut > 0,
+            "UniswapV2Library: INSUFFICIENT_OUTPUT_AMOUNT"
+        );
+        require(
+            reserveIn > 0 && reserveOut > 0,
+            "UniswapV2Library: INSUFFICIENT_LIQUIDITY"
+        );
+        uint256 numerator = reserveIn.mul(amountOut).mul(1000);
+        uint256 denominator = reserveOut.sub(amountOut).mul(997);
+        return (numerator / denominator).add(1);
+    }
+
+    function getAmountsOut(uint256 amountIn, address[] memory path)
+        public
+        view
+        returns (uint256[] memory amounts)
+    {
+        require(path.length >= 2, "UniswapV2Library: INVALID_PATH");
+        amounts = new uint256[](path.length);
+        amounts[0] = amountIn;
+        for (uint256 i = 0; i < path.length - 1; i++) {
+            (uint256 reserveIn, uint256 reserveOut) =
+                getReserves(path[i], path[i + 1]);
+            amounts[i + 1] = getAmountOut(amounts[i], reserveIn, reserveOut);
+        }
+    }
+
+    function getAmountsIn(uint256 amountOut, address[] memory path)
+        public
+        view
+        returns (uint256[] memory amounts)
+    {
+        require(path.length >= 2, "UniswapV2Library: INVALID_PATH");
+        amounts = new uint256[](path.length);
+        amounts[amounts.length - 1] = amountOut;
+        for (uint256 i = path.length - 1; i > 0; i--) {
+            (uint256 reserveIn, uint256 reserveOut) =
+                getReserves(path[i - 1], path[i]);
+            amounts[i - 1] = getAmountIn(amounts[i], reserveIn, reserveOut);
+        }
+    }
+
+    function swapExactTokensForTokens(
+        uint256 amountIn,
+        uint256 amountOutMin,
+        address[] calldata path,
+        address to,
+        uint256 deadline
+    ) external ensure(deadline) returns (uint256[] memory amounts) {
+        amounts = getAmountsOut(amountIn, path);
+        require(
+            amounts[amounts.length - 1] >= amountOutMin,
+            "UniswapV2Router: INSUFFICIENT_OUTPUT_AMOUNT"
+        );
+        IERC20(path[0]).safeTransferFrom(
+            msg.sender,
+            pairFor(path[0], path[1]),
+            amounts[0]
+        );
+        swapAlong(amounts, path, to);
+    }
+
+    function swapTokensForExactTokens(
+        uint256 amountOut,
+        uint256 amountInMax,
+        address[] calldata path,
+        address to,
+        uint256 deadline
+    ) external ensure(deadline) returns (uint256[] memory amounts) {
+        amounts = getAmountsIn(amountOut, path);
+        require(
+            amounts[0] <= amountInMax,
+            "UniswapV2Router: EXCESSIVE_INPUT_AMOUNT"
+        );
+        IERC20(path[0]).safeTransferFrom(
+            msg.sender,
+            pairFor(path[0], path[1]),
+            amounts[0]
+        );
+        swapAlong(amounts, path, to);
+    }
+
+    function swapExactETHForTokens(
+        uint256 amountOutMin,
+        address[] calldata path,
+        address to,
+        uint256 deadline
+    ) external payable ensure(deadline) returns (uint256[] memory amounts) {
+        require(path[0] == WETH, "UniswapV2Router: INVALID_PATH");
+        amounts = getAmountsOut(msg.value, path);
+        require(
+            amounts[amounts.length - 1] >= amountOutMin,
+            "UniswapV2Router: INSUFFICIENT_OUTPUT_AMOUNT"
+        );
+        IWETH(WETH).deposit{value: amounts[0]}();
+        IERC20(WETH).safeTransfer(pairFor(path[0], path[1]), amounts[0]);
+        swapAlong(amounts, path, to);
+    }
+
+    function swapETHForExactTokens(
+        uint256 amountOut,
+        address[] calldata path,
+        address to,
+        uint256 deadline
+    ) external payable ensure(deadline) returns (uint256[] memory amounts) {
+        require(path[0] == WETH, "UniswapV2Router: INVALID_PATH");
+        amounts = getAmountsIn(amountOut, path);
+        require(
+            amounts[0] <= msg.value,
+            "UniswapV2Router: EXCESSIVE_INPUT_AMOUNT"
+        );
+        IWETH(WETH).deposit{value: amounts[0]}();
+        IERC20(WETH).safeTransfer(pairFor(path[0], path[1]), amounts[0]);
+        swapAlong(amounts, path, to);
+        if (msg.value > amounts[0]) {
+            sendETH(msg.sender, msg.value - amounts[0]);
+        }
+    }
+
+    function swapExactTokensForETH(
+        uint256 amountIn,
+        uint256 amountOutMin,
+        address[] calldata path,
+        address to,
+        uint256 deadline
+    ) external ensure(deadline) returns (uint256[] memory amounts) {
+        require(
+            path[path.length - 1] == WETH,
+            "UniswapV2Router: INVALID_PATH"
+        );
+        amounts = getAmountsOut(amountIn, path);
+        require(
+            amounts[amounts.length - 1] >= amountOutMin,
+            "UniswapV2Router: INSUFFICIENT_OUTPUT_AMOUNT"
+        );
+        IERC20(path[0]).safeTransferFrom(
+            msg.sender,
+            pairFor(path[0], path[1]),
+            amounts[0]
+        );
+        swapAlong(amounts, path, address(this));
+        IWETH(WETH).withdraw(amounts[amounts.length - 1]);
+        sendETH(to, amounts[amounts.length - 1]);
+    }
+
+    function swapTokensForExactETH(
+        uint256 amountOut,
+        uint256 amountInMax,
+        address[] calldata path,
+        address to,
+        uint256 deadline
+    ) external ensure(deadline) returns (uint256[] memory amounts) {
+        require(
+            path[path.length - 1] == WETH,
+            "UniswapV2Router: INVALID_PATH"
+        );
+        amounts = getAmountsIn(amountOut, path);
+        require(
+            amounts[0] <= amountInMax,
+            "UniswapV2Router: EXCESSIVE_INPUT_AMOUNT"
+        );
+        IERC20(path[0]).safeTransferFrom(
+            msg.sender,
+            pairFor(path[0], path[1]),
+            amounts[0]
+        );
+        swapAlong(amounts, path, address(this));
+        IWETH(WETH).withdraw(amounts[amounts.length - 1]);
+        sendETH(to, amounts[amounts.length - 1]);
+    }
+
+    /// @dev requires the initial amount to have already been sent to the
+    /// first pair
+    function swapAlong(
+        uint256[] memory amounts,
+        address[] memory path,
+        address _to
+    ) internal {
+        for (uint256 i = 0; i < path.length - 1; i++) {
+            (address input, address output) = (path[i], path[i + 1]);
+            uint256 amountOut = amounts[i + 1];
+            (uint256 amount0Out, uint256 amount1Out) =
+                input < output ? (uint256(0), amountOut) : (amountOut, 0);
+            address to =
+                i < path.length - 2 ? pairFor(output, path[i + 2]) : _to;
+            MockUniswapV2Pair(pairFor(input, output)).swap(
+                amount0Out,
+                amount1Out,
+                to
+            );
+        }
+    }
+
+    function sendETH(address to, uint256 amount) internal {
+        (bool success, ) = to.call{value: amount}("");
+        require(success, "TransferHelper: ETH_TRANSFER_FAILED");
+    }
+}
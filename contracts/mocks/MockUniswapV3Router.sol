@@ -0,0 +1,101 @@
+// SPDX-License-Identifier: GPL-3.0
+
+pragma solidity ^0.7.0;
+pragma experimental ABIEncoderV2;
+
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/IERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/token/ERC20/SafeERC20.sol";
+import "OpenZeppelin/openzeppelin-contracts@3.4.0/contracts/math/SafeMath.sol";
+import "../../interfaces/IUniswapV3SwapRouter.sol";
+
+/// @dev test-only Uniswap V3 SwapRouter covering exactInputSingle. each
+/// (pair, fee) pool is modelled as a constant-product pool over the reserves
+/// seeded with addLiquidity, charging `fee` in hundredths of a basis point
+contract MockUniswapV3Router {
+    using SafeERC20 for IERC20;
+    using SafeMath for uint256;
+
+    /// @dev token => other token => fee => reserve of token
+    mapping(address => mapping(address => mapping(uint24 => uint256)))
+        public reserves;
+
+    /// @dev seed the pool of tokenA and tokenB with fee tier `fee`
+    function addLiquidity(
+        address tokenA,
+        address tokenB,
+        uint24 fee,
+        uint256 amountA,
+        uint256 amountB
+    ) external {
+        IERC20(tokenA).safeTransferFrom(msg.sender, address(this), amountA);
+        IERC20(tokenB).safeTransferFrom(msg.sender, address(this), amountB);
+        reserves[tokenA][tokenB][fee] = reserves[tokenA][tokenB][fee].add(
+            amountA
+        );
+        reserves[tokenB][tokenA][fee] = reserves[tokenB][tokenA][fee].add(
+            amountB
+        );
+    }
+
+    function getAmountOut(
+        address tokenIn,
+        address tokenOut,
+        uint24 fee,
+        uint256 amountIn
+    ) public view returns (uint256) {
+        uint256 reserveIn = reserves[tokenIn][tokenOut][fee];
+        uint256 reserveOut = reserves[tokenOut][tokenIn][fee];
+        require(reserveIn > 0 && reserveOut > 0, "pool-not-found");
+        uint256 amountInWithFee = amountIn.mul(1e6 - fee);
+        return
+            amountInWithFee.mul(reserveOut).div(
+                reserveIn.mul(1e6).add(amountInWithFee)
+            );
+    }
+
+    function exactInputSingle(
+        IUniswapV3SwapRouter.ExactInputSingleParams calldata params
+    ) external payable returns (uint256 amountOut) {
+        require(params.deadline >= block.timestamp, "Transaction too old");
+        amountOut = getAmountOut(
+            params.tokenIn,
+            params.tokenOut,
+            params.fee,
+            params.amountIn
+        );
+        require(amountOut >= params.amountOutMinimum, "Too little received");
+        IERC20(params.tokenIn).safeTransferFrom(
+            msg.sender,
+            address(this),
+            params.amountIn
+        );
+        reserves[params.tokenIn][params.tokenOut][params.fee] = reserves[
+            params.tokenIn
+        ][params.tokenOut][params.fee]
+            .add(params.amountIn);
+        reserves[params.tokenOut][params.tokenIn][params.fee] = reserves[
+            params.tokenOut
+        ][params.tokenIn][params.fee]
+            .sub(amountOut);
+        IERC20(params.tokenOut).safeTransfer(params.recipient, amountOut);
+    }
+}
+
+/// @dev test-only Uniswap V3 Quoter over MockUniswapV3Router's pools
+contract MockUniswapV3Quoter {
+    MockUniswapV3Router public immutable router;
+
+    constructor(MockUniswapV3Router _router) {
+        router = _router;
+    }
+
+    function quoteExactInputSingle(
+        address tokenIn,
+        address tokenOut,
+        uint24 fee,
+        uint256 amountIn,
+        uint160
+    ) external view returns (uint256) {
+        return router.getAmountOut(tokenIn, tokenOut, fee, amountIn);
+    }
+}
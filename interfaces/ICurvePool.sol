@@ -0,0 +1,18 @@
+pragma solidity ^0.7.0;
+
+interface ICurvePool {
+    function coins(uint256 i) external view returns (address);
+
+    function get_dy(
+        int128 i,
+        int128 j,
+        uint256 dx
+    ) external view returns (uint256);
+
+    function exchange(
+        int128 i,
+        int128 j,
+        uint256 dx,
+        uint256 min_dy
+    ) external;
+}
@@ -2,4 +2,6 @@ pragma solidity ^0.7.0;
 
 interface CYToken {
     function exchangeRateStored() external view returns (uint256);
+
+    function exchangeRateCurrent() external returns (uint256);
 }
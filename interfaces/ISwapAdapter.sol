@@ -0,0 +1,17 @@
+pragma solidity ^0.7.0;
+
+interface ISwapAdapter {
+    function getAmountOut(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn
+    ) external returns (uint256 amountOut);
+
+    function swap(
+        address tokenIn,
+        address tokenOut,
+        uint256 amountIn,
+        uint256 amountOutMin,
+        address to
+    ) external returns (uint256 amountOut);
+}
@@ -0,0 +1,12 @@
+pragma solidity ^0.7.0;
+
+interface IUniswapV2Factory {
+    function getPair(address tokenA, address tokenB)
+        external
+        view
+        returns (address pair);
+
+    function createPair(address tokenA, address tokenB)
+        external
+        returns (address pair);
+}
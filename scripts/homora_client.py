@@ -0,0 +1,203 @@
+"""Batched HomoraIBSwap reads through a Multicall2 aggregator.
+
+Every read is described by a `Call`. `HomoraIBSwapClient.read` packs any number of them into a single
+`tryBlockAndAggregate` `eth_call`, so pricing a whole portfolio is one JSON-RPC round trip. The sync API
+reuses one `requests.Session` and the asyncio API one `aiohttp.ClientSession`, so connections are pooled
+across reads. A call that reverts (e.g. `no-route`) yields None instead of failing the whole batch.
+
+`getEstimatedAmountsOut` and `getEstimatedIBAmountsOut` quote the V2 routers only, a lower bound on what `swap`
+returns once adapters are added. `getBestIBAmountOut` also quotes the adapters; it is not a view, but the
+aggregate is sent with `eth_call` like every other read, and portfolios are priced with it.
+"""
+import itertools
+from collections import namedtuple
+
+import requests
+from eth_utils import function_signature_to_4byte_selector, to_checksum_address
+
+try:
+    from eth_abi import decode as decode_abi, encode as encode_abi
+except ImportError:  # eth-abi < 4
+    from eth_abi import decode_abi, encode_abi
+
+# function name: (signature, output types)
+FUNCTIONS = {
+    "getEstimatedAmountsOut": ("getEstimatedAmountsOut(address,address,uint256)", ["uint256[]"]),
+    "getEstimatedIBAmountsOut": ("getEstimatedIBAmountsOut(address,address,uint256[])", ["uint256[]"]),
+    "getBestIBAmountOut": ("getBestIBAmountOut(address,address,uint256)", ["uint256"]),
+    "ibToToken": ("ibToToken(address,uint256)", ["uint256"]),
+    "tokenToIB": ("tokenToIB(address,uint256)", ["uint256"]),
+    "isIBToken": ("isIBToken(address)", ["bool"]),
+}
+
+AGGREGATE_SIGNATURE = "tryBlockAndAggregate(bool,(address,bytes)[])"
+AGGREGATE_OUTPUT_TYPES = ["uint256", "bytes32", "(bool,bytes)[]"]
+
+DEFAULT_TIMEOUT = 30
+
+Call = namedtuple("Call", ["function", "args"])
+Call.__doc__ = "One HomoraIBSwap read, `function` being a key of `FUNCTIONS`."
+
+MulticallResult = namedtuple("MulticallResult", ["block_number", "values"])
+
+
+def input_types(signature):
+    types = signature[signature.index("(") + 1 : -1]
+    return types.split(",") if types else []
+
+
+def encode_call(call):
+    signature, _ = FUNCTIONS[call.function]
+    return function_signature_to_4byte_selector(signature) + encode_abi(input_types(signature), list(call.args))
+
+
+def decode_value(call, success, return_data):
+    if not success:
+        return None
+    _, output_types = FUNCTIONS[call.function]
+    values = decode_abi(output_types, bytes(return_data))
+    value = values[0]
+    return list(value) if isinstance(value, (list, tuple)) else value
+
+
+def format_block(block_identifier):
+    return hex(block_identifier) if isinstance(block_identifier, int) else block_identifier
+
+
+class HomoraIBSwapClient:
+    """Read a HomoraIBSwap deployment through a Multicall2 contract over JSON-RPC.
+
+    `session` may be passed to share a configured `requests.Session`; otherwise the client owns one.
+    """
+
+    def __init__(self, rpc_url, homora_swap, multicall, session=None, timeout=DEFAULT_TIMEOUT):
+        self.rpc_url = rpc_url
+        self.homora_swap = to_checksum_address(str(homora_swap))
+        self.multicall = to_checksum_address(str(multicall))
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.async_session = None
+        self.request_ids = itertools.count(1)
+
+    @staticmethod
+    def get_estimated_amounts_out(token_in, token_out, amount_in):
+        return Call("getEstimatedAmountsOut", (str(token_in), str(token_out), int(amount_in)))
+
+    @staticmethod
+    def get_estimated_ib_amounts_out(token_in, token_out, amounts_in):
+        return Call("getEstimatedIBAmountsOut", (str(token_in), str(token_out), [int(amount) for amount in amounts_in]))
+
+    @staticmethod
+    def get_best_ib_amount_out(token_in, token_out, amount_in):
+        return Call("getBestIBAmountOut", (str(token_in), str(token_out), int(amount_in)))
+
+    @staticmethod
+    def ib_to_token(ib_token, amount):
+        return Call("ibToToken", (str(ib_token), int(amount)))
+
+    @staticmethod
+    def token_to_ib(ib_token, amount):
+        return Call("tokenToIB", (str(ib_token), int(amount)))
+
+    @staticmethod
+    def is_ib_token(token):
+        return Call("isIBToken", (str(token),))
+
+    def build_payload(self, method, params):
+        return {"jsonrpc": "2.0", "id": next(self.request_ids), "method": method, "params": params}
+
+    def build_request(self, calls, block_identifier):
+        data = function_signature_to_4byte_selector(AGGREGATE_SIGNATURE) + encode_abi(
+            ["bool", "(address,bytes)[]"], [False, [(self.homora_swap, encode_call(call)) for call in calls]]
+        )
+        return self.build_payload(
+            "eth_call", [{"to": self.multicall, "data": "0x" + data.hex()}, format_block(block_identifier)]
+        )
+
+    @staticmethod
+    def parse_block_number(response):
+        if "error" in response:
+            raise ValueError(response["error"])
+        return int(response["result"], 16)
+
+    @staticmethod
+    def parse_response(calls, response):
+        if "error" in response:
+            raise ValueError(response["error"])
+        (block_number, _, results) = decode_abi(AGGREGATE_OUTPUT_TYPES, bytes.fromhex(response["result"][2:]))
+        values = [decode_value(call, success, return_data) for call, (success, return_data) in zip(calls, results)]
+        return MulticallResult(block_number, values)
+
+    def post(self, payload):
+        response = self.session.post(self.rpc_url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def apost(self, payload):
+        import aiohttp
+
+        if self.async_session is None:
+            self.async_session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        async with self.async_session.post(self.rpc_url, json=payload) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    def read(self, calls, block_identifier="latest"):
+        """Run `calls` in one `eth_call` and return their block number and decoded values."""
+        calls = list(calls)
+        return self.parse_response(calls, self.post(self.build_request(calls, block_identifier)))
+
+    async def aread(self, calls, block_identifier="latest"):
+        """Asyncio version of `read`, sharing one aiohttp session across calls."""
+        calls = list(calls)
+        return self.parse_response(calls, await self.apost(self.build_request(calls, block_identifier)))
+
+    def block_number(self):
+        """The latest block number, from `eth_blockNumber`."""
+        return self.parse_block_number(self.post(self.build_payload("eth_blockNumber", [])))
+
+    async def ablock_number(self):
+        """Asyncio version of `block_number`."""
+        return self.parse_block_number(await self.apost(self.build_payload("eth_blockNumber", [])))
+
+    def portfolio_calls(self, holdings, quote_token):
+        calls = []
+        for ib_token, amount in holdings.items():
+            calls.append(self.ib_to_token(ib_token, amount))
+            if str(ib_token).lower() != str(quote_token).lower():
+                calls.append(self.get_best_ib_amount_out(ib_token, quote_token, amount))
+        return calls
+
+    @staticmethod
+    def portfolio_values(holdings, quote_token, result):
+        """Map each holding to (underlying amount, value in quote_token, or None where it cannot be quoted)."""
+        values = iter(result.values)
+        priced = {}
+        for ib_token, amount in holdings.items():
+            underlying = next(values)
+            if str(ib_token).lower() == str(quote_token).lower():
+                priced[ib_token] = (underlying, amount)
+            else:
+                priced[ib_token] = (underlying, next(values))
+        return result.block_number, priced
+
+    def price_portfolio(self, holdings, quote_token, block_identifier="latest"):
+        """Value every `{ibToken: amount}` holding in `quote_token` with a single round trip.
+
+        Returns the block number read and a dict of `(underlying amount, quote_token amount)` per ibToken.
+        """
+        result = self.read(self.portfolio_calls(holdings, quote_token), block_identifier)
+        return self.portfolio_values(holdings, quote_token, result)
+
+    async def aprice_portfolio(self, holdings, quote_token, block_identifier="latest"):
+        """Asyncio version of `price_portfolio`."""
+        result = await self.aread(self.portfolio_calls(holdings, quote_token), block_identifier)
+        return self.portfolio_values(holdings, quote_token, result)
+
+    def close(self):
+        self.session.close()
+
+    async def aclose(self):
+        if self.async_session is not None:
+            await self.async_session.close()
+            self.async_session = None
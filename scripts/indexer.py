@@ -0,0 +1,195 @@
+"""Index HomoraIBSwap `Swapped` events into a local SQLite cache.
+
+Logs are fetched with `eth_getLogs` over large block ranges, halving the range whenever the node rejects
+a request, and decoded in batches straight from their topics and data words. Each sync resumes from the last
+indexed block. The hash of every block holding a swap, and of each synced range's last block, is kept so that
+a chain reorganisation is detected on the next sync and the orphaned rows are dropped and re-fetched.
+
+Amounts are stored as decimal strings since uint256 values do not fit SQLite integers.
+"""
+import sqlite3
+
+SWAPPED_SIGNATURE = "Swapped(address,address,address,uint256,uint256,uint256,uint256)"
+DEFAULT_CHUNK_SIZE = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS swaps (
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    token_in TEXT NOT NULL,
+    token_out TEXT NOT NULL,
+    amount_in TEXT NOT NULL,
+    underlying_in TEXT NOT NULL,
+    underlying_out TEXT NOT NULL,
+    amount_out TEXT NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE INDEX IF NOT EXISTS swaps_sender ON swaps (sender);
+CREATE INDEX IF NOT EXISTS swaps_pair ON swaps (token_in, token_out);
+CREATE TABLE IF NOT EXISTS blocks (number INTEGER PRIMARY KEY, hash TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS cursor (address TEXT PRIMARY KEY, block_number INTEGER NOT NULL);
+"""
+
+SWAP_COLUMNS = (
+    "block_number",
+    "log_index",
+    "tx_hash",
+    "sender",
+    "token_in",
+    "token_out",
+    "amount_in",
+    "underlying_in",
+    "underlying_out",
+    "amount_out",
+)
+
+
+def to_hex(value):
+    """Normalise a HexBytes, bytes or hex string value to a lowercase 0x-prefixed string."""
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    value = value.lower()
+    return value if value.startswith("0x") else "0x" + value
+
+
+def decode_swapped_logs(logs):
+    """Decode a batch of raw `Swapped` logs into rows of `SWAP_COLUMNS`.
+
+    The three indexed addresses are the last 20 bytes of topics 1-3 and the four amounts are the 32-byte words
+    of the log data.
+    """
+    rows = []
+    for log in logs:
+        topics = [to_hex(topic) for topic in log["topics"]]
+        data = to_hex(log["data"])[2:]
+        if len(topics) != 4 or len(data) != 4 * 64:
+            raise ValueError("not a Swapped log: {}".format(log))
+        amounts = [str(int(data[idx : idx + 64], 16)) for idx in range(0, len(data), 64)]
+        rows.append(
+            (
+                int(log["blockNumber"]),
+                int(log["logIndex"]),
+                to_hex(log["transactionHash"]),
+                *("0x" + topic[-40:] for topic in topics[1:]),
+                *amounts,
+            )
+        )
+    return rows
+
+
+class SwapIndexer:
+    """Keep a SQLite cache of the `Swapped` events emitted by one HomoraIBSwap deployment.
+
+    `web3` is a connected Web3 instance, `start_block` the block to index from on the first sync (usually the
+    deployment block) and `confirmations` how many of the latest blocks to leave unindexed. A database holds
+    the events of a single deployment.
+    """
+
+    def __init__(self, web3, address, db_path, start_block=0, chunk_size=DEFAULT_CHUNK_SIZE, confirmations=0):
+        self.web3 = web3
+        self.address = web3.toChecksumAddress(address)
+        self.topic = to_hex(web3.keccak(text=SWAPPED_SIGNATURE))
+        self.start_block = start_block
+        self.chunk_size = chunk_size
+        self.confirmations = confirmations
+        self.db = sqlite3.connect(str(db_path))
+        self.db.executescript(SCHEMA)
+        other = self.db.execute("SELECT address FROM cursor WHERE address != ?", (self.address,)).fetchone()
+        if other:
+            raise ValueError("{} already indexes {}".format(db_path, other[0]))
+
+    def close(self):
+        self.db.close()
+
+    @property
+    def last_block(self):
+        """The last block indexed so far, or None before the first sync."""
+        row = self.db.execute("SELECT block_number FROM cursor WHERE address = ?", (self.address,)).fetchone()
+        return row[0] if row else None
+
+    def sync(self, to_block=None):
+        """Index every block up to `to_block` (the latest confirmed block by default), returning the rows added."""
+        if to_block is None:
+            to_block = self.web3.eth.block_number - self.confirmations
+        from_block = self.rewind_reorged() + 1
+        added = 0
+        while from_block <= to_block:
+            end_block = min(from_block + self.chunk_size - 1, to_block)
+            try:
+                logs = self.web3.eth.get_logs(
+                    {"address": self.address, "topics": [self.topic], "fromBlock": from_block, "toBlock": end_block}
+                )
+            except ValueError:
+                # the node refused the range, e.g. too many results: retry with half of it
+                if end_block == from_block:
+                    raise
+                self.chunk_size = max(1, (end_block - from_block + 1) // 2)
+                continue
+            added += self.store(logs, end_block)
+            from_block = end_block + 1
+        return added
+
+    def store(self, logs, end_block):
+        """Write one range of logs, the hashes of their blocks and of `end_block`, and advance the cursor."""
+        rows = decode_swapped_logs(logs)
+        block_hashes = {int(log["blockNumber"]): to_hex(log["blockHash"]) for log in logs}
+        block_hashes[end_block] = to_hex(self.web3.eth.get_block(end_block)["hash"])
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO swaps ({}) VALUES ({})".format(
+                    ", ".join(SWAP_COLUMNS), ", ".join("?" * len(SWAP_COLUMNS))
+                ),
+                rows,
+            )
+            self.db.executemany("INSERT OR REPLACE INTO blocks (number, hash) VALUES (?, ?)", block_hashes.items())
+            self.db.execute(
+                "INSERT OR REPLACE INTO cursor (address, block_number) VALUES (?, ?)", (self.address, end_block)
+            )
+        return len(rows)
+
+    def rewind_reorged(self):
+        """Drop everything above the last stored block that is still canonical and return the block to resume after.
+
+        Stored blocks are checked from the newest down, so a sync on an unchanged chain costs one `eth_getBlock`.
+        """
+        last_block = self.last_block
+        if last_block is None:
+            return self.start_block - 1
+        stored = self.db.execute(
+            "SELECT number, hash FROM blocks WHERE number <= ? ORDER BY number DESC", (last_block,)
+        ).fetchall()
+        head = self.web3.eth.block_number
+        resume_block = self.start_block - 1
+        for number, block_hash in stored:
+            if number <= head and to_hex(self.web3.eth.get_block(number)["hash"]) == block_hash:
+                resume_block = number
+                break
+        if resume_block == last_block:
+            return last_block
+        with self.db:
+            self.db.execute("DELETE FROM swaps WHERE block_number > ?", (resume_block,))
+            self.db.execute("DELETE FROM blocks WHERE number > ?", (resume_block,))
+            self.db.execute(
+                "INSERT OR REPLACE INTO cursor (address, block_number) VALUES (?, ?)", (self.address, resume_block)
+            )
+        return resume_block
+
+    def swaps(self, sender=None, token_in=None, token_out=None):
+        """Query cached swaps as dicts in chain order, optionally filtered by sender and tokens."""
+        filters = [("sender", sender), ("token_in", token_in), ("token_out", token_out)]
+        clauses = ["{} = ?".format(column) for column, value in filters if value is not None]
+        params = [value.lower() for _, value in filters if value is not None]
+        query = "SELECT {} FROM swaps".format(", ".join(SWAP_COLUMNS))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY block_number, log_index"
+        return [dict(zip(SWAP_COLUMNS, row)) for row in self.db.execute(query, params)]
+
+
+def load_indexer(homora_swap, db_path, start_block=0, **kwargs):
+    """Build a `SwapIndexer` for a deployed HomoraIBSwap on brownie's active network."""
+    from brownie import web3
+
+    return SwapIndexer(web3, homora_swap.address, db_path, start_block, **kwargs)
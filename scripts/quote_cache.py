@@ -0,0 +1,228 @@
+"""Block-keyed cache in front of `HomoraIBSwapClient` reads.
+
+Quotes are pure functions of chain state, so a read is cached under `(block number, function, args)`. Reads
+without an explicit block go to the cache's head block, refreshed with `eth_blockNumber` at most once per
+`block_poll_interval` seconds or pushed with `set_block_number` (e.g. from a `newHeads` subscription), and are
+sent to the node at that block number so a cached value always matches its key. When the head advances,
+entries of older blocks are dropped. Entries are also evicted least-recently-used beyond `max_entries` and once
+older than `max_age` seconds.
+
+In the asyncio API, concurrent reads of the same key share one request: the first caller's cache misses go out
+together in one multicall and every later caller awaits that request instead of issuing its own. If the first
+caller is cancelled, so are the callers waiting on its request. The sync API caches the same way but does not
+coalesce across threads.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_AGE = 60
+DEFAULT_BLOCK_POLL_INTERVAL = 1.0
+
+MISSING = object()
+
+
+def freeze(value):
+    """A hashable, case-normalised form of call arguments."""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, str):
+        return value.lower()
+    return value
+
+
+class QuoteCache:
+    """Cache `HomoraIBSwapClient` reads per block, with LRU and age eviction and request coalescing."""
+
+    def __init__(
+        self,
+        client,
+        max_entries=DEFAULT_MAX_ENTRIES,
+        max_age=DEFAULT_MAX_AGE,
+        block_poll_interval=DEFAULT_BLOCK_POLL_INTERVAL,
+        clock=time.monotonic,
+    ):
+        self.client = client
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.block_poll_interval = block_poll_interval
+        self.clock = clock
+        # key: (value, time stored), least recently used first
+        self.entries = OrderedDict()
+        self.in_flight = {}
+        self.block_number = None
+        self.block_checked_at = None
+        self.block_request = None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.requests = 0
+        self.request_seconds = 0.0
+        self.max_request_seconds = 0.0
+        self.reads = 0
+        self.read_seconds = 0.0
+
+    def set_block_number(self, block_number):
+        """Move the head to `block_number` if it is newer, dropping every entry of an older block."""
+        self.block_checked_at = self.clock()
+        if self.block_number is not None and block_number <= self.block_number:
+            return
+        self.block_number = block_number
+        stale = [key for key in self.entries if key[0] < block_number]
+        for key in stale:
+            del self.entries[key]
+        self.evictions += len(stale)
+
+    def head_is_fresh(self):
+        return self.block_number is not None and self.clock() - self.block_checked_at < self.block_poll_interval
+
+    def lookup(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return MISSING
+        (value, stored_at) = entry
+        if self.clock() - stored_at > self.max_age:
+            del self.entries[key]
+            self.evictions += 1
+            return MISSING
+        self.entries.move_to_end(key)
+        return value
+
+    def store(self, key, value):
+        self.entries[key] = (value, self.clock())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def record_request(self, started_at):
+        elapsed = self.clock() - started_at
+        self.requests += 1
+        self.request_seconds += elapsed
+        self.max_request_seconds = max(self.max_request_seconds, elapsed)
+
+    def keys_of(self, calls, block_number):
+        return [(block_number, call.function, freeze(call.args)) for call in calls]
+
+    def get_many(self, calls, block_number=None):
+        """Read `calls` at `block_number`, or the head block, from the cache or else in one multicall."""
+        started_at = self.clock()
+        calls = list(calls)
+        if block_number is None:
+            if not self.head_is_fresh():
+                self.set_block_number(self.client.block_number())
+            block_number = self.block_number
+        keys = self.keys_of(calls, block_number)
+        values = [self.lookup(key) for key in keys]
+        misses = {}
+        for key, call, value in zip(keys, calls, values):
+            if value is not MISSING:
+                self.hits += 1
+            elif key in misses:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                misses[key] = call
+        if misses:
+            request_started_at = self.clock()
+            result = self.client.read(list(misses.values()), block_number)
+            self.record_request(request_started_at)
+            for key, value in zip(misses, result.values):
+                self.store(key, value)
+            fetched = dict(zip(misses, result.values))
+            values = [fetched[key] if value is MISSING else value for key, value in zip(keys, values)]
+        self.reads += 1
+        self.read_seconds += self.clock() - started_at
+        return values
+
+    def get(self, call, block_number=None):
+        return self.get_many([call], block_number)[0]
+
+    async def ahead_block_number(self):
+        if not self.head_is_fresh():
+            if self.block_request is None:
+                self.block_request = asyncio.ensure_future(self.client.ablock_number())
+            request = self.block_request
+            try:
+                block_number = await asyncio.shield(request)
+            finally:
+                if self.block_request is request:
+                    self.block_request = None
+            self.set_block_number(block_number)
+        return self.block_number
+
+    async def afetch(self, misses, block_number):
+        """Read the missed calls in one multicall and resolve their in-flight futures."""
+        started_at = self.clock()
+        try:
+            result = await self.client.aread([call for _, call in misses], block_number)
+        except BaseException as error:
+            # every failure, cancellation included, must resolve the futures or their waiters hang
+            for key, _ in misses:
+                future = self.in_flight.pop(key)
+                if isinstance(error, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(error)
+                    # waiting callers still see the error; this only silences asyncio's never-retrieved warning
+                    future.exception()
+            raise
+        self.record_request(started_at)
+        for (key, _), value in zip(misses, result.values):
+            self.store(key, value)
+            self.in_flight.pop(key).set_result(value)
+
+    async def aget_many(self, calls, block_number=None):
+        """Asyncio version of `get_many`, sharing requests with concurrent reads of the same keys."""
+        started_at = self.clock()
+        calls = list(calls)
+        if block_number is None:
+            block_number = await self.ahead_block_number()
+        keys = self.keys_of(calls, block_number)
+        values = [self.lookup(key) for key in keys]
+        loop = asyncio.get_event_loop()
+        pending = {}
+        misses = []
+        for key, call, value in zip(keys, calls, values):
+            if value is not MISSING:
+                self.hits += 1
+            elif key in pending or key in self.in_flight:
+                self.coalesced += 1
+                pending[key] = self.in_flight[key]
+            else:
+                self.misses += 1
+                pending[key] = self.in_flight[key] = loop.create_future()
+                misses.append((key, call))
+        if misses:
+            await self.afetch(misses, block_number)
+        if pending:
+            # shielded so that cancelling one waiter does not cancel the request for the others
+            values = [
+                await asyncio.shield(pending[key]) if value is MISSING else value for key, value in zip(keys, values)
+            ]
+        self.reads += 1
+        self.read_seconds += self.clock() - started_at
+        return values
+
+    async def aget(self, call, block_number=None):
+        return (await self.aget_many([call], block_number))[0]
+
+    def metrics(self):
+        """Counters and latencies: calls served from the cache, by another caller's request or by the node."""
+        calls = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": (self.hits + self.coalesced) / calls if calls else 0.0,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "block_number": self.block_number,
+            "requests": self.requests,
+            "mean_request_seconds": self.request_seconds / self.requests if self.requests else 0.0,
+            "max_request_seconds": self.max_request_seconds,
+            "reads": self.reads,
+            "mean_read_seconds": self.read_seconds / self.reads if self.reads else 0.0,
+        }
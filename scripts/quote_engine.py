@@ -0,0 +1,287 @@
+"""Offline mirror of HomoraIBSwap's quote views.
+
+Quotes are computed from a `QuoteSnapshot` of pair reserves and cyToken exchange rates, following the
+contract's `getPath` routing, the UniswapV2 constant-product formula with the 0.3% fee and the
+`ibToToken`/`tokenToIB` conversions. Like those views, quotes cover the V2 routers only: swap adapters are not
+modelled, so once any is added (see `QuoteSnapshot.adapters`) a quote is a lower bound on what `swap` returns,
+and `HomoraIBSwap.getBestIBAmountOut` gives the matching quote.
+
+Quotes are exact by default: they are computed on Python integers (object arrays) and match the contract
+bit-for-bit. Pass `exact=False` for a fast path, on int64 where every intermediate product fits and on float64
+otherwise. Float64 quotes can differ from the contract's in the last few units, so only use them where that is
+acceptable, e.g. to rank sizes.
+
+An amount no router can quote (zero, too small to give a non-zero amount at every hop, or along a path with no
+reserves) has no route: `get_estimated_amounts_out` raises `ValueError("no-route")` where the contract reverts,
+and `get_estimated_ib_amount_out` quotes it as 0, like the contract's ibToken quote views.
+"""
+import numpy as np
+
+FEE_NUMERATOR = 997
+FEE_DENOMINATOR = 1000
+EXCHANGE_RATE_SCALE = 10 ** 18
+INT64_MAX = np.iinfo(np.int64).max
+
+
+def as_uint_array(amounts):
+    """Convert a scalar, sequence or integer NumPy array to an object array of Python ints."""
+    array = np.asarray(amounts)
+    if array.dtype.kind in "iu":
+        array = array.astype(object)
+    elif array.dtype.kind == "O":
+        if not all(isinstance(amount, int) for amount in array.flat):
+            raise TypeError("amounts must be integers")
+    else:
+        raise TypeError("amounts must be integers, got dtype {}".format(array.dtype))
+    if (array < 0).any():
+        raise ValueError("amounts must be non-negative")
+    return array
+
+
+def as_fast_array(amounts):
+    """Convert a scalar, sequence or NumPy array of amounts to int64, or to float64 if any does not fit."""
+    array = np.asarray(amounts)
+    if array.dtype.kind == "O":
+        array = as_uint_array(array)
+    elif array.dtype.kind not in "iuf":
+        raise TypeError("amounts must be numbers, got dtype {}".format(array.dtype))
+    elif array.dtype.kind != "u" and (array < 0).any():
+        raise ValueError("amounts must be non-negative")
+    if array.dtype.kind == "f" or (array.size > 0 and array.max() > INT64_MAX):
+        return array.astype(np.float64)
+    return array.astype(np.int64)
+
+
+def mul_div(amounts, numerator, denominator, exact):
+    """`floor(amounts * numerator / denominator)`, exact on object arrays and fast otherwise."""
+    if exact:
+        return as_uint_array(amounts) * numerator // denominator
+    amounts = as_fast_array(amounts)
+    fits = numerator <= INT64_MAX and denominator <= INT64_MAX
+    if amounts.dtype == np.int64 and fits and int(amounts.max(initial=0)) * numerator <= INT64_MAX:
+        return amounts * numerator // denominator
+    return np.floor(amounts.astype(np.float64) * float(numerator) / float(denominator))
+
+
+class QuoteSnapshot:
+    """Chain state needed to quote swaps offline.
+
+    `underlyings` maps each supported ibToken to its underlying token (WETH for ibETH), `exchange_rates` maps
+    each ibToken to its cyToken's `exchangeRateStored`, and `reserves` maps `(tokenA, tokenB)` to the pair's
+    `(reserveA, reserveB)` on the default router. `extra_reserves` lists the same mapping for each router added
+    through `addRouter`, in `getRouters` order. `paths` maps `(ibTokenIn, ibTokenOut)` to a path set through
+    `setPath`. `adapters` lists the swap adapters added through `addAdapter`, which quotes do not cover.
+    """
+
+    def __init__(
+        self, weth, underlyings, exchange_rates, reserves, block_number=None, paths=None, extra_reserves=(), adapters=()
+    ):
+        self.weth = weth.lower()
+        self.underlyings = {ib.lower(): token.lower() for ib, token in underlyings.items()}
+        self.exchange_rates = {ib.lower(): int(rate) for ib, rate in exchange_rates.items()}
+        self.router_reserves = [{} for _ in range(1 + len(extra_reserves))]
+        for router, router_reserves in enumerate([reserves] + list(extra_reserves)):
+            for (token_a, token_b), (reserve_a, reserve_b) in router_reserves.items():
+                self.set_reserves(token_a, token_b, reserve_a, reserve_b, router)
+        self.paths = {
+            (token_in.lower(), token_out.lower()): [token.lower() for token in path]
+            for (token_in, token_out), path in (paths or {}).items()
+        }
+        self.block_number = block_number
+        self.adapters = [adapter.lower() for adapter in adapters]
+
+    @property
+    def reserves(self):
+        """The default router's reserves."""
+        return self.router_reserves[0]
+
+    @property
+    def extra_reserves(self):
+        return self.router_reserves[1:]
+
+    def set_reserves(self, token_a, token_b, reserve_a, reserve_b, router=0):
+        self.router_reserves[router][(token_a.lower(), token_b.lower())] = (int(reserve_a), int(reserve_b))
+        self.router_reserves[router][(token_b.lower(), token_a.lower())] = (int(reserve_b), int(reserve_a))
+
+    def get_reserves(self, token_in, token_out, router=0):
+        try:
+            return self.router_reserves[router][(token_in.lower(), token_out.lower())]
+        except KeyError:
+            raise KeyError("no reserves for pair {}/{}".format(token_in, token_out)) from None
+
+    def underlying(self, ib_token):
+        try:
+            return self.underlyings[ib_token.lower()]
+        except KeyError:
+            raise KeyError("token-not-supported: {}".format(ib_token)) from None
+
+    def exchange_rate(self, ib_token):
+        try:
+            return self.exchange_rates[ib_token.lower()]
+        except KeyError:
+            raise KeyError("token-not-supported: {}".format(ib_token)) from None
+
+
+def get_path(snapshot, token_in, token_out):
+    """Mirror of `HomoraIBSwap.getPath`: the underlying tokens to route through."""
+    path = snapshot.paths.get((token_in.lower(), token_out.lower()))
+    if path:
+        return list(path)
+    underlying_in = snapshot.underlying(token_in)
+    underlying_out = snapshot.underlying(token_out)
+    if underlying_in == snapshot.weth or underlying_out == snapshot.weth:
+        return [underlying_in, underlying_out]
+    return [underlying_in, snapshot.weth, underlying_out]
+
+
+def get_amount_out(amount_in, reserve_in, reserve_out):
+    """Mirror of `UniswapV2Library.getAmountOut` for a scalar or an int64, float64 or object array `amount_in`.
+
+    Integer inputs are computed exactly, so callers must only pass int64 arrays whose products fit.
+    """
+    if reserve_in <= 0 or reserve_out <= 0:
+        raise ValueError("UniswapV2Library: INSUFFICIENT_LIQUIDITY")
+    amount_in_with_fee = amount_in * FEE_NUMERATOR
+    numerator = amount_in_with_fee * reserve_out
+    denominator = reserve_in * FEE_DENOMINATOR + amount_in_with_fee
+    if isinstance(amount_in, np.ndarray) and amount_in.dtype.kind == "f":
+        return np.floor(numerator / denominator)
+    return numerator // denominator
+
+
+def get_amount_out_fast(amounts_in, reserve_in, reserve_out):
+    """`get_amount_out` on int64 where the products fit, else on float64."""
+    if amounts_in.dtype == np.int64 and reserve_out <= INT64_MAX:
+        bound = int(amounts_in.max(initial=0)) * FEE_NUMERATOR
+        if bound * reserve_out <= INT64_MAX and reserve_in * FEE_DENOMINATOR + bound <= INT64_MAX:
+            return get_amount_out(amounts_in, reserve_in, reserve_out)
+    return get_amount_out(amounts_in.astype(np.float64), float(reserve_in), float(reserve_out))
+
+
+def get_router_amounts_out(snapshot, router, path, amounts_in, exact):
+    """`UniswapV2Library.getAmountsOut` along `path` on one router, or None if the router has no reserves for it."""
+    hops = []
+    for token_in, token_out in zip(path, path[1:]):
+        reserves = snapshot.router_reserves[router].get((token_in.lower(), token_out.lower()))
+        if reserves is None or min(reserves) <= 0:
+            return None
+        hops.append(reserves)
+    result = [amounts_in]
+    for reserve_in, reserve_out in hops:
+        if exact:
+            result.append(get_amount_out(result[-1], reserve_in, reserve_out))
+        else:
+            result.append(get_amount_out_fast(result[-1], reserve_in, reserve_out))
+    return result
+
+
+def get_best_amounts_out(snapshot, path, amounts_in, exact=True):
+    """Mirror of `HomoraIBSwap.getBestAmountsOut`: the amounts at each hop and a mask of the amounts routed.
+
+    Every router is quoted and each amount keeps the router with the highest non-zero output, the earliest on
+    ties, as the contract does. A router cannot quote an amount whose input to some hop is 0, where its
+    `getAmountOut` reverts, but such an amount also gives 0 at the last hop, so it never wins. Amounts no router
+    quotes are not routed, and their hop amounts are 0.
+    """
+    amounts_in = as_uint_array(amounts_in) if exact else as_fast_array(amounts_in)
+    best = [np.zeros_like(amounts_in) for _ in path]
+    for router in range(len(snapshot.router_reserves)):
+        amounts = get_router_amounts_out(snapshot, router, path, amounts_in, exact)
+        if amounts is None:
+            continue
+        better = amounts[-1] > best[-1]
+        best = [np.where(better, new, old) for new, old in zip(amounts, best)]
+    return (best, best[-1] > 0)
+
+
+def get_amounts_out_along(snapshot, path, amounts_in, exact=True):
+    """Mirror of `HomoraIBSwap.getEstimatedAmountsOut` along an explicit path, one array per path entry.
+
+    Raises `ValueError("no-route")` if any amount has no route, where the contract reverts.
+    """
+    (amounts, routed) = get_best_amounts_out(snapshot, path, amounts_in, exact)
+    if not routed.all():
+        raise ValueError("no-route: {} of {} amounts along {}".format((~routed).sum(), routed.size, "/".join(path)))
+    return amounts
+
+
+def get_estimated_amounts_out(snapshot, token_in, token_out, amounts_in, exact=True):
+    """Mirror of `HomoraIBSwap.getEstimatedAmountsOut` for an array of underlying input amounts."""
+    return get_amounts_out_along(snapshot, get_path(snapshot, token_in, token_out), amounts_in, exact)
+
+
+def ib_to_token(snapshot, ib_token, ib_token_amounts, exact=True):
+    """Mirror of `HomoraIBSwap.ibToToken`."""
+    return mul_div(ib_token_amounts, snapshot.exchange_rate(ib_token), EXCHANGE_RATE_SCALE, exact)
+
+
+def token_to_ib(snapshot, ib_token, token_amounts, exact=True):
+    """Mirror of `HomoraIBSwap.tokenToIB`."""
+    return mul_div(token_amounts, EXCHANGE_RATE_SCALE, snapshot.exchange_rate(ib_token), exact)
+
+
+def get_estimated_ib_amount_out(snapshot, token_in, token_out, ib_amounts_in, exact=True):
+    """Quote ibTokenIn to ibTokenOut end to end: ibToToken, the Uniswap hops, then tokenToIB.
+
+    Mirror of `HomoraIBSwap.getEstimatedIBAmountsOut`, so a lower bound on `swap` once adapters are added.
+    Amounts with no route quote as 0.
+    """
+    underlying_in = ib_to_token(snapshot, token_in, ib_amounts_in, exact)
+    (amounts, routed) = get_best_amounts_out(snapshot, get_path(snapshot, token_in, token_out), underlying_in, exact)
+    return np.where(routed, token_to_ib(snapshot, token_out, amounts[-1], exact), 0)
+
+
+def load_snapshot(homora_swap, ib_tokens):
+    """Read a `QuoteSnapshot` for `ib_tokens` from a deployed HomoraIBSwap at the current block.
+
+    Reserves are read from the pairs of every router in `getRouters`, along the paths returned by `getPath`.
+    Pairs a router's factory does not have are left out of its reserves. Adapters are listed but not quoted.
+    """
+    from brownie import ZERO_ADDRESS, chain, interface
+
+    block_number = chain.height
+    weth = homora_swap.WETH()
+    underlyings = {}
+    exchange_rates = {}
+    for ib_token in ib_tokens:
+        (underlying, _, supported, c_token) = homora_swap.ibTokenInfo(ib_token, block_identifier=block_number)
+        if not supported:
+            raise ValueError("token-not-supported: {}".format(ib_token))
+        underlyings[ib_token] = underlying
+        exchange_rates[ib_token] = interface.CYToken(c_token).exchangeRateStored(block_identifier=block_number)
+
+    paths = {}
+    hops = set()
+    for token_in in ib_tokens:
+        for token_out in ib_tokens:
+            if token_in == token_out:
+                continue
+            path = homora_swap.getPath(token_in, token_out, block_identifier=block_number)
+            paths[(token_in, token_out)] = path
+            hops.update(tuple(sorted((hop_in.lower(), hop_out.lower()))) for hop_in, hop_out in zip(path, path[1:]))
+
+    router_reserves = []
+    for router in homora_swap.getRouters(block_identifier=block_number):
+        factory = interface.IUniswapV2Factory(interface.IUniswapV2Router02(router).factory())
+        reserves = {}
+        for token_a, token_b in hops:
+            pair_address = factory.getPair(token_a, token_b, block_identifier=block_number)
+            if pair_address == ZERO_ADDRESS:
+                continue
+            pair = interface.IUniswapV2Pair(pair_address)
+            (reserve0, reserve1, _) = pair.getReserves(block_identifier=block_number)
+            if pair.token0().lower() == token_a:
+                reserves[(token_a, token_b)] = (reserve0, reserve1)
+            else:
+                reserves[(token_a, token_b)] = (reserve1, reserve0)
+        router_reserves.append(reserves)
+    return QuoteSnapshot(
+        weth,
+        underlyings,
+        exchange_rates,
+        router_reserves[0],
+        block_number,
+        paths,
+        extra_reserves=router_reserves[1:],
+        adapters=homora_swap.getAdapters(block_identifier=block_number),
+    )
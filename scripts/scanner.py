@@ -0,0 +1,118 @@
+"""Sweep every ordered pair of supported ibTokens over a grid of trade sizes.
+
+Each pair is one batched `HomoraIBSwapClient.aread` of `getEstimatedAmountsOut` for every size plus a small
+reference size. Pairs are scanned concurrently, with at most `concurrency` requests in flight and at most
+`requests_per_second` started per second. `stream_scan` yields the rows of each pair as soon as it completes;
+`scan` collects them into a table ranked by price impact.
+
+Price impact is measured against the reference trade, `REFERENCE_DIVISOR` times smaller than the pair's
+smallest size, so the 0.3% pool fee cancels out. Pass an integer `block_identifier` to price every pair at
+the same block.
+"""
+import asyncio
+import itertools
+from collections import namedtuple
+
+REFERENCE_DIVISOR = 10 ** 4
+
+ScanRow = namedtuple(
+    "ScanRow", ["token_in", "token_out", "amount_in", "amount_out", "rate", "price_impact", "block_number"]
+)
+ScanRow.__doc__ = """One pair and size: the underlying amounts swapped, the effective rate (output per input, in
+whole tokens when decimals are known) and the price impact against the reference trade. `amount_out`, `rate`
+and `price_impact` are None where the size cannot be quoted."""
+
+
+class RateLimiter:
+    """Space out `acquire` calls to at most `rate` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self.next_time = None
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            now = asyncio.get_running_loop().time()
+            if self.next_time is not None and self.next_time > now:
+                await asyncio.sleep(self.next_time - now)
+                now = self.next_time
+            self.next_time = now + self.interval
+
+
+def pair_rows(token_in, token_out, amounts, result, decimals):
+    """Turn one pair's batch result (reference quote first, then one per size) into `ScanRow`s."""
+    scale = 10 ** decimals.get(token_in, 0) / 10 ** decimals.get(token_out, 0)
+    (reference, *quotes) = result.values
+    reference_amount = reference_amount_of(amounts)
+    reference_rate = reference[-1] / reference_amount if reference and reference[-1] else None
+    rows = []
+    for amount_in, quote in zip(amounts, quotes):
+        if not quote:
+            rows.append(ScanRow(token_in, token_out, amount_in, None, None, None, result.block_number))
+            continue
+        amount_out = quote[-1]
+        raw_rate = amount_out / amount_in
+        price_impact = 1 - raw_rate / reference_rate if reference_rate else None
+        rows.append(
+            ScanRow(token_in, token_out, amount_in, amount_out, raw_rate * scale, price_impact, result.block_number)
+        )
+    return rows
+
+
+def reference_amount_of(amounts):
+    return max(1, min(amounts) // REFERENCE_DIVISOR)
+
+
+async def stream_scan(
+    client, ib_tokens, sizes, concurrency=8, requests_per_second=None, decimals=None, block_identifier="latest"
+):
+    """Yield the `ScanRow`s of every ordered pair of `ib_tokens` as each pair completes.
+
+    `sizes` maps each ibToken to the underlying input amounts to quote it at, and `decimals` optionally maps
+    ibTokens to the decimals of their underlying, to express rates in whole tokens.
+    """
+    decimals = {str(token).lower(): value for token, value in (decimals or {}).items()}
+    sizes = {str(token).lower(): [int(amount) for amount in amounts] for token, amounts in sizes.items()}
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(requests_per_second) if requests_per_second else None
+
+    async def scan_pair(token_in, token_out):
+        amounts = sizes[token_in]
+        calls = [
+            client.get_estimated_amounts_out(token_in, token_out, amount)
+            for amount in [reference_amount_of(amounts)] + amounts
+        ]
+        async with semaphore:
+            if limiter is not None:
+                await limiter.acquire()
+            result = await client.aread(calls, block_identifier)
+        return pair_rows(token_in, token_out, amounts, result, decimals)
+
+    tokens = [str(token).lower() for token in ib_tokens]
+    tasks = [
+        asyncio.ensure_future(scan_pair(token_in, token_out))
+        for token_in, token_out in itertools.permutations(tokens, 2)
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            for row in await task:
+                yield row
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def rank(rows):
+    """Order rows by price impact, lowest first, with unquotable sizes last."""
+    return sorted(rows, key=lambda row: (row.price_impact is None, row.price_impact or 0))
+
+
+async def scan(client, ib_tokens, sizes, on_row=None, **kwargs):
+    """Run `stream_scan` to completion, calling `on_row` for each row as it arrives, and return the ranked table."""
+    rows = []
+    async for row in stream_scan(client, ib_tokens, sizes, **kwargs):
+        if on_row is not None:
+            on_row(row)
+        rows.append(row)
+    return rank(rows)
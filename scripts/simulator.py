@@ -0,0 +1,201 @@
+"""In-memory replay of `HomoraIBSwap.swap` over large batches of trades.
+
+A swap is modelled exactly as the contract executes it against its UniswapV2 routers:
+
+1. SafeBox withdraw: `floor(amountIn * rateIn / 1e18)` underlying.
+2. The UniswapV2 hops along `getPath` on the router quoting the highest output, each moving that router's
+   pool reserves.
+3. SafeBox deposit: `floor(underlyingOut * 1e18 / rateOut)` ibTokens.
+
+cyToken exchange rates are held fixed over a batch (update them with `set_exchange_rate` between batches).
+Arithmetic uses Python integers, so results match the chain bit-for-bit.
+
+Swap adapters are not modelled, so a snapshot with adapters is rejected: once the contract has any, a swap may
+go through one whose pool state the snapshot does not hold.
+
+Trades that change reserves must run in order, so the hops run in a tight scalar loop over precomputed routes,
+quoting each router in turn. The withdraw and deposit steps are vectorised per token. `quote_independent`
+quotes every trade against the same starting state and is fully vectorised per pair, through the quote engine.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from scripts.quote_engine import (
+    EXCHANGE_RATE_SCALE,
+    FEE_DENOMINATOR,
+    FEE_NUMERATOR,
+    QuoteSnapshot,
+    as_uint_array,
+    get_estimated_ib_amount_out,
+    get_path,
+)
+
+SimulationResult = namedtuple("SimulationResult", ["underlying_in", "underlying_out", "amounts_out", "executed"])
+SimulationResult.__doc__ = """Per-trade object arrays of the underlying withdrawn, the underlying received from the
+last hop and the ibTokens minted, plus a boolean array that is False where the contract would revert; those
+trades leave the reserves untouched and report 0 underlying_out and amounts_out."""
+
+
+def as_token_array(tokens, size):
+    array = np.asarray(tokens, dtype=object)
+    if array.ndim == 0:
+        return np.full(size, str(array.item()).lower(), dtype=object)
+    lowered = {token: str(token).lower() for token in set(array.tolist())}
+    return np.array([lowered[token] for token in array.tolist()], dtype=object)
+
+
+class SwapSimulator:
+    """Replay swaps against a private copy of a `QuoteSnapshot`'s reserves."""
+
+    def __init__(self, snapshot):
+        if snapshot.adapters:
+            raise ValueError("the simulator does not model swap adapters, the snapshot has some")
+        self.snapshot = QuoteSnapshot(
+            snapshot.weth,
+            snapshot.underlyings,
+            snapshot.exchange_rates,
+            {},
+            snapshot.block_number,
+            snapshot.paths,
+        )
+        # per router, each pool's reserves live in one list shared by both of its directed keys, so a hop
+        # updates both
+        self.router_pools = []
+        for router_reserves in snapshot.router_reserves:
+            pools = {}
+            for (token_a, token_b), (reserve_a, reserve_b) in router_reserves.items():
+                if (token_b, token_a) not in pools:
+                    pools[(token_a, token_b)] = [reserve_a, reserve_b]
+            self.router_pools.append(pools)
+        self.routes = {}
+
+    @property
+    def pools(self):
+        """The default router's pools."""
+        return self.router_pools[0]
+
+    def get_reserves(self, token_a, token_b, router=0):
+        token_a, token_b = token_a.lower(), token_b.lower()
+        pools = self.router_pools[router]
+        if (token_a, token_b) in pools:
+            return tuple(pools[(token_a, token_b)])
+        (reserve_b, reserve_a) = pools[(token_b, token_a)]
+        return (reserve_a, reserve_b)
+
+    def set_exchange_rate(self, ib_token, rate):
+        self.snapshot.exchange_rates[ib_token.lower()] = int(rate)
+
+    def route(self, token_in, token_out):
+        """The hops of a pair on each router as (pool reserves list, index of the input reserve), cached per pair.
+
+        Routers missing a pool along the path cannot quote the pair and are left out, in `getRouters` order.
+        """
+        key = (token_in, token_out)
+        if key not in self.routes:
+            path = get_path(self.snapshot, token_in, token_out)
+            self.routes[key] = []
+            for pools in self.router_pools:
+                hops = []
+                for hop_in, hop_out in zip(path, path[1:]):
+                    if (hop_in, hop_out) in pools:
+                        hops.append((pools[(hop_in, hop_out)], 0))
+                    elif (hop_out, hop_in) in pools:
+                        hops.append((pools[(hop_out, hop_in)], 1))
+                    else:
+                        break
+                else:
+                    self.routes[key].append(hops)
+        return self.routes[key]
+
+    def simulate(self, tokens_in, tokens_out, amounts_in, amounts_out_min=0):
+        """Execute the trades in order, updating reserves after each, and return a `SimulationResult`.
+
+        Each trade goes through the router quoting the highest output for it, the earliest on ties, as
+        `swap` picks one. A trade no router can quote is not executed.
+
+        `tokens_in` and `tokens_out` are arrays of ibToken addresses (or single addresses for every trade) and
+        `amounts_in` / `amounts_out_min` integer arrays of ibToken amounts.
+        """
+        amounts_in = as_uint_array(amounts_in)
+        size = len(amounts_in)
+        tokens_in = as_token_array(tokens_in, size)
+        tokens_out = as_token_array(tokens_out, size)
+        amounts_out_min = np.broadcast_to(as_uint_array(amounts_out_min), (size,))
+
+        underlying_in = amounts_in * self.rates_of(tokens_in) // EXCHANGE_RATE_SCALE
+        rates_out = self.rates_of(tokens_out)
+        # the scalar loop runs over plain lists, which index much faster than object arrays
+        pair_routes = {pair: self.route(*pair) for pair in set(zip(tokens_in.tolist(), tokens_out.tolist()))}
+        routes = [pair_routes[pair] for pair in zip(tokens_in.tolist(), tokens_out.tolist())]
+        underlying_out = [0] * size
+        executed = [False] * size
+
+        fee_numerator = FEE_NUMERATOR
+        fee_denominator = FEE_DENOMINATOR
+        scale = EXCHANGE_RATE_SCALE
+        for idx, (router_hops, amount_in, rate_out, amount_out_min) in enumerate(
+            zip(routes, underlying_in.tolist(), rates_out.tolist(), amounts_out_min.tolist())
+        ):
+            if amount_in == 0:
+                continue
+            best_out = 0
+            for hops in router_hops:
+                amount = amount_in
+                amounts = []
+                for reserves, side in hops:
+                    amount_with_fee = amount * fee_numerator
+                    denominator = reserves[side] * fee_denominator + amount_with_fee
+                    amount = amount_with_fee * reserves[1 - side] // denominator
+                    amounts.append(amount)
+                    if amount == 0:
+                        break
+                if amount > best_out:
+                    (best_out, best_hops, best_amounts) = (amount, hops, amounts)
+            if best_out == 0 or best_out * scale // rate_out < amount_out_min:
+                continue
+            # the trade goes through: apply every hop to its pool on the chosen router
+            amount = amount_in
+            for (reserves, side), amount_out in zip(best_hops, best_amounts):
+                reserves[side] += amount
+                reserves[1 - side] -= amount_out
+                amount = amount_out
+            underlying_out[idx] = amount
+            executed[idx] = True
+
+        underlying_out = np.array(underlying_out, dtype=object)
+        amounts_out = underlying_out * scale // rates_out
+        return SimulationResult(underlying_in, underlying_out, amounts_out, np.array(executed, dtype=bool))
+
+    def quote_independent(self, tokens_in, tokens_out, amounts_in):
+        """Quote every trade against the current reserves without applying any, vectorised per pair.
+
+        Quotes are exact, and a trade too small to quote gets 0.
+        """
+        amounts_in = as_uint_array(amounts_in)
+        size = len(amounts_in)
+        tokens_in = as_token_array(tokens_in, size)
+        tokens_out = as_token_array(tokens_out, size)
+        (reserves, *extra_reserves) = [
+            {key: tuple(reserves) for key, reserves in pools.items()} for pools in self.router_pools
+        ]
+        snapshot = QuoteSnapshot(
+            self.snapshot.weth,
+            self.snapshot.underlyings,
+            self.snapshot.exchange_rates,
+            reserves,
+            self.snapshot.block_number,
+            self.snapshot.paths,
+            extra_reserves=extra_reserves,
+        )
+        amounts_out = np.zeros(size, dtype=object)
+        for token_in, token_out in set(zip(tokens_in, tokens_out)):
+            mask = (tokens_in == token_in) & (tokens_out == token_out)
+            amounts_out[mask] = get_estimated_ib_amount_out(snapshot, token_in, token_out, amounts_in[mask])
+        return amounts_out
+
+    def rates_of(self, ib_tokens):
+        rates = np.zeros(len(ib_tokens), dtype=object)
+        for ib_token in set(ib_tokens):
+            rates[ib_tokens == ib_token] = self.snapshot.exchange_rate(ib_token)
+        return rates
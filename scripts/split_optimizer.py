@@ -0,0 +1,55 @@
+"""Choose the route weights of `HomoraIBSwap.swapSplit` for a given trade size.
+
+The underlying amount is cut into `steps` equal slices. Each candidate (router, path) is quoted at every multiple
+of a slice in one `getRouteAmountsOut` call. Slices are then handed out greedily, each to the route with the
+highest marginal output. Constant-product output is concave in the input, so the greedy allocation is optimal on
+the grid as long as the candidate routes do not share a pool.
+"""
+from collections import namedtuple
+
+DEFAULT_STEPS = 20
+
+SplitPlan = namedtuple("SplitPlan", ["routes", "underlying_in", "underlying_out", "amount_out"])
+SplitPlan.__doc__ = """`routes` lists the `(router, path, weight)` to pass to `swapSplit`, with zero-weight routes
+dropped. The other fields are the expected underlying amounts and ibToken output, up to the rounding of the
+on-chain split."""
+
+
+def candidate_routes(homora_swap, token_in, token_out, extra_paths=()):
+    """Every added router along the pair's `getPath` and along each of `extra_paths`."""
+    paths = [list(homora_swap.getPath(token_in, token_out))] + [list(path) for path in extra_paths]
+    return [(str(router), path) for router in homora_swap.getRouters() for path in paths]
+
+
+def greedy_allocate(curves, steps):
+    """Split `steps` slices across routes, where `curves[i][k]` is route i's output for k slices."""
+    weights = [0] * len(curves)
+    for _ in range(steps):
+        gains = [curve[weight + 1] - curve[weight] for curve, weight in zip(curves, weights)]
+        best = max(range(len(curves)), key=gains.__getitem__)
+        if gains[best] <= 0:
+            break
+        weights[best] += 1
+    return weights
+
+
+def optimize_split(homora_swap, token_in, token_out, amount_in, routes=None, steps=DEFAULT_STEPS):
+    """Compute the output-maximising `SplitPlan` for swapping `amount_in` of ibToken `token_in` to `token_out`.
+
+    `routes` defaults to `candidate_routes` and may list any `(router, path)` accepted by `swapSplit`.
+    """
+    if routes is None:
+        routes = candidate_routes(homora_swap, token_in, token_out)
+    underlying_in = homora_swap.ibToToken(token_in, amount_in)
+    grid = [underlying_in * step // steps for step in range(1, steps + 1)]
+    curves = [[0] + list(homora_swap.getRouteAmountsOut(router, path, grid)) for router, path in routes]
+    weights = greedy_allocate(curves, steps)
+    if not any(weights):
+        raise ValueError("no-route")
+    underlying_out = sum(curve[weight] for curve, weight in zip(curves, weights))
+    return SplitPlan(
+        [(router, path, weight) for (router, path), weight in zip(routes, weights) if weight],
+        underlying_in,
+        underlying_out,
+        homora_swap.tokenToIB(token_out, underlying_out),
+    )
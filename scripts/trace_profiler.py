@@ -0,0 +1,181 @@
+"""Attribute the gas of `HomoraIBSwap` transactions to pipeline stages and external contracts.
+
+A transaction's expanded call trace (brownie's `tx.trace`, from `debug_traceTransaction` on a local dev chain)
+is folded into a tree of call frames. A frame's inclusive gas is the gas left at its CALL opcode minus the gas
+left once execution is back at the caller's depth, so it includes the call's own access and memory costs.
+
+Each external call made directly by HomoraIBSwap opens a stage, chosen by the function called, and every call
+nested under it (the cyToken redeem under a SafeBox `withdraw`, the pairs under a router swap) is charged to
+that stage. Gas spent in HomoraIBSwap itself is charged to `logic`. `overhead` is the transaction's gas used
+minus its execution gas: intrinsic and calldata gas less any storage refund.
+
+Profiles of many transactions add up into one report and one folded-stack file, which `flamegraph.pl` or
+speedscope render as a flame graph.
+"""
+from collections import Counter
+
+STAGES = {
+    "transferFrom": "pull",
+    "withdraw": "withdraw",
+    "swapExactTokensForTokens": "swap",
+    "swapExactETHForTokens": "swap",
+    "swapExactTokensForETH": "swap",
+    "swapTokensForExactTokens": "swap",
+    "swapETHForExactTokens": "swap",
+    "swapTokensForExactETH": "swap",
+    "getAmountsOut": "quote",
+    "getAmountsIn": "quote",
+    "exchangeRateCurrent": "quote",
+    "exchangeRateStored": "quote",
+    "deposit": "deposit",
+    "transfer": "transfer",
+    "balanceOf": "balance",
+}
+LOGIC_STAGE = "logic"
+OVERHEAD_STAGE = "overhead"
+OTHER_STAGE = "other"
+
+
+class Frame:
+    """A call frame: the contract and function called, its inclusive gas and the calls it made."""
+
+    __slots__ = ("contract", "function", "gas", "children")
+
+    def __init__(self, contract, function, gas=0):
+        self.contract = contract
+        self.function = function
+        self.gas = gas
+        self.children = []
+
+    @property
+    def name(self):
+        return "{}.{}".format(self.contract, self.function)
+
+    @property
+    def self_gas(self):
+        return self.gas - sum(child.gas for child in self.children)
+
+
+def function_name(subcall):
+    """The function name of a brownie subcall, or its selector when the ABI is unknown."""
+    if "function" in subcall:
+        return subcall["function"].split("(")[0]
+    calldata = subcall.get("calldata", "")
+    if calldata.startswith("0x"):
+        calldata = calldata[2:]
+    return "0x" + calldata[:8] if calldata else "fallback"
+
+
+def build_frames(steps, subcalls, contract, function):
+    """Fold trace `steps` into a `Frame` tree rooted at the called `contract.function`.
+
+    `steps` are structLogs carrying at least `depth`, `gas` and `gasCost`, with brownie's `contractName` when
+    known. `subcalls` lists the calls in the order execution enters them, as in brownie's `tx.subcalls`.
+    """
+    root = Frame(contract, function)
+    if not steps:
+        return root
+    calls = iter(subcalls)
+    # (frame, its depth, gas left when it was entered)
+    stack = [(root, steps[0]["depth"], steps[0]["gas"])]
+    for prev, step in zip(steps, steps[1:]):
+        while step["depth"] < stack[-1][1]:
+            (frame, _, gas_before) = stack.pop()
+            frame.gas = gas_before - step["gas"]
+        if step["depth"] > prev["depth"]:
+            subcall = next(calls, {})
+            frame = Frame(step.get("contractName") or subcall.get("to", "unknown"), function_name(subcall))
+            stack[-1][0].children.append(frame)
+            stack.append((frame, step["depth"], prev["gas"]))
+    last = steps[-1]
+    for frame, _, gas_before in stack:
+        frame.gas = gas_before - (last["gas"] - last["gasCost"])
+    return root
+
+
+def transaction_frames(tx):
+    """The `Frame` tree of a brownie `TransactionReceipt`."""
+    return build_frames(tx.trace, tx.subcalls, tx.contract_name, tx.fn_name)
+
+
+class TraceProfile:
+    """Gas and call counts, per stage and per contract, summed over profiled transactions.
+
+    `contract_gas` and `folded` hold exclusive gas, so each sums to the execution gas of every transaction.
+    """
+
+    def __init__(self):
+        self.transactions = 0
+        self.gas_used = 0
+        self.stage_gas = Counter()
+        self.stage_calls = Counter()
+        self.contract_gas = Counter()
+        self.contract_calls = Counter()
+        self.folded = Counter()
+
+    def add_frames(self, root, gas_used):
+        """Add one transaction's `Frame` tree, given its total gas used."""
+        self.transactions += 1
+        self.gas_used += gas_used
+        overhead = gas_used - root.gas
+        self.stage_gas[OVERHEAD_STAGE] += overhead
+        if overhead > 0:
+            self.folded["{};{}".format(root.name, OVERHEAD_STAGE)] += overhead
+        self.stage_gas[LOGIC_STAGE] += root.self_gas
+        self.contract_gas[root.contract] += root.self_gas
+        self.folded["{};{}".format(root.name, LOGIC_STAGE)] += root.self_gas
+        for child in root.children:
+            stage = STAGES.get(child.function, OTHER_STAGE)
+            self.add_subtree(child, stage, "{};{}".format(root.name, stage))
+
+    def add_subtree(self, frame, stage, prefix):
+        stack = "{};{}".format(prefix, frame.name)
+        self.stage_gas[stage] += frame.self_gas
+        self.stage_calls[stage] += 1
+        self.contract_gas[frame.contract] += frame.self_gas
+        self.contract_calls[frame.contract] += 1
+        self.folded[stack] += frame.self_gas
+        for child in frame.children:
+            self.add_subtree(child, stage, stack)
+
+    def add_transaction(self, tx):
+        """Add a brownie `TransactionReceipt`; its trace must be available from the node."""
+        self.add_frames(transaction_frames(tx), tx.gas_used)
+
+    def report(self):
+        """A text table of gas, share of the total, calls and gas per transaction by stage and by contract."""
+        lines = []
+        for title, gas, calls in [
+            ("stage", self.stage_gas, self.stage_calls),
+            ("contract", self.contract_gas, self.contract_calls),
+        ]:
+            lines.append("{:<28} {:>12} {:>7} {:>7} {:>10}".format(title, "gas", "share", "calls", "gas/tx"))
+            for key, value in gas.most_common():
+                lines.append(
+                    "{:<28} {:>12} {:>6.1%} {:>7} {:>10}".format(
+                        key,
+                        value,
+                        value / max(self.gas_used, 1),
+                        calls.get(key, "-"),
+                        value // max(self.transactions, 1),
+                    )
+                )
+            lines.append("")
+        lines.append("{} transactions, {} gas used".format(self.transactions, self.gas_used))
+        return "\n".join(lines) + "\n"
+
+    def write_folded(self, path):
+        """Write the folded stacks, one `frame;frame;... gas` line each, skipping zero-gas stacks."""
+        with open(path, "w") as file:
+            for stack, gas in sorted(self.folded.items()):
+                if gas > 0:
+                    file.write("{} {}\n".format(stack, gas))
+
+
+def profile_transactions(txs, profile=None):
+    """Profile brownie `TransactionReceipt`s into a new or existing `TraceProfile`."""
+    if profile is None:
+        profile = TraceProfile()
+    for tx in txs:
+        profile.add_transaction(tx)
+    return profile
@@ -0,0 +1,108 @@
+"""Keeper for `HomoraIBSwapTWAP` orders.
+
+Open orders are kept in a heap keyed by the time their next slice is due, so until something is due a tick costs
+one `ordersLength` read, plus one `orders` read per newly created order. Due orders go out together in
+`executeSlices` transactions of at most `batch_size` orders. Executed slices are rescheduled from the
+transaction's `SliceExecuted` events without reading the orders back. An order whose slice was skipped, e.g.
+below its minimum rate, is read back once: it is dropped if it was cancelled and otherwise retried
+`retry_delay` seconds later.
+
+`clock` returns the chain's current timestamp, e.g. brownie's `chain.time`.
+"""
+import heapq
+import time
+
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_RETRY_DELAY = 60
+
+# fields of `HomoraIBSwapTWAP.orders`
+OWNER = 0
+INTERVAL = 6
+NEXT_EXECUTION = 7
+
+
+class TWAPKeeper:
+    """Execute the due slices of every open `HomoraIBSwapTWAP` order from `keeper`, collecting the bounties."""
+
+    def __init__(self, twap, keeper, clock, batch_size=DEFAULT_BATCH_SIZE, retry_delay=DEFAULT_RETRY_DELAY):
+        self.twap = twap
+        self.keeper = keeper
+        self.clock = clock
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        # (next execution, order id) of every open order
+        self.schedule = []
+        # open order id: interval
+        self.intervals = {}
+        self.next_order_id = 0
+        self.transactions = 0
+        self.executed = 0
+        self.skipped = 0
+
+    def sync(self):
+        """Schedule the orders created since the last sync."""
+        length = self.twap.ordersLength()
+        for order_id in range(self.next_order_id, length):
+            self.track(order_id, self.twap.orders(order_id))
+        self.next_order_id = length
+
+    def track(self, order_id, order, not_before=0):
+        """Schedule an order read from the contract, or forget it if it is closed."""
+        if int(order[OWNER], 16) == 0:
+            self.intervals.pop(order_id, None)
+            return
+        self.intervals[order_id] = order[INTERVAL]
+        heapq.heappush(self.schedule, (max(order[NEXT_EXECUTION], not_before), order_id))
+
+    def due(self, now):
+        """Pop the ids of the orders due at `now`, soonest first."""
+        order_ids = []
+        while self.schedule and self.schedule[0][0] <= now:
+            order_ids.append(heapq.heappop(self.schedule)[1])
+        return order_ids
+
+    def tick(self):
+        """Sync new orders and execute every due slice, returning the transactions sent."""
+        self.sync()
+        order_ids = self.due(self.clock())
+        txs = []
+        for start in range(0, len(order_ids), self.batch_size):
+            batch = order_ids[start : start + self.batch_size]
+            tx = self.twap.executeSlices(batch, {"from": self.keeper})
+            self.transactions += 1
+            self.reschedule(batch, tx)
+            txs.append(tx)
+        return txs
+
+    def reschedule(self, order_ids, tx):
+        executed = set()
+        events = tx.events["SliceExecuted"] if "SliceExecuted" in tx.events else []
+        for event in events:
+            order_id = event["orderId"]
+            executed.add(order_id)
+            if event["slicesLeft"] == 0:
+                del self.intervals[order_id]
+            else:
+                heapq.heappush(self.schedule, (tx.timestamp + self.intervals[order_id], order_id))
+        self.executed += len(executed)
+        for order_id in order_ids:
+            if order_id not in executed:
+                self.skipped += 1
+                self.track(order_id, self.twap.orders(order_id), tx.timestamp + self.retry_delay)
+
+    def run(self, poll_interval, ticks=None, sleep=time.sleep):
+        """Tick every `poll_interval` seconds, forever or `ticks` times."""
+        count = 0
+        while ticks is None or count < ticks:
+            self.tick()
+            count += 1
+            if ticks is None or count < ticks:
+                sleep(poll_interval)
+
+    def metrics(self):
+        return {
+            "open_orders": len(self.intervals),
+            "transactions": self.transactions,
+            "executed": self.executed,
+            "skipped": self.skipped,
+        }
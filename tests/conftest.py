@@ -0,0 +1,220 @@
+import pytest
+from brownie import (
+    accounts,
+    chain,
+    CurveStableSwapAdapter,
+    HomoraIBSwap,
+    HomoraIBSwapBatchAuction,
+    HomoraIBSwapTWAP,
+    MockCyToken,
+    MockERC20,
+    MockMulticall2,
+    MockSafeBox,
+    MockSafeBoxETH,
+    MockStableSwapPool,
+    MockUniswapV2Factory,
+    MockUniswapV2Router,
+    MockUniswapV3Quoter,
+    MockUniswapV3Router,
+    MockWETH,
+    UniswapV3Adapter,
+)
+
+# cyToken exchange rates (underlying per cyToken, scaled by 1e18) for 8-decimal cyTokens
+ETH_EXCHANGE_RATE = 2 * 10 ** 26
+USDT_EXCHANGE_RATE = 2 * 10 ** 14
+USDC_EXCHANGE_RATE = 21 * 10 ** 13
+DAI_EXCHANGE_RATE = 205 * 10 ** 24
+
+# pool sizes, at an ETH price of 2000 USD
+POOL_ETH = 30 * 10 ** 18
+POOL_USD = 60000
+
+# the batch auction's minimum and maximum mid price averaging windows, in seconds
+MID_PRICE_PERIOD = 600
+MID_PRICE_MAX_PERIOD = 3600
+
+# a swap deadline far in the future, shared by the test modules
+deadline = 1e21
+
+
+def check_expected(expected, actual, percent_threshold):
+    return abs(actual - expected) / expected * 100 < percent_threshold
+
+
+@pytest.fixture(scope="session")
+def deployer():
+    return accounts[0]
+
+
+@pytest.fixture(scope="session")
+def liquidity_provider():
+    return accounts[2]
+
+
+@pytest.fixture(scope="session")
+def weth(deployer):
+    return MockWETH.deploy({"from": deployer})
+
+
+@pytest.fixture(scope="session")
+def usdt(deployer):
+    return MockERC20.deploy("Tether USD", "USDT", 6, {"from": deployer})
+
+
+@pytest.fixture(scope="session")
+def usdc(deployer):
+    return MockERC20.deploy("USD Coin", "USDC", 6, {"from": deployer})
+
+
+@pytest.fixture(scope="session")
+def dai(deployer):
+    return MockERC20.deploy("Dai Stablecoin", "DAI", 18, {"from": deployer})
+
+
+@pytest.fixture(scope="session")
+def ibeth(deployer, weth):
+    cy_token = MockCyToken.deploy(weth, ETH_EXCHANGE_RATE, {"from": deployer})
+    return MockSafeBoxETH.deploy(cy_token, "Interest Bearing Ether v2", "ibETHv2", {"from": deployer})
+
+
+@pytest.fixture(scope="session")
+def ibusdt(deployer, usdt):
+    cy_token = MockCyToken.deploy(usdt, USDT_EXCHANGE_RATE, {"from": deployer})
+    return MockSafeBox.deploy(cy_token, "Interest Bearing USDT v2", "ibUSDTv2", {"from": deployer})
+
+
+@pytest.fixture(scope="session")
+def ibusdc(deployer, usdc):
+    cy_token = MockCyToken.deploy(usdc, USDC_EXCHANGE_RATE, {"from": deployer})
+    return MockSafeBox.deploy(cy_token, "Interest Bearing USDC v2", "ibUSDCv2", {"from": deployer})
+
+
+@pytest.fixture(scope="session")
+def ibdai(deployer, dai):
+    cy_token = MockCyToken.deploy(dai, DAI_EXCHANGE_RATE, {"from": deployer})
+    return MockSafeBox.deploy(cy_token, "Interest Bearing DAI v2", "ibDAIv2", {"from": deployer})
+
+
+def deploy_uniswap(deployer, provider, weth, eth_pools, token_pools=()):
+    """Deploy a mock UniswapV2 factory and router and seed its pools.
+
+    `eth_pools` lists `(token, token_amount, eth_amount)` and `token_pools` lists
+    `(token_a, amount_a, token_b, amount_b)`.
+    """
+    factory = MockUniswapV2Factory.deploy({"from": deployer})
+    router = MockUniswapV2Router.deploy(factory, weth, {"from": deployer})
+    for (token, token_amount, eth_amount) in eth_pools:
+        token.mint(provider, token_amount, {"from": provider})
+        token.approve(router, token_amount, {"from": provider})
+        router.addLiquidityETH(token, token_amount, {"from": provider, "value": eth_amount})
+    for (token_a, amount_a, token_b, amount_b) in token_pools:
+        for (token, amount) in [(token_a, amount_a), (token_b, amount_b)]:
+            token.mint(provider, amount, {"from": provider})
+            token.approve(router, amount, {"from": provider})
+        router.addLiquidity(token_a, token_b, amount_a, amount_b, {"from": provider})
+    return router
+
+
+@pytest.fixture(scope="session")
+def uniswap_router(deployer, liquidity_provider, weth, usdt, usdc, dai):
+    return deploy_uniswap(
+        deployer,
+        liquidity_provider,
+        weth,
+        [
+            (usdt, POOL_USD * 10 ** 6, POOL_ETH),
+            (usdc, POOL_USD * 10 ** 6, POOL_ETH),
+            (dai, POOL_USD * 10 ** 18, POOL_ETH),
+        ],
+        [(usdt, POOL_USD * 10 ** 6, usdc, POOL_USD * 10 ** 6)],
+    )
+
+
+@pytest.fixture(scope="session")
+def sushiswap_router(deployer, weth, usdt, usdc):
+    # a second router where ETH is 5% cheaper against USDT
+    return deploy_uniswap(
+        deployer,
+        accounts[3],
+        weth,
+        [(usdt, POOL_USD * 95 * 10 ** 4, POOL_ETH), (usdc, POOL_USD * 10 ** 6, POOL_ETH)],
+    )
+
+
+@pytest.fixture(scope="session")
+def account(weth, usdt, usdc, dai, ibeth, ibusdt, ibusdc, ibdai):
+    """The governor and swapper, holding every ibToken."""
+    account = accounts[1]
+    ibeth.deposit({"from": account, "value": 20 * 10 ** 18})
+    for (token, safebox, amount) in [
+        (usdt, ibusdt, 10 ** 6 * 10 ** 6),
+        (usdc, ibusdc, 10 ** 6 * 10 ** 6),
+        (dai, ibdai, 10 ** 6 * 10 ** 18),
+    ]:
+        token.mint(account, amount, {"from": account})
+        token.approve(safebox, amount, {"from": account})
+        safebox.deposit(amount, {"from": account})
+    return account
+
+
+@pytest.fixture(scope="session")
+def homora_earn_swap(account, uniswap_router, ibeth, ibusdt, ibusdc, ibdai):
+    homora_earn_swap = HomoraIBSwap.deploy(uniswap_router, ibeth, {"from": account})
+    homora_earn_swap.addIBTokens([ibusdt, ibusdc, ibdai], {"from": account})
+    return homora_earn_swap
+
+
+@pytest.fixture
+def multicall(deployer):
+    return MockMulticall2.deploy({"from": deployer})
+
+
+@pytest.fixture
+def batch_auction(deployer, homora_earn_swap):
+    return HomoraIBSwapBatchAuction.deploy(homora_earn_swap, MID_PRICE_PERIOD, MID_PRICE_MAX_PERIOD, {"from": deployer})
+
+
+@pytest.fixture
+def twap(deployer, homora_earn_swap):
+    return HomoraIBSwapTWAP.deploy(homora_earn_swap, {"from": deployer})
+
+
+@pytest.fixture
+def uniswap_v3_adapter(account, liquidity_provider, usdt, usdc):
+    """A V3 adapter routing USDT/USDC through a deep 0.05% pool, not yet added to HomoraIBSwap."""
+    router = MockUniswapV3Router.deploy({"from": account})
+    quoter = MockUniswapV3Quoter.deploy(router, {"from": account})
+    amount = 10 * POOL_USD * 10 ** 6
+    for token in [usdt, usdc]:
+        token.mint(liquidity_provider, amount, {"from": liquidity_provider})
+        token.approve(router, amount, {"from": liquidity_provider})
+    router.addLiquidity(usdt, usdc, 500, amount, amount, {"from": liquidity_provider})
+    adapter = UniswapV3Adapter.deploy(router, quoter, {"from": account})
+    adapter.setFee(usdt, usdc, 500, {"from": account})
+    return adapter
+
+
+@pytest.fixture
+def stable_swap_adapter(account, liquidity_provider, dai, usdc, usdt):
+    """An adapter over a 3pool-like DAI/USDC/USDT stable-swap pool, not yet added to HomoraIBSwap."""
+    coins = [dai, usdc, usdt]
+    pool = MockStableSwapPool.deploy(coins, [18, 6, 6], 2000, 4 * 10 ** 6, {"from": account})
+    amounts = [10 * POOL_USD * 10 ** token.decimals() for token in coins]
+    for token, amount in zip(coins, amounts):
+        token.mint(liquidity_provider, amount, {"from": liquidity_provider})
+        token.approve(pool, amount, {"from": liquidity_provider})
+    pool.addLiquidity(amounts, {"from": liquidity_provider})
+    return CurveStableSwapAdapter.deploy(pool, len(coins), {"from": account})
+
+
+@pytest.fixture(autouse=True)
+def isolation(account, homora_earn_swap, sushiswap_router):
+    """Snapshot the chain after the session-wide deployment and revert to it after every test.
+
+    Every session-scoped fixture that deploys or changes chain state must be requested here, so
+    that it runs before the first snapshot rather than inside a test that gets reverted.
+    """
+    chain.snapshot()
+    yield
+    chain.revert()
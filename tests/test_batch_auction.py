@@ -0,0 +1,123 @@
+import brownie
+from brownie import chain
+
+from conftest import MID_PRICE_MAX_PERIOD, MID_PRICE_PERIOD, check_expected, deadline
+
+
+def observe_mid_price(batch_auction, token_in, token_out):
+    batch_auction.updatePrices(token_in, token_out)
+    chain.sleep(MID_PRICE_PERIOD)
+    batch_auction.updatePrices(token_in, token_out)
+
+
+# opposing orders are matched at the mid price and only the net imbalance is swapped on the router
+def test_settle_nets_opposing_orders(account, batch_auction, homora_earn_swap, ibusdt, ibusdc):
+    trader = brownie.accounts[5]
+    ibusdc.transfer(trader, 4 * 10 ** 12, {"from": account})
+    for (owner, token) in [(account, ibusdt), (trader, ibusdc)]:
+        token.approve(batch_auction, 1e36, {"from": owner})
+    orders = [
+        (account, ibusdt, ibusdc, 3 * 10 ** 12),
+        (trader, ibusdc, ibusdt, 10 ** 12),
+        (account, ibusdt, ibusdc, 2 * 10 ** 12),
+        (trader, ibusdc, ibusdt, 2 * 10 ** 12),
+    ]
+    # each order asks for at least what swapping it alone would give
+    separate = [
+        homora_earn_swap.getEstimatedIBAmountsOut(token_in, token_out, [amount_in])[0]
+        for (_, token_in, token_out, amount_in) in orders
+    ]
+    for ((owner, token_in, token_out, amount_in), amount_out_min) in zip(orders, separate):
+        batch_auction.postOrder(token_in, token_out, amount_in, amount_out_min, deadline, {"from": owner})
+    observe_mid_price(batch_auction, ibusdt, ibusdc)
+    usdc_value = batch_auction.getMidAmountOut(ibusdc, ibusdt, 3 * 10 ** 12)
+    usdt_matched = 3 * 10 ** 12 * usdc_value // batch_auction.getMidAmountOut(ibusdt, ibusdc, usdc_value)
+
+    usdt_before = ibusdt.balanceOf(trader)
+    usdc_before = ibusdc.balanceOf(account)
+    tx = batch_auction.settle(ibusdt, ibusdc, [0, 1, 2, 3], {"from": brownie.accounts[6]})
+    amounts_out = tx.return_value
+
+    # ibUSDT is the larger side: only its excess over the matched ibUSDC goes to the router
+    (swapped,) = tx.events["Swapped"]
+    assert swapped["tokenIn"] == ibusdt
+    assert check_expected(5 * 10 ** 12 - usdt_matched, swapped["amountIn"], 0.01)
+    assert tx.events["BatchSettled"]["netIn"] == swapped["amountIn"]
+
+    # ibUSDC sellers get the mid price, split pro rata; ibUSDT sellers share the ibUSDC and the router output
+    assert check_expected(usdc_value // 3, amounts_out[1], 0.01)
+    assert check_expected(usdc_value * 2 // 3, amounts_out[3], 0.01)
+    assert ibusdt.balanceOf(trader) - usdt_before == amounts_out[1] + amounts_out[3]
+    assert ibusdc.balanceOf(account) - usdc_before == amounts_out[0] + amounts_out[2]
+    assert check_expected(amounts_out[0] * 2 // 3, amounts_out[2], 0.01)
+    assert all(amount_out > quote for amount_out, quote in zip(amounts_out, separate))
+
+    # every escrowed token was paid out and the orders are closed
+    assert ibusdt.balanceOf(batch_auction) == 0
+    assert ibusdc.balanceOf(batch_auction) == 0
+    assert batch_auction.orders(0)[0] == brownie.ZERO_ADDRESS
+
+
+# orders are refunded on cancel, and anyone may cancel an expired order back to its owner
+def test_cancel_order(account, batch_auction, ibusdt, ibusdc):
+    ibusdt.approve(batch_auction, 1e36, {"from": account})
+    before = ibusdt.balanceOf(account)
+    batch_auction.postOrder(ibusdt, ibusdc, 10 ** 12, 1, deadline, {"from": account})
+    batch_auction.postOrder(ibusdt, ibusdc, 10 ** 12, 1, chain.time() + 60, {"from": account})
+    assert ibusdt.balanceOf(account) == before - 2 * 10 ** 12
+    batch_auction.cancelOrder(0, {"from": account})
+    chain.sleep(120)
+    batch_auction.cancelOrder(1, {"from": brownie.accounts[5]})
+    assert ibusdt.balanceOf(account) == before
+    assert batch_auction.ordersLength() == 2
+
+
+# the mid price is a time-weighted average, so trades on the pools do not move it until a window has passed
+def test_mid_price_ignores_pool_moves(account, batch_auction, homora_earn_swap, ibusdt, ibusdc):
+    with brownie.reverts("no-mid-price"):
+        batch_auction.getMidAmountOut(ibusdt, ibusdc, 10 ** 12)
+    observe_mid_price(batch_auction, ibusdt, ibusdc)
+    mid = batch_auction.getMidAmountOut(ibusdt, ibusdc, 10 ** 12)
+    assert check_expected(homora_earn_swap.getEstimatedIBAmountsOut(ibusdt, ibusdc, [10 ** 12])[0], mid, 2)
+
+    # push the ibUSDT price down hard, then observe again before the window has passed
+    ibusdt.approve(homora_earn_swap, 1e36, {"from": account})
+    homora_earn_swap.swap(ibusdt, ibusdc, 10 ** 14, 0, deadline, {"from": account})
+    batch_auction.updatePrices(ibusdt, ibusdc)
+    assert batch_auction.getMidAmountOut(ibusdt, ibusdc, 10 ** 12) == mid
+
+    # a full window later the average follows the new reserves
+    chain.sleep(MID_PRICE_PERIOD)
+    batch_auction.updatePrices(ibusdt, ibusdc)
+    moved = batch_auction.getMidAmountOut(ibusdt, ibusdc, 10 ** 12)
+    assert homora_earn_swap.getEstimatedIBAmountsOut(ibusdt, ibusdc, [10 ** 12])[0] < moved < mid
+
+
+# after a long idle gap the old observation is too stale to average from: settling waits for a fresh window, so
+# orders clear at the moved price rather than one averaged mostly over the gap
+def test_mid_price_restarts_after_idle_gap(account, batch_auction, homora_earn_swap, ibusdt, ibusdc):
+    trader = brownie.accounts[5]
+    ibusdc.transfer(trader, 10 ** 12, {"from": account})
+    ibusdt.approve(batch_auction, 1e36, {"from": account})
+    ibusdc.approve(batch_auction, 1e36, {"from": trader})
+    batch_auction.postOrder(ibusdt, ibusdc, 10 ** 12, 1, deadline, {"from": account})
+    batch_auction.postOrder(ibusdc, ibusdt, 10 ** 12, 1, deadline, {"from": trader})
+    observe_mid_price(batch_auction, ibusdt, ibusdc)
+    mid = batch_auction.getMidAmountOut(ibusdt, ibusdc, 10 ** 12)
+
+    # a long idle gap, then push the ibUSDT price down hard just before settling
+    chain.sleep(10 * MID_PRICE_MAX_PERIOD)
+    ibusdt.approve(homora_earn_swap, 1e36, {"from": account})
+    homora_earn_swap.swap(ibusdt, ibusdc, 10 ** 14, 0, deadline, {"from": account})
+    with brownie.reverts("no-mid-price"):
+        batch_auction.settle(ibusdt, ibusdc, [0, 1], {"from": trader})
+
+    # a full window after the restart the average follows the new reserves
+    observe_mid_price(batch_auction, ibusdt, ibusdc)
+    moved = batch_auction.getMidAmountOut(ibusdt, ibusdc, 10 ** 12)
+    spot = homora_earn_swap.getEstimatedIBAmountsOut(ibusdt, ibusdc, [10 ** 9])[0] * 1000
+    assert moved < mid * 0.8
+    assert check_expected(spot, moved, 1)
+    # ibUSDC is now the larger side, so the ibUSDT order is matched in full at the moved mid price
+    tx = batch_auction.settle(ibusdt, ibusdc, [0, 1], {"from": trader})
+    assert tx.return_value[0] == moved
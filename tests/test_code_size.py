@@ -0,0 +1,22 @@
+import pytest
+from brownie import (
+    CurveStableSwapAdapter,
+    HomoraIBSwap,
+    HomoraIBSwapBatchAuction,
+    HomoraIBSwapTWAP,
+    UniswapV3Adapter,
+)
+
+# EIP-170 caps the runtime bytecode of a contract at 24KB
+MAX_CODE_SIZE = 0x6000
+
+
+# every deployable contract fits under the EIP-170 limit, which mainnet enforces but a dev chain may not
+@pytest.mark.parametrize(
+    "container",
+    [HomoraIBSwap, HomoraIBSwapBatchAuction, HomoraIBSwapTWAP, UniswapV3Adapter, CurveStableSwapAdapter],
+    ids=lambda container: container._name,
+)
+def test_code_size(container):
+    size = len(container._build["deployedBytecode"]) // 2
+    assert size <= MAX_CODE_SIZE, "{} is {} bytes, over the {} byte limit".format(container._name, size, MAX_CODE_SIZE)
@@ -0,0 +1,181 @@
+"""Property-based fuzzing of swap and swapForExactOut.
+
+Every example draws a pair, an amount, a minimum output, a deadline, new cyToken exchange rates for the pair and
+extra liquidity for the pools on its path, then checks that the swap either matches its quote exactly and meets
+its minimum, or reverts, and that nothing is left in the contract. Brownie reverts the chain between examples.
+
+Each example sends up to a dozen transactions to the dev chain, so its transaction rate bounds the run. Examples
+per test default to 50, to keep `brownie test` short, and can be set with FUZZ_EXAMPLES. The suite shards
+across cores with one isolated dev chain per worker:
+
+    brownie test tests/test_fuzz.py -n auto
+"""
+import os
+
+import brownie
+from brownie import accounts, chain, MockCyToken, MockERC20, MockUniswapV2Factory, MockUniswapV2Pair
+from brownie.test import given, strategy
+from hypothesis import HealthCheck, settings
+from hypothesis import strategies as st
+
+IB_TOKENS = ["ibeth", "ibusdt", "ibusdc", "ibdai"]
+PAIRS = [(token_in, token_out) for token_in in IB_TOKENS for token_out in IB_TOKENS if token_in != token_out]
+
+# the account holds about 1e11 ibETH and 5e15 of each stable ibToken; fuzzed amounts stay within a tenth of that
+MAX_AMOUNT_IN = {"ibeth": 10 ** 10, "ibusdt": 5 * 10 ** 14, "ibusdc": 5 * 10 ** 14, "ibdai": 5 * 10 ** 14}
+
+fuzz_settings = settings(
+    max_examples=int(os.environ.get("FUZZ_EXAMPLES", 50)),
+    deadline=None,
+    suppress_health_check=[HealthCheck.function_scoped_fixture, HealthCheck.too_slow],
+)
+
+pairs = st.sampled_from(PAIRS)
+# per mille of MAX_AMOUNT_IN, so every pair draws amounts on its own scale
+amount_fractions = strategy("uint256", min_value=1, max_value=1000)
+# the cyToken exchange rates of tokenIn and tokenOut are scaled by a factor in [0.5, 2]
+rate_factors = st.lists(strategy("uint256", min_value=500, max_value=2000), min_size=2, max_size=2)
+# extra liquidity added to each side of each pool on the path, in per mille of its reserve (a tenth of that on
+# the WETH side, as dev accounts hold little ETH)
+liquidity = st.lists(strategy("uint256", min_value=0, max_value=3000), min_size=4, max_size=4)
+# amountOutMin relative to the quote, in per mille
+min_out_factors = strategy("uint256", min_value=0, max_value=1100)
+# seconds from now; negative deadlines have passed
+deadline_offsets = st.one_of(
+    st.integers(min_value=-(10 ** 6), max_value=-1000), st.integers(min_value=1000, max_value=10 ** 6)
+)
+
+
+def perturb(homora_earn_swap, uniswap_router, weth, token_in, token_out, rate_factors, liquidity):
+    """Scale the cyToken rates of a pair and top up both sides of the default router's pools on its path.
+
+    Only the state the swap reads is touched, which keeps the transactions per example down.
+    """
+    for ib_token, factor in zip([token_in, token_out], rate_factors):
+        c_token = MockCyToken.at(ib_token.cToken())
+        c_token.setExchangeRate(c_token.exchangeRateStored() * factor // 1000, {"from": accounts[0]})
+    factory = MockUniswapV2Factory.at(uniswap_router.factory())
+    provider = accounts[4]
+    path = homora_earn_swap.getPath(token_in, token_out)
+    for idx, (hop_in, hop_out) in enumerate(zip(path, path[1:])):
+        pair = MockUniswapV2Pair.at(factory.getPair(hop_in, hop_out))
+        reserves = pair.getReserves()
+        sides = zip([pair.token0(), pair.token1()], reserves[:2], liquidity[2 * idx : 2 * idx + 2])
+        for token, reserve, extra in sides:
+            amount = reserve * extra // 1000
+            if token == weth:
+                amount //= 10
+            if amount == 0:
+                continue
+            if token == weth:
+                weth.deposit({"from": provider, "value": amount})
+                weth.transfer(pair, amount, {"from": provider})
+            else:
+                MockERC20.at(token).mint(pair, amount, {"from": provider})
+        pair.sync({"from": provider})
+
+
+def assert_no_leftovers(homora_earn_swap, ib_tokens):
+    assert homora_earn_swap.balance() == 0
+    for ib_token in ib_tokens:
+        assert ib_token.balanceOf(homora_earn_swap) == 0
+        assert MockERC20.at(ib_token.uToken()).balanceOf(homora_earn_swap) == 0
+
+
+@fuzz_settings
+@given(
+    pair=pairs,
+    amount_fraction=amount_fractions,
+    rate_factors=rate_factors,
+    liquidity=liquidity,
+    min_out_factor=min_out_factors,
+    deadline_offset=deadline_offsets,
+)
+def test_fuzz_swap(
+    request,
+    account,
+    homora_earn_swap,
+    uniswap_router,
+    weth,
+    ibeth,
+    ibusdt,
+    ibusdc,
+    ibdai,
+    pair,
+    amount_fraction,
+    rate_factors,
+    liquidity,
+    min_out_factor,
+    deadline_offset,
+):
+    ib_tokens = [ibeth, ibusdt, ibusdc, ibdai]
+    (token_in, token_out) = (request.getfixturevalue(name) for name in pair)
+    perturb(homora_earn_swap, uniswap_router, weth, token_in, token_out, rate_factors, liquidity)
+    amount_in = MAX_AMOUNT_IN[pair[0]] * amount_fraction // 1000
+    quote = homora_earn_swap.getEstimatedIBAmountsOut(token_in, token_out, [amount_in])[0]
+    amount_out_min = quote * min_out_factor // 1000
+    deadline = chain.time() + deadline_offset
+
+    token_in.approve(homora_earn_swap, amount_in, {"from": account})
+    in_before = token_in.balanceOf(account)
+    out_before = token_out.balanceOf(account)
+    if deadline_offset < 0 or amount_out_min > quote:
+        with brownie.reverts():
+            homora_earn_swap.swap(token_in, token_out, amount_in, amount_out_min, deadline, {"from": account})
+        return
+
+    tx = homora_earn_swap.swap(token_in, token_out, amount_in, amount_out_min, deadline, {"from": account})
+    assert tx.return_value == quote
+    assert tx.return_value >= amount_out_min
+    assert in_before - token_in.balanceOf(account) == amount_in
+    assert token_out.balanceOf(account) - out_before == tx.return_value
+    assert_no_leftovers(homora_earn_swap, ib_tokens)
+
+
+@fuzz_settings
+@given(
+    pair=pairs,
+    amount_fraction=amount_fractions,
+    rate_factors=rate_factors,
+    liquidity=liquidity,
+    max_in_factor=strategy("uint256", min_value=900, max_value=1500),
+)
+def test_fuzz_swap_for_exact_out(
+    request,
+    account,
+    homora_earn_swap,
+    uniswap_router,
+    weth,
+    ibeth,
+    ibusdt,
+    ibusdc,
+    ibdai,
+    pair,
+    amount_fraction,
+    rate_factors,
+    liquidity,
+    max_in_factor,
+):
+    ib_tokens = [ibeth, ibusdt, ibusdc, ibdai]
+    (token_in, token_out) = (request.getfixturevalue(name) for name in pair)
+    perturb(homora_earn_swap, uniswap_router, weth, token_in, token_out, rate_factors, liquidity)
+    reference_in = MAX_AMOUNT_IN[pair[0]] * amount_fraction // 1000
+    amount_out = homora_earn_swap.getEstimatedIBAmountsOut(token_in, token_out, [reference_in])[0] // 2
+    amount_in_max = reference_in * max_in_factor // 1000
+
+    token_in.approve(homora_earn_swap, amount_in_max, {"from": account})
+    in_before = token_in.balanceOf(account)
+    out_before = token_out.balanceOf(account)
+    try:
+        tx = homora_earn_swap.swapForExactOut(
+            token_in, token_out, amount_out, amount_in_max, chain.time() + 3600, {"from": account}
+        )
+    except brownie.exceptions.VirtualMachineError:
+        # only a dust-sized target may fail to route
+        assert amount_out == 0
+        return
+
+    assert tx.return_value <= amount_in_max
+    assert in_before - token_in.balanceOf(account) == tx.return_value
+    assert token_out.balanceOf(account) - out_before >= amount_out
+    assert_no_leftovers(homora_earn_swap, ib_tokens)
@@ -0,0 +1,152 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+from brownie import HomoraIBSwap
+
+from conftest import deadline
+
+BUDGETS_PATH = Path(__file__).parent / "gas_budgets.json"
+REPORT_DIR = Path(__file__).parent.parent / "reports"
+
+# set GAS_BUDGET_UPDATE=1 to record this run's gas in gas_budgets.json, with headroom; budgets of functions
+# and cases the run did not measure are kept
+BUDGET_HEADROOM = 1.05
+
+# set GAS_BASELINE to the gas_report.json of another revision to add its gas, and the change, to the report
+
+# (tokenIn, tokenOut, amountIn) for each pair type
+PAIR_TYPES = {
+    "eth->token": ("ibeth", "ibusdc", 992637183),
+    "token->eth": ("ibusdt", "ibeth", 10 ** 12),
+    "token->weth->token": ("ibusdt", "ibusdc", 10 ** 12),
+    "token->weth->dai": ("ibusdt", "ibdai", 10 ** 12),
+}
+
+
+@pytest.fixture(autouse=True)
+def approvals(account, homora_earn_swap, ibeth, ibusdt):
+    for ib_token in [ibeth, ibusdt]:
+        ib_token.approve(homora_earn_swap, 1e36, {"from": account})
+
+
+@pytest.fixture
+def pair(request):
+    """Resolve a PAIR_TYPES entry to (tokenIn, tokenOut, amountIn) with deployed ibTokens."""
+
+    def resolve(pair_type):
+        (token_in, token_out, amount_in) = PAIR_TYPES[pair_type]
+        return (request.getfixturevalue(token_in), request.getfixturevalue(token_out), amount_in)
+
+    return resolve
+
+
+@pytest.fixture(scope="module")
+def gas_report():
+    budgets = json.loads(BUDGETS_PATH.read_text())
+    report = {}
+    yield lambda function, case, gas_used: record(budgets, report, function, case, gas_used)
+    write_report(report)
+    if os.environ.get("GAS_BUDGET_UPDATE"):
+        updated = json.loads(BUDGETS_PATH.read_text())
+        for function, cases in report.items():
+            updated.setdefault(function, {}).update(
+                {case: int(gas_used * BUDGET_HEADROOM) for case, gas_used in cases.items()}
+            )
+        BUDGETS_PATH.write_text(json.dumps(updated, indent=2, sort_keys=True) + "\n")
+
+
+def record(budgets, report, function, case, gas_used):
+    report.setdefault(function, {})[str(case)] = gas_used
+    if os.environ.get("GAS_BUDGET_UPDATE"):
+        return
+    budget = budgets.get(function, {}).get(str(case))
+    if budget is None:
+        pytest.fail("no gas budget for {}[{}], record one with GAS_BUDGET_UPDATE=1".format(function, case))
+    assert gas_used <= budget, "{}[{}] used {} gas, over its budget of {}".format(function, case, gas_used, budget)
+
+
+def write_report(report):
+    REPORT_DIR.mkdir(exist_ok=True)
+    (REPORT_DIR / "gas_report.json").write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    budgets = json.loads(BUDGETS_PATH.read_text())
+    baseline = json.loads(Path(os.environ["GAS_BASELINE"]).read_text()) if os.environ.get("GAS_BASELINE") else {}
+    row = "{:<26} {:<20} {:>10} {:>10} {:>10} {:>8}"
+    lines = [row.format("function", "case", "gas", "budget", "before", "change")]
+    for function in sorted(report):
+        for case, gas_used in sorted(report[function].items()):
+            budget = budgets.get(function, {}).get(case, "-")
+            before = baseline.get(function, {}).get(case)
+            change = "{:+.1%}".format(gas_used / before - 1) if before else "-"
+            lines.append(row.format(function, case, gas_used, budget, before or "-", change))
+    table = "\n".join(lines) + "\n"
+    (REPORT_DIR / "gas_report.txt").write_text(table)
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 3])
+def test_gas_add_ib_tokens(account, uniswap_router, ibeth, ibusdt, ibusdc, ibdai, gas_report, batch_size):
+    homora_earn_swap = HomoraIBSwap.deploy(uniswap_router, ibeth, {"from": account})
+    tx = homora_earn_swap.addIBTokens([ibusdt, ibusdc, ibdai][:batch_size], {"from": account})
+    gas_report("addIBTokens", batch_size, tx.gas_used)
+
+
+@pytest.mark.parametrize("pair_type", PAIR_TYPES)
+def test_gas_get_estimated_amounts_out(homora_earn_swap, gas_report, pair, pair_type):
+    (token_in, token_out, amount_in) = pair(pair_type)
+    underlying_amount_in = homora_earn_swap.ibToToken(token_in, amount_in)
+    gas_used = homora_earn_swap.getEstimatedAmountsOut.estimate_gas(token_in, token_out, underlying_amount_in)
+    gas_report("getEstimatedAmountsOut", pair_type, gas_used)
+
+
+@pytest.mark.parametrize("batch_size", [1, 10, 50])
+def test_gas_get_estimated_ib_amounts_out(homora_earn_swap, ibusdt, ibusdc, gas_report, batch_size):
+    amounts_in = [10 ** 9 * (idx + 1) for idx in range(batch_size)]
+    gas_used = homora_earn_swap.getEstimatedIBAmountsOut.estimate_gas(ibusdt, ibusdc, amounts_in)
+    gas_report("getEstimatedIBAmountsOut", batch_size, gas_used)
+
+
+@pytest.mark.parametrize("ib_token,case", [("ibeth", "eth"), ("ibusdt", "token")])
+def test_gas_exchange_rate_conversions(request, homora_earn_swap, gas_report, ib_token, case):
+    ib_token = request.getfixturevalue(ib_token)
+    gas_report("ibToToken", case, homora_earn_swap.ibToToken.estimate_gas(ib_token, 10 ** 12))
+    gas_report("tokenToIB", case, homora_earn_swap.tokenToIB.estimate_gas(ib_token, 10 ** 12))
+
+
+@pytest.mark.parametrize("pair_type", PAIR_TYPES)
+def test_gas_swap(account, homora_earn_swap, gas_report, pair, pair_type):
+    (token_in, token_out, amount_in) = pair(pair_type)
+    tx = homora_earn_swap.swap(token_in, token_out, amount_in, 0, deadline, {"from": account})
+    gas_report("swap", pair_type, tx.gas_used)
+
+
+@pytest.mark.parametrize("pair_type", PAIR_TYPES)
+def test_gas_swap_for_exact_out(account, homora_earn_swap, gas_report, pair, pair_type):
+    (token_in, token_out, amount_in) = pair(pair_type)
+    amount_out = homora_earn_swap.getEstimatedIBAmountsOut(token_in, token_out, [amount_in])[0] // 2
+    tx = homora_earn_swap.swapForExactOut(token_in, token_out, amount_out, amount_in, deadline, {"from": account})
+    gas_report("swapForExactOut", pair_type, tx.gas_used)
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 3])
+def test_gas_swap_many(account, homora_earn_swap, gas_report, pair, batch_size):
+    legs = [pair(pair_type) + (0,) for pair_type in PAIR_TYPES]
+    tx = homora_earn_swap.swapMany(legs[:batch_size], deadline, {"from": account})
+    gas_report("swapMany", batch_size, tx.gas_used)
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 3])
+def test_gas_consolidate(account, homora_earn_swap, ibeth, ibusdt, ibdai, ibusdc, gas_report, batch_size):
+    ibdai.approve(homora_earn_swap, 1e36, {"from": account})
+    (tokens_in, amounts_in) = ([ibeth, ibusdt, ibdai][:batch_size], [992637183, 10 ** 12, 10 ** 12][:batch_size])
+    tx = homora_earn_swap.consolidate(tokens_in, amounts_in, ibusdc, 0, deadline, {"from": account})
+    gas_report("consolidate", batch_size, tx.gas_used)
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 3])
+def test_gas_execute_slices(account, twap, ibusdt, ibusdc, gas_report, batch_size):
+    ibusdt.approve(twap, 1e36, {"from": account})
+    for _ in range(batch_size):
+        twap.createOrder(ibusdt, ibusdc, 2 * 10 ** 12, 2, 3600, 10 ** 17, 10, {"from": account})
+    tx = twap.executeSlices(list(range(batch_size)), {"from": account})
+    gas_report("executeSlices", batch_size, tx.gas_used)
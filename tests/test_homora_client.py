@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+import requests
+from brownie import web3
+
+from scripts.homora_client import HomoraIBSwapClient
+
+
+class CountingSession(requests.Session):
+    def __init__(self):
+        super().__init__()
+        self.posts = 0
+
+    def post(self, *args, **kwargs):
+        self.posts += 1
+        return super().post(*args, **kwargs)
+
+
+@pytest.fixture
+def client(homora_earn_swap, multicall):
+    client = HomoraIBSwapClient(web3.provider.endpoint_uri, homora_earn_swap, multicall, session=CountingSession())
+    yield client
+    client.close()
+
+
+def batch_calls(client, weth, ibeth, ibusdt, ibusdc):
+    return [
+        client.is_ib_token(ibusdt),
+        client.is_ib_token(weth),
+        client.ib_to_token(ibusdt, 10 ** 12),
+        client.token_to_ib(ibeth, 10 ** 18),
+        client.get_estimated_amounts_out(ibusdt, ibusdc, 10 ** 8),
+        # reverts with no-route
+        client.get_estimated_amounts_out(weth, ibusdc, 10 ** 8),
+    ]
+
+
+def expected_values(homora_earn_swap, weth, ibeth, ibusdt, ibusdc):
+    return [
+        True,
+        False,
+        homora_earn_swap.ibToToken(ibusdt, 10 ** 12),
+        homora_earn_swap.tokenToIB(ibeth, 10 ** 18),
+        list(homora_earn_swap.getEstimatedAmountsOut(ibusdt, ibusdc, 10 ** 8)),
+        None,
+    ]
+
+
+# every read of a batch is answered by a single eth_call
+def test_client_read(client, homora_earn_swap, weth, ibeth, ibusdt, ibusdc):
+    result = client.read(batch_calls(client, weth, ibeth, ibusdt, ibusdc))
+    assert client.session.posts == 1
+    assert result.values == expected_values(homora_earn_swap, weth, ibeth, ibusdt, ibusdc)
+
+
+def test_client_async_read(client, homora_earn_swap, weth, ibeth, ibusdt, ibusdc):
+    async def read():
+        try:
+            return await asyncio.gather(
+                client.aread(batch_calls(client, weth, ibeth, ibusdt, ibusdc)),
+                client.aread([client.is_ib_token(ibusdc)]),
+            )
+        finally:
+            await client.aclose()
+
+    (result, single) = asyncio.run(read())
+    assert result.values == expected_values(homora_earn_swap, weth, ibeth, ibusdt, ibusdc)
+    assert single.values == [True]
+
+
+# a whole portfolio is priced in ibusdc with one round trip
+def test_client_price_portfolio(client, homora_earn_swap, ibeth, ibusdt, ibusdc, ibdai):
+    holdings = {ibeth: 10 ** 9, ibusdt: 10 ** 12, ibusdc: 10 ** 12, ibdai: 10 ** 12}
+    (block_number, priced) = client.price_portfolio(holdings, ibusdc)
+    assert client.session.posts == 1
+    assert block_number >= web3.eth.block_number
+    for ib_token, amount in holdings.items():
+        (underlying, value) = priced[ib_token]
+        assert underlying == homora_earn_swap.ibToToken(ib_token, amount)
+        if ib_token == ibusdc:
+            assert value == amount
+        else:
+            assert value == homora_earn_swap.getBestIBAmountOut.call(ib_token, ibusdc, amount)
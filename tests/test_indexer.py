@@ -0,0 +1,70 @@
+from brownie import chain
+
+from scripts.indexer import load_indexer
+
+from conftest import deadline
+
+
+def swap_fields(tx):
+    event = tx.events["Swapped"]
+    return {
+        "block_number": tx.block_number,
+        "tx_hash": tx.txid.lower(),
+        "sender": event["sender"].lower(),
+        "token_in": event["tokenIn"].lower(),
+        "token_out": event["tokenOut"].lower(),
+        "amount_in": str(event["amountIn"]),
+        "underlying_in": str(event["underlyingIn"]),
+        "underlying_out": str(event["underlyingOut"]),
+        "amount_out": str(event["amountOut"]),
+    }
+
+
+def cached_fields(indexer):
+    return [{key: value for key, value in row.items() if key != "log_index"} for row in indexer.swaps()]
+
+
+# the swapped event reports the ibtoken and underlying amounts of every leg
+def test_swapped_event(account, homora_earn_swap, ibeth, ibusdt, ibusdc):
+    ibusdt.approve(homora_earn_swap, 1e36, {"from": account})
+    tx = homora_earn_swap.swap(ibusdt, ibusdc, 8e12, 0, deadline, {"from": account})
+    event = tx.events["Swapped"]
+    assert event["sender"] == account
+    assert event["amountIn"] == 8e12
+    assert event["underlyingIn"] == homora_earn_swap.ibToToken(ibusdt, 8e12)
+    assert event["underlyingOut"] == tx.events["RouteSelected"]["amountOut"]
+    assert event["amountOut"] == tx.return_value
+
+    ibeth.approve(homora_earn_swap, 1e36, {"from": account})
+    legs = [(ibusdt, ibusdc, 4e12, 0), (ibeth, ibusdc, 992637183, 0)]
+    tx = homora_earn_swap.swapMany(legs, deadline, {"from": account})
+    assert [event["amountOut"] for event in tx.events["Swapped"]] == tx.return_value
+
+
+# the indexer caches every swap, resumes from its cursor and drops swaps orphaned by a reorg
+def test_indexer_sync_and_reorg(tmp_path, account, homora_earn_swap, ibusdt, ibusdc, ibdai):
+    ibusdt.approve(homora_earn_swap, 1e36, {"from": account})
+    start_block = chain.height
+    indexer = load_indexer(homora_earn_swap, tmp_path / "swaps.db", start_block, chunk_size=2)
+
+    txs = [homora_earn_swap.swap(ibusdt, ibusdc, 10 ** 12 * idx, 0, deadline, {"from": account}) for idx in (1, 2, 3)]
+    assert indexer.sync() == 3
+    assert cached_fields(indexer) == [swap_fields(tx) for tx in txs]
+    assert indexer.last_block == chain.height
+
+    # nothing new to index
+    assert indexer.sync() == 0
+
+    # replace the last swap with a different one in the same block
+    chain.undo()
+    txs[-1] = homora_earn_swap.swap(ibusdt, ibdai, 10 ** 12, 0, deadline, {"from": account})
+    assert indexer.sync() == 1
+    assert cached_fields(indexer) == [swap_fields(tx) for tx in txs]
+    assert len(indexer.swaps(token_out=ibdai.address)) == 1
+    indexer.close()
+
+    # a new indexer on the same database resumes where the last one stopped
+    txs.append(homora_earn_swap.swap(ibusdt, ibusdc, 10 ** 12, 0, deadline, {"from": account}))
+    indexer = load_indexer(homora_earn_swap, tmp_path / "swaps.db", start_block)
+    assert indexer.sync() == 1
+    assert cached_fields(indexer) == [swap_fields(tx) for tx in txs]
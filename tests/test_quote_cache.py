@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+import requests
+from brownie import chain, web3
+
+from scripts.homora_client import HomoraIBSwapClient, MulticallResult
+from scripts.quote_cache import QuoteCache
+
+
+class CountingSession(requests.Session):
+    def __init__(self):
+        super().__init__()
+        self.posts = 0
+
+    def post(self, *args, **kwargs):
+        self.posts += 1
+        return super().post(*args, **kwargs)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class EchoClient:
+    """Answers every call with its block number and arguments, counting reads."""
+
+    def __init__(self):
+        self.reads = []
+
+    def block_number(self):
+        return 1
+
+    def read(self, calls, block_identifier="latest"):
+        self.reads.append(list(calls))
+        return MulticallResult(block_identifier, [(block_identifier, call.args) for call in calls])
+
+
+class StallingClient(EchoClient):
+    """An `EchoClient` whose asyncio reads wait until `release` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def aread(self, calls, block_identifier="latest"):
+        await self.release.wait()
+        return self.read(calls, block_identifier)
+
+
+@pytest.fixture
+def client(homora_earn_swap, multicall):
+    client = HomoraIBSwapClient(web3.provider.endpoint_uri, homora_earn_swap, multicall, session=CountingSession())
+    yield client
+    client.close()
+
+
+# many concurrent callers asking for the same quotes in one block cost one eth_blockNumber and one eth_call
+def test_quote_cache_coalesces(client, homora_earn_swap, ibeth, ibusdt, ibusdc):
+    cache = QuoteCache(client, block_poll_interval=0)
+    calls = [
+        client.get_estimated_amounts_out(ibusdt, ibusdc, 10 ** 8),
+        client.ib_to_token(ibusdt, 10 ** 12),
+        client.token_to_ib(ibeth, 10 ** 18),
+    ]
+
+    async def read():
+        try:
+            block_number = await cache.ahead_block_number()
+            first = await asyncio.gather(*[cache.aget_many(calls, block_number) for _ in range(20)])
+            again = await cache.aget_many(calls, block_number)
+            chain.mine()
+            refreshed = await cache.aget_many(calls)
+            return first, again, refreshed
+        finally:
+            await client.aclose()
+
+    (first, again, refreshed) = asyncio.run(read())
+    expected = [
+        list(homora_earn_swap.getEstimatedAmountsOut(ibusdt, ibusdc, 10 ** 8)),
+        homora_earn_swap.ibToToken(ibusdt, 10 ** 12),
+        homora_earn_swap.tokenToIB(ibeth, 10 ** 18),
+    ]
+    assert first == [expected] * 20
+    assert again == refreshed == expected
+    # one block number and one multicall per block
+    assert client.session.posts == 4
+    metrics = cache.metrics()
+    assert (metrics["misses"], metrics["coalesced"], metrics["hits"]) == (6, 57, 3)
+    assert metrics["requests"] == 2
+    # the new block dropped the previous block's entries
+    assert metrics["entries"] == 3
+    assert metrics["block_number"] == web3.eth.block_number
+
+
+def test_quote_cache_eviction():
+    clock = FakeClock()
+    client = EchoClient()
+    cache = QuoteCache(client, max_entries=2, max_age=10, block_poll_interval=5, clock=clock)
+    calls = [HomoraIBSwapClient.ib_to_token("0xAB", amount) for amount in range(3)]
+    assert cache.get_many(calls[:2]) == [(1, ("0xAB", 0)), (1, ("0xAB", 1))]
+    # addresses are matched case-insensitively
+    assert cache.get(HomoraIBSwapClient.ib_to_token("0xab", 0)) == (1, ("0xAB", 0))
+    assert len(client.reads) == 1
+
+    # the least recently used entry makes room for a new one
+    cache.get(calls[2])
+    assert list(cache.entries) == [(1, "ibToToken", ("0xab", 0)), (1, "ibToToken", ("0xab", 2))]
+
+    # entries expire with age
+    clock.now = 11
+    cache.get(calls[0], block_number=1)
+    assert client.reads[-1] == [calls[0]]
+
+    # a newer block invalidates every entry of older blocks
+    cache.set_block_number(2)
+    assert not cache.entries
+    assert cache.get(calls[0]) == (2, ("0xAB", 0))
+    assert cache.metrics()["evictions"] == 4
+
+
+# a cancelled request cancels the callers waiting on it and is retried by the next read, while a cancelled waiter
+# leaves the request to the others
+def test_quote_cache_cancellation():
+    call = HomoraIBSwapClient.ib_to_token("0xAB", 1)
+
+    async def read():
+        client = StallingClient()
+        cache = QuoteCache(client)
+        fetcher = asyncio.ensure_future(cache.aget(call, 1))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.aget(call, 1))
+        await asyncio.sleep(0)
+        fetcher.cancel()
+        cancelled = await asyncio.gather(fetcher, waiter, return_exceptions=True)
+        in_flight = dict(cache.in_flight)
+
+        fetcher = asyncio.ensure_future(cache.aget(call, 1))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.aget(call, 1))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        client.release.set()
+        fetched = await asyncio.gather(fetcher, waiter, return_exceptions=True)
+        return cancelled, in_flight, fetched, cache
+
+    (cancelled, in_flight, fetched, cache) = asyncio.run(read())
+    assert all(isinstance(result, asyncio.CancelledError) for result in cancelled)
+    assert in_flight == {}
+    assert fetched[0] == (1, ("0xAB", 1))
+    assert isinstance(fetched[1], asyncio.CancelledError)
+    assert not cache.in_flight
+    assert cache.get(call, 1) == (1, ("0xAB", 1))
@@ -0,0 +1,181 @@
+import random
+
+import brownie
+import pytest
+import numpy as np
+
+from conftest import deploy_uniswap
+from scripts.quote_engine import (
+    QuoteSnapshot,
+    get_estimated_amounts_out,
+    get_estimated_ib_amount_out,
+    get_path,
+    ib_to_token,
+    load_snapshot,
+    token_to_ib,
+)
+from scripts.simulator import SwapSimulator
+
+PAIRS = [("ibeth", "ibusdc"), ("ibusdt", "ibeth"), ("ibusdt", "ibusdc"), ("ibusdt", "ibdai")]
+
+
+def random_amount(rng, max_exponent):
+    """An amount spread evenly over orders of magnitude, sometimes 0 or a few wei."""
+    if rng.random() < 0.1:
+        return rng.choice([0, 1, 2, 3])
+    return int(10 ** rng.uniform(0, max_exponent))
+
+
+def reference_ib_amount_out(router_reserves, path, amount_in, rate_in, rate_out):
+    """`quoteIB` computed one amount and one router at a time, the way the contract does."""
+    underlying_in = amount_in * rate_in // 10 ** 18
+    if underlying_in == 0:
+        return 0
+    best = 0
+    for reserves in router_reserves:
+        amount = underlying_in
+        for hop in zip(path, path[1:]):
+            (reserve_in, reserve_out) = reserves.get(hop, (0, 0))
+            if amount == 0 or reserve_in == 0 or reserve_out == 0:
+                # getAmountOut reverts, so the router cannot quote
+                amount = None
+                break
+            amount = amount * 997 * reserve_out // (reserve_in * 1000 + amount * 997)
+        if amount is not None and amount > best:
+            best = amount
+    return best * 10 ** 18 // rate_out
+
+
+@pytest.mark.parametrize("token_in,token_out", PAIRS)
+def test_quote_engine_matches_contract(request, homora_earn_swap, token_in, token_out):
+    token_in = request.getfixturevalue(token_in)
+    token_out = request.getfixturevalue(token_out)
+    snapshot = load_snapshot(homora_earn_swap, homora_earn_swap.getIBTokens())
+    amounts_in = np.array([10 ** 6, 10 ** 9, 10 ** 12, 8 * 10 ** 12, 10 ** 14], dtype=np.int64)
+
+    underlying_in = ib_to_token(snapshot, token_in.address, amounts_in)
+    quoted = get_estimated_amounts_out(snapshot, token_in.address, token_out.address, underlying_in)
+    assert len(quoted) == len(get_path(snapshot, token_in.address, token_out.address))
+    ib_out = get_estimated_ib_amount_out(snapshot, token_in.address, token_out.address, amounts_in)
+    for idx, amount_in in enumerate(amounts_in):
+        expected_underlying_in = homora_earn_swap.ibToToken(token_in, int(amount_in))
+        assert underlying_in[idx] == expected_underlying_in
+        expected = homora_earn_swap.getEstimatedAmountsOut(token_in, token_out, expected_underlying_in)
+        assert [hop[idx] for hop in quoted] == list(expected)
+        assert ib_out[idx] == homora_earn_swap.tokenToIB(token_out, expected[-1])
+        assert token_to_ib(snapshot, token_out.address, quoted[-1][idx]) == ib_out[idx]
+
+
+# a zero amount has no route: the underlying quote raises where the contract reverts, the ibToken quote is 0
+def test_quote_engine_no_route(homora_earn_swap, ibusdt, ibusdc):
+    snapshot = load_snapshot(homora_earn_swap, homora_earn_swap.getIBTokens())
+    with brownie.reverts("no-route"):
+        homora_earn_swap.getEstimatedAmountsOut(ibusdt, ibusdc, 0)
+    with pytest.raises(ValueError, match="no-route"):
+        get_estimated_amounts_out(snapshot, ibusdt.address, ibusdc.address, [10 ** 6, 0])
+    quoted = get_estimated_ib_amount_out(snapshot, ibusdt.address, ibusdc.address, [0, 1, 10 ** 12])
+    assert list(quoted) == homora_earn_swap.getEstimatedIBAmountsOut(ibusdt, ibusdc, [0, 1, 10 ** 12])
+    assert quoted[0] == quoted[1] == 0
+
+
+# the fast path stays within float64 rounding of the exact quotes, and zero amounts quote as 0 on both paths
+@pytest.mark.parametrize("token_in,token_out", PAIRS)
+def test_quote_engine_fast_path(request, homora_earn_swap, token_in, token_out):
+    token_in = request.getfixturevalue(token_in).address
+    token_out = request.getfixturevalue(token_out).address
+    snapshot = load_snapshot(homora_earn_swap, homora_earn_swap.getIBTokens())
+    amounts_in = np.concatenate([[0], np.linspace(10 ** 6, 10 ** 14, 2000, dtype=np.int64)])
+
+    fast = get_estimated_ib_amount_out(snapshot, token_in, token_out, amounts_in, exact=False)
+    exact = get_estimated_ib_amount_out(snapshot, token_in, token_out, amounts_in)
+    assert fast.dtype.kind in "if"
+    assert fast[0] == exact[0] == 0
+    assert np.allclose(fast, exact.astype(np.float64), rtol=1e-9, atol=1)
+    assert homora_earn_swap.getEstimatedIBAmountsOut(token_in, token_out, [0]) == [0]
+
+
+# with a second router added, each amount is quoted on the router the contract would pick
+def test_quote_engine_best_router(account, homora_earn_swap, sushiswap_router, ibeth, ibusdt, ibusdc, ibdai):
+    homora_earn_swap.addRouter(sushiswap_router, {"from": account})
+    snapshot = load_snapshot(homora_earn_swap, homora_earn_swap.getIBTokens())
+    assert len(snapshot.extra_reserves) == 1
+    amounts_in = [10 ** 6, 10 ** 12, 10 ** 14]
+    for token_in, token_out in [(ibusdt, ibusdc), (ibusdc, ibusdt), (ibeth, ibusdt), (ibusdt, ibeth), (ibusdt, ibdai)]:
+        expected = homora_earn_swap.getEstimatedIBAmountsOut(token_in, token_out, amounts_in)
+        quoted = get_estimated_ib_amount_out(snapshot, token_in.address, token_out.address, amounts_in)
+        assert list(quoted) == list(expected)
+
+
+# differential test: a router with random pool sizes, quoted at random amounts, on chain and offline
+@pytest.mark.parametrize("seed", range(3))
+def test_quote_engine_random_reserves(
+    account, homora_earn_swap, weth, usdt, usdc, dai, ibeth, ibusdt, ibusdc, ibdai, seed
+):
+    rng = random.Random(seed)
+    eth_pools = [
+        (token, int(10 ** rng.uniform(3, 13)) * 10 ** (token.decimals() - 6), int(10 ** rng.uniform(15, 19)))
+        for token in [usdt, usdc, dai]
+        if rng.random() < 0.8
+    ]
+    router = deploy_uniswap(account, brownie.accounts[4], weth, eth_pools)
+    homora_earn_swap.addRouter(router, {"from": account})
+    snapshot = load_snapshot(homora_earn_swap, homora_earn_swap.getIBTokens())
+    for token_in, token_out in [(ibeth, ibusdc), (ibusdt, ibeth), (ibusdt, ibusdc), (ibdai, ibusdt)]:
+        amounts_in = [random_amount(rng, 16) for _ in range(20)]
+        expected = homora_earn_swap.getEstimatedIBAmountsOut(token_in, token_out, amounts_in)
+        quoted = get_estimated_ib_amount_out(snapshot, token_in.address, token_out.address, amounts_in)
+        assert list(quoted) == list(expected)
+
+
+# differential test against a one-amount-at-a-time port of quoteIB, over random reserves on three routers
+@pytest.mark.parametrize("seed", range(20))
+def test_quote_engine_matches_reference(seed):
+    rng = random.Random(seed)
+    (weth, tokens) = ("0x" + "ee" * 20, ["0x" + "{:02x}".format(idx) * 20 for idx in range(1, 4)])
+    ib_tokens = ["0x" + "{:02x}".format(idx) * 20 for idx in range(0xA0, 0xA4)]
+    underlyings = dict(zip(ib_tokens, [weth] + tokens))
+    exchange_rates = {ib_token: int(10 ** rng.uniform(8, 28)) for ib_token in ib_tokens}
+    router_reserves = []
+    for _ in range(3):
+        reserves = {}
+        for token in tokens:
+            if rng.random() < 0.8:
+                (reserve_token, reserve_eth) = (random_amount(rng, 30), random_amount(rng, 30))
+                reserves[(token, weth)] = (reserve_token, reserve_eth)
+                reserves[(weth, token)] = (reserve_eth, reserve_token)
+        router_reserves.append(reserves)
+    snapshot = QuoteSnapshot(
+        weth,
+        underlyings,
+        exchange_rates,
+        {pair: reserves for pair, reserves in router_reserves[0].items() if pair[1] == weth},
+        extra_reserves=[
+            {pair: reserves for pair, reserves in extra.items() if pair[1] == weth} for extra in router_reserves[1:]
+        ],
+    )
+    amounts_in = [random_amount(rng, 30) for _ in range(200)]
+    for token_in in ib_tokens:
+        for token_out in ib_tokens:
+            if token_in == token_out:
+                continue
+            path = get_path(snapshot, token_in, token_out)
+            quoted = get_estimated_ib_amount_out(snapshot, token_in, token_out, amounts_in)
+            expected = [
+                reference_ib_amount_out(
+                    router_reserves, path, amount_in, exchange_rates[token_in], exchange_rates[token_out]
+                )
+                for amount_in in amounts_in
+            ]
+            assert list(quoted) == expected
+
+
+# adapters are listed but not quoted: the engine matches the V2 view, a lower bound on what swap returns
+def test_quote_engine_adapters(account, homora_earn_swap, uniswap_v3_adapter, ibusdt, ibusdc):
+    homora_earn_swap.addAdapter(uniswap_v3_adapter, {"from": account})
+    snapshot = load_snapshot(homora_earn_swap, homora_earn_swap.getIBTokens())
+    assert snapshot.adapters == [uniswap_v3_adapter.address.lower()]
+    quoted = get_estimated_ib_amount_out(snapshot, ibusdt.address, ibusdc.address, [8 * 10 ** 12])
+    assert list(quoted) == homora_earn_swap.getEstimatedIBAmountsOut(ibusdt, ibusdc, [8 * 10 ** 12])
+    assert quoted[0] < homora_earn_swap.getBestIBAmountOut.call(ibusdt, ibusdc, 8 * 10 ** 12)
+    with pytest.raises(ValueError):
+        SwapSimulator(snapshot)
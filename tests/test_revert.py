@@ -1,309 +1,179 @@
 import pytest
 import brownie
-from brownie import accounts, Contract, HomoraIBSwap
+from brownie import accounts, HomoraIBSwapBatchAuction
 
-SAFEBOX_ABI = [
-    {
-        "inputs": [
-            {"internalType": "contract ICErc20", "name": "_cToken", "type": "address"},
-            {"internalType": "string", "name": "_name", "type": "string"},
-            {"internalType": "string", "name": "_symbol", "type": "string"},
-        ],
-        "stateMutability": "nonpayable",
-        "type": "constructor",
-    },
-    {
-        "anonymous": False,
-        "inputs": [
-            {"indexed": True, "internalType": "address", "name": "owner", "type": "address"},
-            {"indexed": True, "internalType": "address", "name": "spender", "type": "address"},
-            {"indexed": False, "internalType": "uint256", "name": "value", "type": "uint256"},
-        ],
-        "name": "Approval",
-        "type": "event",
-    },
-    {
-        "anonymous": False,
-        "inputs": [
-            {"indexed": False, "internalType": "address", "name": "user", "type": "address"},
-            {"indexed": False, "internalType": "uint256", "name": "amount", "type": "uint256"},
-        ],
-        "name": "Claim",
-        "type": "event",
-    },
-    {
-        "anonymous": False,
-        "inputs": [
-            {"indexed": True, "internalType": "address", "name": "from", "type": "address"},
-            {"indexed": True, "internalType": "address", "name": "to", "type": "address"},
-            {"indexed": False, "internalType": "uint256", "name": "value", "type": "uint256"},
-        ],
-        "name": "Transfer",
-        "type": "event",
-    },
-    {"inputs": [], "name": "acceptGovernor", "outputs": [], "stateMutability": "nonpayable", "type": "function"},
-    {
-        "inputs": [{"internalType": "uint256", "name": "amount", "type": "uint256"}],
-        "name": "adminClaim",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "address", "name": "owner", "type": "address"},
-            {"internalType": "address", "name": "spender", "type": "address"},
-        ],
-        "name": "allowance",
-        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "address", "name": "spender", "type": "address"},
-            {"internalType": "uint256", "name": "amount", "type": "uint256"},
-        ],
-        "name": "approve",
-        "outputs": [{"internalType": "bool", "name": "", "type": "bool"}],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [{"internalType": "address", "name": "account", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "cToken",
-        "outputs": [{"internalType": "contract ICErc20", "name": "", "type": "address"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "uint256", "name": "totalReward", "type": "uint256"},
-            {"internalType": "bytes32[]", "name": "proof", "type": "bytes32[]"},
-        ],
-        "name": "claim",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "uint256", "name": "claimAmount", "type": "uint256"},
-            {"internalType": "bytes32[]", "name": "proof", "type": "bytes32[]"},
-            {"internalType": "uint256", "name": "withdrawAmount", "type": "uint256"},
-        ],
-        "name": "claimAndWithdraw",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [{"internalType": "address", "name": "", "type": "address"}],
-        "name": "claimed",
-        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "decimals",
-        "outputs": [{"internalType": "uint8", "name": "", "type": "uint8"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "address", "name": "spender", "type": "address"},
-            {"internalType": "uint256", "name": "subtractedValue", "type": "uint256"},
-        ],
-        "name": "decreaseAllowance",
-        "outputs": [{"internalType": "bool", "name": "", "type": "bool"}],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [{"internalType": "uint256", "name": "amount", "type": "uint256"}],
-        "name": "deposit",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "governor",
-        "outputs": [{"internalType": "address", "name": "", "type": "address"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "address", "name": "spender", "type": "address"},
-            {"internalType": "uint256", "name": "addedValue", "type": "uint256"},
-        ],
-        "name": "increaseAllowance",
-        "outputs": [{"internalType": "bool", "name": "", "type": "bool"}],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "name",
-        "outputs": [{"internalType": "string", "name": "", "type": "string"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "pendingGovernor",
-        "outputs": [{"internalType": "address", "name": "", "type": "address"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "relayer",
-        "outputs": [{"internalType": "address", "name": "", "type": "address"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "root",
-        "outputs": [{"internalType": "bytes32", "name": "", "type": "bytes32"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [{"internalType": "address", "name": "_pendingGovernor", "type": "address"}],
-        "name": "setPendingGovernor",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [{"internalType": "address", "name": "_relayer", "type": "address"}],
-        "name": "setRelayer",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "symbol",
-        "outputs": [{"internalType": "string", "name": "", "type": "string"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "totalSupply",
-        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "address", "name": "recipient", "type": "address"},
-            {"internalType": "uint256", "name": "amount", "type": "uint256"},
-        ],
-        "name": "transfer",
-        "outputs": [{"internalType": "bool", "name": "", "type": "bool"}],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "address", "name": "sender", "type": "address"},
-            {"internalType": "address", "name": "recipient", "type": "address"},
-            {"internalType": "uint256", "name": "amount", "type": "uint256"},
-        ],
-        "name": "transferFrom",
-        "outputs": [{"internalType": "bool", "name": "", "type": "bool"}],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "uToken",
-        "outputs": [{"internalType": "contract IERC20", "name": "", "type": "address"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [{"internalType": "bytes32", "name": "_root", "type": "bytes32"}],
-        "name": "updateRoot",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [{"internalType": "uint256", "name": "amount", "type": "uint256"}],
-        "name": "withdraw",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-]
+from conftest import MID_PRICE_PERIOD, deadline
 
-IBETH_ADDRESS = "0xeEa3311250FE4c3268F8E684f7C87A82fF183Ec1"
 
-USDT_ADDRESS = "0xdac17f958d2ee523a2206206994597c13d831ec7"
-IBUSDT_ADDRESS = "0x020EDC614187F9937A1EFEEE007656C6356FB13A"
-
-USDC_ADDRESS = "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"
-IBUSDC_ADDRESS = "0x08bd64BFC832F1C2B3e07e634934453bA7Fa2db2"
-
-DAI_ADDRESS = "0x6b175474e89094c44da98b954eedeac495271d0f"
-IBDAI_ADDRESS = "0xee8389d235E092b2945fE363e97CDBeD121A0439"
-
-WETH = "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2"
-
-utoken_to_ibtoken = dict(
-    {
-        IBETH_ADDRESS: IBETH_ADDRESS,
-        USDT_ADDRESS: IBUSDT_ADDRESS,
-        USDC_ADDRESS: IBUSDC_ADDRESS,
-        DAI_ADDRESS: IBDAI_ADDRESS,
-    }
-)
+def test_revert_send_ether(account, homora_earn_swap):
+    with brownie.reverts("unexpected-eth-sender"):
+        account.transfer(homora_earn_swap, "0.5 ether")
 
-ibtoken_to_utoken = dict(
-    {
-        IBETH_ADDRESS: IBETH_ADDRESS,
-        IBUSDT_ADDRESS: USDT_ADDRESS,
-        IBUSDC_ADDRESS: USDC_ADDRESS,
-        IBDAI_ADDRESS: DAI_ADDRESS,
-    }
-)
 
-deadline = 1e21
+def test_revert_add_ib_tokens(homora_earn_swap, ibusdt, ibusdc, ibdai):
+    ens = accounts[9]
+    with brownie.reverts("not the governor"):
+        tx = homora_earn_swap.addIBTokens([ibusdt, ibusdc, ibdai], {"from": ens})
 
 
-@pytest.fixture
-def account():
-    return accounts.at("0xcdc2F106E9694B16FFdBFCE2a2612076Ce44b4FE", force=True)
+def test_revert_swap_many_leg_minimum(account, homora_earn_swap, ibusdt, ibusdc, ibdai):
+    ibusdt.approve(homora_earn_swap, 1e36, {"from": account})
+    legs = [(ibusdt, ibusdc, 4e12, 0), (ibusdt, ibdai, 4e12, 1e36)]
+    with brownie.reverts("insufficient-output-amount"):
+        homora_earn_swap.swapMany(legs, deadline, {"from": account})
+    with brownie.reverts("zero-amount-in"):
+        homora_earn_swap.swapMany([(ibusdt, ibusdc, 0, 0), (ibusdt, ibdai, 0, 0)], deadline, {"from": account})
 
 
-def test_revert_send_ether(account):
-    homora_earn_swap = HomoraIBSwap.deploy(
-        "0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D", "0xeEa3311250FE4c3268F8E684f7C87A82fF183Ec1", {"from": account}
-    )
-    with brownie.reverts("unexpected-eth-sender"):
-        account.transfer(homora_earn_swap, "0.5 ether")
+def test_revert_consolidate(account, homora_earn_swap, ibusdt, ibusdc, ibdai):
+    ibusdt.approve(homora_earn_swap, 1e36, {"from": account})
+    with brownie.reverts("amounts-length-mismatch"):
+        homora_earn_swap.consolidate([ibusdt, ibdai], [4e12], ibusdc, 0, deadline, {"from": account})
+    with brownie.reverts("token-in-out-identical"):
+        homora_earn_swap.consolidate([ibusdt, ibusdc], [4e12, 4e12], ibusdc, 0, deadline, {"from": account})
+    with brownie.reverts("insufficient-output-amount"):
+        homora_earn_swap.consolidate([ibusdt], [4e12], ibusdc, 1e36, deadline, {"from": account})
+    with brownie.reverts("zero-amount-out"):
+        homora_earn_swap.consolidate([], [], ibusdc, 0, deadline, {"from": account})
 
 
-def test_revert_add_ib_tokens(account):
-    ens = accounts.at("0x37fabbfaf80501c68ee77625d620d6501b35417e", force=True)
-    homora_earn_swap = HomoraIBSwap.deploy(
-        "0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D", "0xeEa3311250FE4c3268F8E684f7C87A82fF183Ec1", {"from": account}
-    )
+def test_revert_routers(account, homora_earn_swap, uniswap_router, sushiswap_router):
+    ens = accounts[9]
     with brownie.reverts("not the governor"):
-        tx = homora_earn_swap.addIBTokens([IBUSDT_ADDRESS, IBUSDC_ADDRESS, IBDAI_ADDRESS], {"from": ens})
+        homora_earn_swap.addRouter(sushiswap_router, {"from": ens})
+    with brownie.reverts("router-already-added"):
+        homora_earn_swap.addRouter(uniswap_router, {"from": account})
+    with brownie.reverts("router-is-default"):
+        homora_earn_swap.removeRouter(uniswap_router, {"from": account})
+
+
+def test_revert_set_path(account, homora_earn_swap, weth, usdt, usdc, dai, ibusdt, ibusdc):
+    with brownie.reverts("invalid-path-length"):
+        homora_earn_swap.setPath(ibusdt, ibusdc, [usdt], {"from": account})
+    with brownie.reverts("invalid-path-start"):
+        homora_earn_swap.setPath(ibusdt, ibusdc, [dai, usdc], {"from": account})
+    with brownie.reverts("invalid-path-end"):
+        homora_earn_swap.setPath(ibusdt, ibusdc, [usdt, dai], {"from": account})
+    with brownie.reverts("token-out-not-supported"):
+        homora_earn_swap.setPath(ibusdt, weth, [usdt, weth], {"from": account})
+
+
+def test_revert_zap(account, homora_earn_swap, weth, usdt, ibusdt, ibusdc):
+    with brownie.reverts("token-in-not-supported"):
+        homora_earn_swap.zapIn(ibusdt, ibusdc, 10 ** 6, 0, deadline, {"from": account})
+    with brownie.reverts("invalid-eth-amount"):
+        homora_earn_swap.zapIn(weth, ibusdc, 10 ** 18, 0, deadline, {"from": account, "value": 10 ** 17})
+    with brownie.reverts("invalid-eth-amount"):
+        homora_earn_swap.zapIn(usdt, ibusdc, 10 ** 6, 0, deadline, {"from": account, "value": 1})
+    with brownie.reverts("token-out-not-supported"):
+        homora_earn_swap.zapOut(ibusdt, ibusdc, 10 ** 6, 0, deadline, {"from": account})
+
+
+def test_revert_swap_split(
+    account, homora_earn_swap, uniswap_router, sushiswap_router, weth, usdt, usdc, dai, ibusdt, ibusdc
+):
+    path = [usdt, weth, usdc]
+    for (routes, message) in [
+        ([(sushiswap_router, path, 1)], "router-not-added"),
+        ([(uniswap_router, [usdt], 1)], "invalid-path-length"),
+        ([(uniswap_router, [dai, weth, usdc], 1)], "invalid-path-start"),
+        ([(uniswap_router, [usdt, weth, dai], 1)], "invalid-path-end"),
+        ([(uniswap_router, path, 0)], "invalid-weights"),
+    ]:
+        with brownie.reverts(message):
+            homora_earn_swap.swapSplit(ibusdt, ibusdc, 10 ** 6, routes, 0, deadline, {"from": account})
+
+
+def test_revert_batch_auction(account, homora_earn_swap, batch_auction, ibeth, ibusdt, ibusdc):
+    for (period, max_period) in [(0, MID_PRICE_PERIOD), (MID_PRICE_PERIOD, MID_PRICE_PERIOD - 1)]:
+        with brownie.reverts("invalid-period"):
+            HomoraIBSwapBatchAuction.deploy(homora_earn_swap, period, max_period, {"from": account})
+    with brownie.reverts("token-in-out-identical"):
+        batch_auction.postOrder(ibusdt, ibusdt, 10 ** 9, 1, deadline, {"from": account})
+    with brownie.reverts("token-in-not-supported"):
+        batch_auction.postOrder(accounts[5], ibusdc, 10 ** 9, 1, deadline, {"from": account})
+    with brownie.reverts("zero-amount-in"):
+        batch_auction.postOrder(ibusdt, ibusdc, 0, 1, deadline, {"from": account})
+    with brownie.reverts("zero-amount-out-min"):
+        batch_auction.postOrder(ibusdt, ibusdc, 10 ** 9, 0, deadline, {"from": account})
+
+    ibusdt.approve(batch_auction, 1e36, {"from": account})
+    batch_auction.postOrder(ibusdt, ibusdc, 10 ** 9, 1, deadline, {"from": account})
+    batch_auction.postOrder(ibusdt, ibusdc, 10 ** 9, 10 ** 18, deadline, {"from": account})
+    batch_auction.postOrder(ibusdt, ibeth, 10 ** 9, 1, deadline, {"from": account})
+    batch_auction.postOrder(ibusdt, ibusdc, 10 ** 9, 1, brownie.chain.time() - 1, {"from": account})
+    # the mid price needs two observations a period apart
+    with brownie.reverts("no-mid-price"):
+        batch_auction.settle(ibusdt, ibusdc, [0], {"from": accounts[5]})
+    batch_auction.updatePrices(ibusdt, ibusdc, {"from": accounts[5]})
+    brownie.chain.sleep(MID_PRICE_PERIOD)
+    for (order_ids, message) in [
+        ([0, 0], "unsorted-order-ids"),
+        # the net swap must cover the minimum outputs of its side
+        ([0, 1], "insufficient-output-amount"),
+        ([0, 2], "order-pair-mismatch"),
+        ([0, 3], "order-expired"),
+    ]:
+        with brownie.reverts(message):
+            batch_auction.settle(ibusdt, ibusdc, order_ids, {"from": accounts[5]})
+    with brownie.reverts("not-order-owner"):
+        batch_auction.cancelOrder(0, {"from": accounts[5]})
+    batch_auction.cancelOrder(0, {"from": account})
+    with brownie.reverts("order-not-open"):
+        batch_auction.settle(ibusdt, ibusdc, [0], {"from": accounts[5]})
+
+
+def test_revert_twap(account, twap, ibusdt, ibusdc):
+    for (args, message) in [
+        ((ibusdt, ibusdt, 10 ** 9, 2, 3600, 10 ** 17, 0), "token-in-out-identical"),
+        ((accounts[5], ibusdc, 10 ** 9, 2, 3600, 10 ** 17, 0), "token-in-not-supported"),
+        ((ibusdt, accounts[5], 10 ** 9, 2, 3600, 10 ** 17, 0), "token-out-not-supported"),
+        ((ibusdt, ibusdc, 10 ** 9, 0, 3600, 10 ** 17, 0), "invalid-slices"),
+        ((ibusdt, ibusdc, 1, 2, 3600, 10 ** 17, 0), "invalid-slices"),
+        ((ibusdt, ibusdc, 10 ** 9, 2, 3600, 0, 0), "zero-min-rate"),
+        ((ibusdt, ibusdc, 10 ** 9, 2, 3600, 10 ** 17, 101), "bounty-too-high"),
+    ]:
+        with brownie.reverts(message):
+            twap.createOrder(*args, {"from": account})
+
+    ibusdt.approve(twap, 1e36, {"from": account})
+    twap.createOrder(ibusdt, ibusdc, 10 ** 12, 2, 3600, 10 ** 17, 0, {"from": account})
+    twap.createOrder(ibusdt, ibusdc, 10 ** 12, 2, 3600, 100 * 10 ** 18, 0, {"from": account})
+    twap.executeSlice(0, {"from": accounts[5]})
+    with brownie.reverts("slice-not-due"):
+        twap.executeSlice(0, {"from": accounts[5]})
+    with brownie.reverts("slice-failed"):
+        twap.executeSlice(1, {"from": accounts[5]})
+    with brownie.reverts("not-order-owner"):
+        twap.cancelOrder(0, {"from": accounts[5]})
+    twap.cancelOrder(0, {"from": account})
+    with brownie.reverts("order-not-open"):
+        twap.cancelOrder(0, {"from": account})
+    with brownie.reverts("slice-not-due"):
+        twap.executeSlice(0, {"from": accounts[5]})
+    for call in [twap.executeSlice, twap.cancelOrder, twap.isDue]:
+        with brownie.reverts("invalid-order-id"):
+            call(2, {"from": accounts[5]})
+    with brownie.reverts("invalid-order-id"):
+        twap.executeSlices([1, 2], {"from": accounts[5]})
+
+
+def test_revert_adapters(account, homora_earn_swap, uniswap_v3_adapter, usdt, usdc, ibusdt, ibusdc):
+    with brownie.reverts("not the governor"):
+        homora_earn_swap.addAdapter(uniswap_v3_adapter, {"from": accounts[5]})
+    with brownie.reverts("adapter-not-added"):
+        homora_earn_swap.removeAdapter(uniswap_v3_adapter, {"from": account})
+    homora_earn_swap.addAdapter(uniswap_v3_adapter, {"from": account})
+    with brownie.reverts("adapter-already-added"):
+        homora_earn_swap.addAdapter(uniswap_v3_adapter, {"from": account})
 
+    with brownie.reverts("not the governor"):
+        uniswap_v3_adapter.setFee(usdt, usdc, 100, {"from": accounts[5]})
+    with brownie.reverts("token-in-out-identical"):
+        uniswap_v3_adapter.setFee(usdt, usdt, 100, {"from": account})
+    with brownie.reverts("fee-not-set"):
+        uniswap_v3_adapter.swap(usdc, accounts[5], 0, 0, account, {"from": account})
+
+    ibusdt.approve(homora_earn_swap, 1e36, {"from": account})
+    with brownie.reverts("expired"):
+        homora_earn_swap.swap(ibusdt, ibusdc, 8e12, 0, brownie.chain.time() - 1, {"from": account})
@@ -0,0 +1,80 @@
+import asyncio
+import time
+
+import pytest
+from brownie import web3
+
+from scripts.homora_client import HomoraIBSwapClient
+from scripts.scanner import RateLimiter, reference_amount_of, scan, stream_scan
+
+
+@pytest.fixture
+def client(homora_earn_swap, multicall):
+    client = HomoraIBSwapClient(web3.provider.endpoint_uri, homora_earn_swap, multicall)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def sizes(ibeth, ibusdt, ibusdc, ibdai):
+    return {
+        ibeth: [10 ** 17, 10 ** 18, 5 * 10 ** 18],
+        ibusdt: [10 ** 8, 10 ** 9, 10 ** 10],
+        ibusdc: [10 ** 8, 10 ** 9, 10 ** 10],
+        ibdai: [10 ** 20, 10 ** 21, 10 ** 22],
+    }
+
+
+def run(client, coroutine):
+    async def run_and_close():
+        try:
+            return await coroutine
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run_and_close())
+
+
+# every pair and size is quoted as the contract does and ranked by price impact
+def test_scan(client, homora_earn_swap, sizes):
+    ib_tokens = list(sizes)
+    streamed = []
+    table = run(
+        client,
+        scan(client, ib_tokens, sizes, on_row=streamed.append, concurrency=3, block_identifier=web3.eth.block_number),
+    )
+    assert len(table) == len(ib_tokens) * (len(ib_tokens) - 1) * 3
+    assert sorted(streamed) == sorted(table)
+    impacts = [row.price_impact for row in table]
+    assert impacts == sorted(impacts)
+    sizes_by_address = {token.address.lower(): amounts for token, amounts in sizes.items()}
+    for row in table:
+        assert row.amount_out == homora_earn_swap.getEstimatedAmountsOut(row.token_in, row.token_out, row.amount_in)[-1]
+        reference_in = reference_amount_of(sizes_by_address[row.token_in])
+        reference_out = homora_earn_swap.getEstimatedAmountsOut(row.token_in, row.token_out, reference_in)[-1]
+        assert row.price_impact == pytest.approx(1 - (row.amount_out / row.amount_in) / (reference_out / reference_in))
+    # larger trades on the same pair move the price more
+    for pair in {(row.token_in, row.token_out) for row in table}:
+        rows = sorted((row for row in table if (row.token_in, row.token_out) == pair), key=lambda row: row.amount_in)
+        assert rows[0].price_impact < rows[1].price_impact < rows[2].price_impact
+
+
+# rows of the first pairs are available before the sweep finishes
+def test_stream_scan(client, sizes):
+    async def first_row():
+        async for row in stream_scan(client, list(sizes), sizes, concurrency=1):
+            return row
+
+    row = run(client, first_row())
+    assert row.amount_out > 0
+
+
+def test_rate_limiter():
+    async def acquire_all():
+        limiter = RateLimiter(20)
+        start = time.monotonic()
+        for _ in range(5):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(acquire_all()) >= 4 / 20
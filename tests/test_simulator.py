@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from scripts.quote_engine import load_snapshot
+from scripts.simulator import SwapSimulator
+
+from conftest import deadline
+
+# (tokenIn, tokenOut, amountIn) replayed in order, so later trades see the reserves moved by earlier ones
+TRADES = [
+    ("ibusdt", "ibusdc", 8 * 10 ** 12),
+    ("ibeth", "ibusdt", 5 * 10 ** 9),
+    ("ibusdc", "ibeth", 10 ** 12),
+    ("ibusdt", "ibdai", 10 ** 12),
+    ("ibdai", "ibusdc", 2 * 10 ** 12),
+    ("ibusdt", "ibusdc", 8 * 10 ** 12),
+    ("ibeth", "ibdai", 992637183),
+    ("ibusdt", "ibeth", 10 ** 10),
+]
+
+
+# with a second router, whose ETH is cheaper against USDT, each trade takes the router the contract picks for it
+@pytest.mark.parametrize("second_router", [False, True])
+def test_simulator_matches_chain(
+    request, account, homora_earn_swap, sushiswap_router, usdt, usdc, ibusdt, ibusdc, ibeth, ibdai, second_router
+):
+    # route ibusdt->ibusdc through the direct pool to cover custom paths
+    homora_earn_swap.setPath(ibusdt, ibusdc, [usdt, usdc], {"from": account})
+    if second_router:
+        homora_earn_swap.addRouter(sushiswap_router, {"from": account})
+    ib_tokens = homora_earn_swap.getIBTokens()
+    simulator = SwapSimulator(load_snapshot(homora_earn_swap, ib_tokens))
+    trades = [
+        (request.getfixturevalue(token_in), request.getfixturevalue(token_out), amount)
+        for token_in, token_out, amount in TRADES
+    ]
+    result = simulator.simulate(
+        np.array([token_in.address for token_in, _, _ in trades], dtype=object),
+        np.array([token_out.address for _, token_out, _ in trades], dtype=object),
+        np.array([amount for _, _, amount in trades], dtype=object),
+    )
+    assert result.executed.all()
+
+    for ib_token in [ibeth, ibusdt, ibusdc, ibdai]:
+        ib_token.approve(homora_earn_swap, 1e36, {"from": account})
+    for idx, (token_in, token_out, amount_in) in enumerate(trades):
+        tx = homora_earn_swap.swap(token_in, token_out, amount_in, 0, deadline, {"from": account})
+        assert tx.events["Swapped"]["underlyingIn"] == result.underlying_in[idx]
+        assert tx.events["Swapped"]["underlyingOut"] == result.underlying_out[idx]
+        assert tx.return_value == result.amounts_out[idx]
+
+    # the simulated reserves of every router end where the chain's do
+    final = load_snapshot(homora_earn_swap, ib_tokens)
+    for router, reserves in enumerate(final.router_reserves):
+        for token_a, token_b in reserves:
+            assert simulator.get_reserves(token_a, token_b, router) == final.get_reserves(token_a, token_b, router)
+
+
+# a trade below its minimum output is skipped without moving reserves, as a revert would
+def test_simulator_skips_reverting_trades(homora_earn_swap, ibusdt, ibusdc):
+    simulator = SwapSimulator(load_snapshot(homora_earn_swap, homora_earn_swap.getIBTokens()))
+    quote = simulator.quote_independent(ibusdt.address, ibusdc.address, [10 ** 12])[0]
+    result = simulator.simulate(ibusdt.address, ibusdc.address, [10 ** 12, 0, 10 ** 12], [quote, 0, 10 ** 36])
+    assert list(result.executed) == [True, False, False]
+    assert list(result.amounts_out) == [quote, 0, 0]
+    assert simulator.quote_independent(ibusdt.address, ibusdc.address, [10 ** 12])[0] < quote
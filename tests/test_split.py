@@ -0,0 +1,39 @@
+from scripts.split_optimizer import greedy_allocate, optimize_split
+
+from conftest import check_expected, deadline
+
+
+# a large swap split across routers and paths beats sending it all down the best single route
+def test_swap_split(account, homora_earn_swap, sushiswap_router, usdt, usdc, ibusdt, ibusdc):
+    homora_earn_swap.addRouter(sushiswap_router, {"from": account})
+    amount_in = 10 ** 14
+    routes = [
+        (router, path)
+        for router in homora_earn_swap.getRouters()
+        for path in [homora_earn_swap.getPath(ibusdt, ibusdc), [usdt, usdc]]
+        if router != sushiswap_router or len(path) == 3
+    ]
+    plan = optimize_split(homora_earn_swap, ibusdt, ibusdc, amount_in, routes)
+    assert len(plan.routes) > 1
+    assert sum(weight for _, _, weight in plan.routes) == 20
+    single = homora_earn_swap.getEstimatedIBAmountsOut(ibusdt, ibusdc, [amount_in])[0]
+    assert plan.amount_out > single
+
+    ibusdt.approve(homora_earn_swap, amount_in, {"from": account})
+    out_before = ibusdc.balanceOf(account)
+    tx = homora_earn_swap.swapSplit(ibusdt, ibusdc, amount_in, plan.routes, single, deadline, {"from": account})
+    assert ibusdc.balanceOf(account) - out_before == tx.return_value
+    assert check_expected(plan.amount_out, tx.return_value, 0.1)
+    assert len(tx.events["RouteSelected"]) == len(plan.routes)
+    assert tx.events["Swapped"]["underlyingIn"] == sum(event["amountIn"] for event in tx.events["RouteSelected"])
+    assert tx.events["Swapped"]["underlyingOut"] == sum(event["amountOut"] for event in tx.events["RouteSelected"])
+    assert ibusdc.balanceOf(homora_earn_swap) == 0
+    assert usdt.balanceOf(homora_earn_swap) == 0
+
+
+def test_greedy_allocate():
+    # concave curves: the first slices go to the steeper route until its marginal output drops
+    curves = [[0, 10, 18, 24, 28], [0, 9, 17, 24, 30]]
+    assert greedy_allocate(curves, 4) == [2, 2]
+    assert greedy_allocate([[0, 0, 0], [0, 5, 9]], 2) == [0, 2]
+
@@ -1,314 +1,33 @@
 import pytest
-from brownie import accounts, Contract, HomoraIBSwap
-
-SAFEBOX_ABI = [
-    {
-        "inputs": [
-            {"internalType": "contract ICErc20", "name": "_cToken", "type": "address"},
-            {"internalType": "string", "name": "_name", "type": "string"},
-            {"internalType": "string", "name": "_symbol", "type": "string"},
-        ],
-        "stateMutability": "nonpayable",
-        "type": "constructor",
-    },
-    {
-        "anonymous": False,
-        "inputs": [
-            {"indexed": True, "internalType": "address", "name": "owner", "type": "address"},
-            {"indexed": True, "internalType": "address", "name": "spender", "type": "address"},
-            {"indexed": False, "internalType": "uint256", "name": "value", "type": "uint256"},
-        ],
-        "name": "Approval",
-        "type": "event",
-    },
-    {
-        "anonymous": False,
-        "inputs": [
-            {"indexed": False, "internalType": "address", "name": "user", "type": "address"},
-            {"indexed": False, "internalType": "uint256", "name": "amount", "type": "uint256"},
-        ],
-        "name": "Claim",
-        "type": "event",
-    },
-    {
-        "anonymous": False,
-        "inputs": [
-            {"indexed": True, "internalType": "address", "name": "from", "type": "address"},
-            {"indexed": True, "internalType": "address", "name": "to", "type": "address"},
-            {"indexed": False, "internalType": "uint256", "name": "value", "type": "uint256"},
-        ],
-        "name": "Transfer",
-        "type": "event",
-    },
-    {"inputs": [], "name": "acceptGovernor", "outputs": [], "stateMutability": "nonpayable", "type": "function"},
-    {
-        "inputs": [{"internalType": "uint256", "name": "amount", "type": "uint256"}],
-        "name": "adminClaim",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "address", "name": "owner", "type": "address"},
-            {"internalType": "address", "name": "spender", "type": "address"},
-        ],
-        "name": "allowance",
-        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "address", "name": "spender", "type": "address"},
-            {"internalType": "uint256", "name": "amount", "type": "uint256"},
-        ],
-        "name": "approve",
-        "outputs": [{"internalType": "bool", "name": "", "type": "bool"}],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [{"internalType": "address", "name": "account", "type": "address"}],
-        "name": "balanceOf",
-        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "cToken",
-        "outputs": [{"internalType": "contract ICErc20", "name": "", "type": "address"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "uint256", "name": "totalReward", "type": "uint256"},
-            {"internalType": "bytes32[]", "name": "proof", "type": "bytes32[]"},
-        ],
-        "name": "claim",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "uint256", "name": "claimAmount", "type": "uint256"},
-            {"internalType": "bytes32[]", "name": "proof", "type": "bytes32[]"},
-            {"internalType": "uint256", "name": "withdrawAmount", "type": "uint256"},
-        ],
-        "name": "claimAndWithdraw",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [{"internalType": "address", "name": "", "type": "address"}],
-        "name": "claimed",
-        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "decimals",
-        "outputs": [{"internalType": "uint8", "name": "", "type": "uint8"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "address", "name": "spender", "type": "address"},
-            {"internalType": "uint256", "name": "subtractedValue", "type": "uint256"},
-        ],
-        "name": "decreaseAllowance",
-        "outputs": [{"internalType": "bool", "name": "", "type": "bool"}],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [{"internalType": "uint256", "name": "amount", "type": "uint256"}],
-        "name": "deposit",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "governor",
-        "outputs": [{"internalType": "address", "name": "", "type": "address"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "address", "name": "spender", "type": "address"},
-            {"internalType": "uint256", "name": "addedValue", "type": "uint256"},
-        ],
-        "name": "increaseAllowance",
-        "outputs": [{"internalType": "bool", "name": "", "type": "bool"}],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "name",
-        "outputs": [{"internalType": "string", "name": "", "type": "string"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "pendingGovernor",
-        "outputs": [{"internalType": "address", "name": "", "type": "address"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "relayer",
-        "outputs": [{"internalType": "address", "name": "", "type": "address"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "root",
-        "outputs": [{"internalType": "bytes32", "name": "", "type": "bytes32"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [{"internalType": "address", "name": "_pendingGovernor", "type": "address"}],
-        "name": "setPendingGovernor",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [{"internalType": "address", "name": "_relayer", "type": "address"}],
-        "name": "setRelayer",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "symbol",
-        "outputs": [{"internalType": "string", "name": "", "type": "string"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "totalSupply",
-        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "address", "name": "recipient", "type": "address"},
-            {"internalType": "uint256", "name": "amount", "type": "uint256"},
-        ],
-        "name": "transfer",
-        "outputs": [{"internalType": "bool", "name": "", "type": "bool"}],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [
-            {"internalType": "address", "name": "sender", "type": "address"},
-            {"internalType": "address", "name": "recipient", "type": "address"},
-            {"internalType": "uint256", "name": "amount", "type": "uint256"},
-        ],
-        "name": "transferFrom",
-        "outputs": [{"internalType": "bool", "name": "", "type": "bool"}],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [],
-        "name": "uToken",
-        "outputs": [{"internalType": "contract IERC20", "name": "", "type": "address"}],
-        "stateMutability": "view",
-        "type": "function",
-    },
-    {
-        "inputs": [{"internalType": "bytes32", "name": "_root", "type": "bytes32"}],
-        "name": "updateRoot",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-    {
-        "inputs": [{"internalType": "uint256", "name": "amount", "type": "uint256"}],
-        "name": "withdraw",
-        "outputs": [],
-        "stateMutability": "nonpayable",
-        "type": "function",
-    },
-]
-
-IBETH_ADDRESS = "0xeEa3311250FE4c3268F8E684f7C87A82fF183Ec1"
-
-USDT_ADDRESS = "0xdac17f958d2ee523a2206206994597c13d831ec7"
-IBUSDT_ADDRESS = "0x020EDC614187F9937A1EFEEE007656C6356FB13A"
-
-USDC_ADDRESS = "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"
-IBUSDC_ADDRESS = "0x08bd64BFC832F1C2B3e07e634934453bA7Fa2db2"
-
-DAI_ADDRESS = "0x6b175474e89094c44da98b954eedeac495271d0f"
-IBDAI_ADDRESS = "0xee8389d235E092b2945fE363e97CDBeD121A0439"
-
-WETH = "0xc02aaa39b223fe8d0a0e5c4f27ead9083c756cc2"
-
-utoken_to_ibtoken = dict(
-    {
-        IBETH_ADDRESS: IBETH_ADDRESS,
-        USDT_ADDRESS: IBUSDT_ADDRESS,
-        USDC_ADDRESS: IBUSDC_ADDRESS,
-        DAI_ADDRESS: IBDAI_ADDRESS,
-    }
-)
-
-ibtoken_to_utoken = dict(
-    {
-        IBETH_ADDRESS: IBETH_ADDRESS,
-        IBUSDT_ADDRESS: USDT_ADDRESS,
-        IBUSDC_ADDRESS: USDC_ADDRESS,
-        IBDAI_ADDRESS: DAI_ADDRESS,
-    }
-)
-
-deadline = 1e21
-
-
-@pytest.fixture
-def account():
-    return accounts.at("0xcdc2F106E9694B16FFdBFCE2a2612076Ce44b4FE", force=True)
+from brownie import interface, MockStableSwapPool
 
+from conftest import check_expected, deadline
 
-def check_expected(expected, actual, percent_threshold):
-    return abs(actual - expected) / expected * 100 < percent_threshold
+# (tokenIn, tokenOut, amountIn) for each swapped pair, as fixture names
+SWAP_CASES = [
+    ("ibeth", "ibusdc", 992637183),
+    ("ibeth", "ibusdt", 10 ** 8),
+    ("ibeth", "ibdai", 5 * 10 ** 9),
+    ("ibusdt", "ibeth", 8 * 10 ** 12),
+    ("ibusdt", "ibeth", 10 ** 10),
+    ("ibusdc", "ibeth", 10 ** 12),
+    ("ibdai", "ibeth", 10 ** 12),
+    ("ibusdt", "ibusdc", 8 * 10 ** 12),
+    ("ibusdt", "ibusdc", 10 ** 9),
+    ("ibusdc", "ibusdt", 5 * 10 ** 12),
+    ("ibusdt", "ibdai", 8 * 10 ** 12),
+    ("ibdai", "ibusdc", 2 * 10 ** 12),
+]
 
 
-def swap_single_check(ib_token_in, ib_token_out, amount_in, account):
-    # set input and output ibtoken contracts
-    token_in_safebox = Contract.from_abi("SafeBox", ib_token_in, SAFEBOX_ABI)
-    token_out_safebox = Contract.from_abi("SafeBox", ib_token_out, SAFEBOX_ABI)
-    # deploy contract
-    homora_earn_swap = HomoraIBSwap.deploy(
-        "0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D", "0xeEa3311250FE4c3268F8E684f7C87A82fF183Ec1", {"from": account}
-    )
-    # approve ibtokens
-    homora_earn_swap.addIBTokens([IBUSDT_ADDRESS, IBUSDC_ADDRESS, IBDAI_ADDRESS], {"from": account})
+def swap_check(homora_earn_swap, ib_token_in, ib_token_out, amount_in, account):
+    # load the input safebox through the compiled SafeBox interface
+    token_in_safebox = interface.SafeBox(ib_token_in)
     # estimate expected output token amount from swap
     underlying_amount_in = homora_earn_swap.ibToToken(ib_token_in, amount_in)
-    estimate_amount_out = homora_earn_swap.getEstimatedAmountsOut(ib_token_in, ib_token_out, underlying_amount_in)[1]
+    estimate_amount_out = homora_earn_swap.getEstimatedAmountsOut(ib_token_in, ib_token_out, underlying_amount_in)[-1]
     # perform the swap
-    token_in_safebox.approve(homora_earn_swap.address, 1e36, {"from": account})
+    token_in_safebox.approve(homora_earn_swap, 1e36, {"from": account})
     output = homora_earn_swap.swap(
         ib_token_in,
         ib_token_out,
@@ -317,83 +36,327 @@ def swap_single_check(ib_token_in, ib_token_out, amount_in, account):
         deadline,
         {"from": account},
     )
-    return (homora_earn_swap, token_in_safebox, token_out_safebox, estimate_amount_out, output.return_value)
+    return (estimate_amount_out, output.return_value)
 
 
-def swap_double_check(ib_token_in, ib_token_out, amount_in, account):
-    # set input and output ibtoken contracts
-    token_in_safebox = Contract.from_abi("SafeBox", ib_token_in, SAFEBOX_ABI)
-    token_out_safebox = Contract.from_abi("SafeBox", ib_token_out, SAFEBOX_ABI)
-    # deploy contract
-    homora_earn_swap = HomoraIBSwap.deploy(
-        "0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D", "0xeEa3311250FE4c3268F8E684f7C87A82fF183Ec1", {"from": account}
-    )
-    # approve ibtokens
-    homora_earn_swap.addIBTokens([IBUSDT_ADDRESS, IBUSDC_ADDRESS, IBDAI_ADDRESS], {"from": account})
-    # estimate expected output token amount from swap
-    underlying_amount_in = homora_earn_swap.ibToToken(ib_token_in, amount_in)
-    estimate_amount_out = homora_earn_swap.getEstimatedAmountsOut(ib_token_in, ib_token_out, underlying_amount_in)[2]
-    # perform the swap
-    token_in_safebox.approve(homora_earn_swap.address, 1e36, {"from": account})
-    output = homora_earn_swap.swap(
-        ib_token_in,
-        ib_token_out,
-        amount_in,
-        homora_earn_swap.tokenToIB(ib_token_out, int(estimate_amount_out * 0.9)),
-        deadline,
-        {"from": account},
-    )
-    return (homora_earn_swap, token_in_safebox, token_out_safebox, estimate_amount_out, output.return_value)
-
-
-# swap from ibethv2 vto ibusdtv2
-def test_general_eth_usdt(account):
-    # swap parameters
-    amount_in = 992637183
-    token_in = IBETH_ADDRESS
-    token_out = IBUSDC_ADDRESS
-    # deploy contract and approve input token
-    (homora_earn_swap, _, _, estimate_amount_out, actual_amount_out) = swap_single_check(
-        token_in, token_out, amount_in, account
-    )
+@pytest.mark.parametrize("token_in,token_out,amount_in", SWAP_CASES)
+def test_general(request, account, homora_earn_swap, token_in, token_out, amount_in):
+    token_in = request.getfixturevalue(token_in)
+    token_out = request.getfixturevalue(token_out)
+    (estimate_amount_out, actual_amount_out) = swap_check(homora_earn_swap, token_in, token_out, amount_in, account)
     assert check_expected(actual_amount_out, homora_earn_swap.tokenToIB(token_out, estimate_amount_out), 0.5,)
 
 
-# swap from ibusdtv2 to ibethv2
-def test_general_usdt_eth(account):
-    # swap parameters
+# registry caches the underlying, cyToken and ETH flag of every supported ibToken
+def test_ib_token_registry(homora_earn_swap, weth, ibeth, ibusdt, ibusdc, ibdai):
+    for ib_token in [ibeth, ibusdt, ibusdc, ibdai]:
+        (u_token, is_eth, supported, c_token) = homora_earn_swap.ibTokenInfo(ib_token)
+        assert homora_earn_swap.isIBToken(ib_token)
+        assert supported
+        assert is_eth == (ib_token == ibeth)
+        assert u_token == ib_token.uToken()
+        assert c_token == ib_token.cToken()
+    assert ibeth.uToken() == weth
+    assert not homora_earn_swap.isIBToken(weth)
+
+
+# swap several pairs at once, sharing the ibUSDT withdraw and the ibUSDC deposit
+def test_swap_many(account, homora_earn_swap, ibeth, ibusdt, ibusdc, ibdai):
+    for ib_token in [ibeth, ibusdt]:
+        ib_token.approve(homora_earn_swap, 1e36, {"from": account})
+    usdc_before = ibusdc.balanceOf(account)
+    dai_before = ibdai.balanceOf(account)
+    legs = [
+        (ibusdt, ibusdc, 4e12, 0),
+        (ibusdt, ibdai, 4e12, 0),
+        (ibeth, ibusdc, 992637183, 0),
+    ]
+    amounts_out = homora_earn_swap.swapMany(legs, deadline, {"from": account}).return_value
+    assert all(amount_out > 0 for amount_out in amounts_out)
+    assert ibusdc.balanceOf(account) - usdc_before == amounts_out[0] + amounts_out[2]
+    assert ibdai.balanceOf(account) - dai_before == amounts_out[1]
+    assert ibusdc.balanceOf(homora_earn_swap) == 0
+    assert ibdai.balanceOf(homora_earn_swap) == 0
+
+
+# consolidate a basket of ibtokens into ibusdcv2 with a single deposit and transfer
+def test_consolidate(account, homora_earn_swap, ibeth, ibusdt, ibusdc, ibdai):
+    tokens_in = [ibeth, ibusdt, ibdai]
+    amounts_in = [992637183, 4e12, 2e12]
+    for ib_token in tokens_in:
+        ib_token.approve(homora_earn_swap, 1e36, {"from": account})
+    quotes = [
+        homora_earn_swap.getEstimatedIBAmountsOut(token_in, ibusdc, [amount_in])[0]
+        for token_in, amount_in in zip(tokens_in, amounts_in)
+    ]
+    usdc_before = ibusdc.balanceOf(account)
+    tx = homora_earn_swap.consolidate(tokens_in, amounts_in, ibusdc, 0, deadline, {"from": account})
+    assert ibusdc.balanceOf(account) - usdc_before == tx.return_value
+    # later inputs see the USDC pool already moved by earlier ones
+    assert check_expected(sum(quotes), tx.return_value, 1)
+
+    events = tx.events["Swapped"]
+    assert [event["tokenIn"] for event in events] == tokens_in
+    assert sum(event["amountOut"] for event in events) == tx.return_value
+    for event, token_in, amount_in in zip(events, tokens_in, amounts_in):
+        assert event["underlyingIn"] == homora_earn_swap.ibToToken(token_in, amount_in)
+    # one mint into this contract and one transfer out of it
+    assert len([event for event in tx.events["Transfer"] if event.address == ibusdc]) == 2
+    for ib_token in tokens_in + [ibusdc]:
+        assert ib_token.balanceOf(homora_earn_swap) == 0
+
+
+# swap ibusdtv2 for an exact amount of ibusdcv2, spending only the ibusdtv2 needed
+def test_swap_for_exact_out(account, homora_earn_swap, ibusdt, ibusdc):
+    ibusdt.approve(homora_earn_swap, 1e36, {"from": account})
+    underlying_amount_in = homora_earn_swap.ibToToken(ibusdt, 4e12)
+    estimate_amount_out = homora_earn_swap.getEstimatedAmountsOut(ibusdt, ibusdc, underlying_amount_in)[2]
+    amount_out = homora_earn_swap.tokenToIB(ibusdc, estimate_amount_out)
+    in_before = ibusdt.balanceOf(account)
+    out_before = ibusdc.balanceOf(account)
+    amount_in = homora_earn_swap.swapForExactOut(ibusdt, ibusdc, amount_out, 8e12, deadline, {"from": account}).return_value
+    assert in_before - ibusdt.balanceOf(account) == amount_in
+    assert check_expected(4e12, amount_in, 0.5)
+    assert ibusdc.balanceOf(account) - out_before >= amount_out
+    assert ibusdt.balanceOf(homora_earn_swap) == 0
+    assert ibusdc.balanceOf(homora_earn_swap) == 0
+
+
+# swap carries exact amounts between stages, so tokens already held by the contract are not swept up
+def test_swap_ignores_stray_balances(account, homora_earn_swap, usdt, usdc, ibusdt, ibusdc):
+    usdt.mint(homora_earn_swap, 10 ** 6, {"from": account})
+    usdc.mint(homora_earn_swap, 10 ** 6, {"from": account})
+    ibusdc.transfer(homora_earn_swap, 10 ** 6, {"from": account})
+    ibusdt.approve(homora_earn_swap, 1e36, {"from": account})
+    quote = homora_earn_swap.getEstimatedIBAmountsOut(ibusdt, ibusdc, [10 ** 12])[0]
+    out_before = ibusdc.balanceOf(account)
+    tx = homora_earn_swap.swap(ibusdt, ibusdc, 10 ** 12, 0, deadline, {"from": account})
+    assert tx.return_value == quote
+    assert tx.events["Swapped"]["underlyingIn"] == homora_earn_swap.ibToToken(ibusdt, 10 ** 12)
+    assert ibusdc.balanceOf(account) - out_before == quote
+    assert usdt.balanceOf(homora_earn_swap) == 10 ** 6
+    assert usdc.balanceOf(homora_earn_swap) == 10 ** 6
+    assert ibusdc.balanceOf(homora_earn_swap) == 10 ** 6
+
+
+# stray tokens are not refunded as change by swapForExactOut, and swapMany legs sharing an underlying and
+# consolidate each pay out only what their own swaps produced
+def test_batched_swaps_ignore_stray_balances(account, homora_earn_swap, usdt, usdc, ibeth, ibusdt, ibusdc):
+    usdt.mint(homora_earn_swap, 10 ** 6, {"from": account})
+    usdc.mint(homora_earn_swap, 10 ** 6, {"from": account})
+    ibusdc.transfer(homora_earn_swap, 10 ** 6, {"from": account})
+    for ib_token in [ibeth, ibusdt]:
+        ib_token.approve(homora_earn_swap, 1e36, {"from": account})
+
+    amount_out = homora_earn_swap.getEstimatedIBAmountsOut(ibusdt, ibusdc, [10 ** 12])[0] // 2
+    usdt_before = usdt.balanceOf(account)
+    tx = homora_earn_swap.swapForExactOut(ibusdt, ibusdc, amount_out, 10 ** 12, deadline, {"from": account})
+    change = homora_earn_swap.ibToToken(ibusdt, tx.return_value) - tx.events["Swapped"]["underlyingIn"]
+    assert usdt.balanceOf(account) - usdt_before == change
+
+    legs = [(ibusdt, ibusdc, 10 ** 12, 0), (ibusdt, ibusdc, 2 * 10 ** 12, 0)]
+    out_before = ibusdc.balanceOf(account)
+    tx = homora_earn_swap.swapMany(legs, deadline, {"from": account})
+    assert [event["amountOut"] for event in tx.events["Swapped"]] == tx.return_value
+    assert ibusdc.balanceOf(account) - out_before == sum(tx.return_value)
+
+    out_before = ibusdc.balanceOf(account)
+    tx = homora_earn_swap.consolidate([ibeth, ibusdt], [992637183, 10 ** 12], ibusdc, 0, deadline, {"from": account})
+    assert sum(event["amountOut"] for event in tx.events["Swapped"]) == tx.return_value
+    assert ibusdc.balanceOf(account) - out_before == tx.return_value
+
+    assert usdt.balanceOf(homora_earn_swap) == 10 ** 6
+    assert usdc.balanceOf(homora_earn_swap) == 10 ** 6
+    assert ibusdc.balanceOf(homora_earn_swap) == 10 ** 6
+
+
+# quote ibtoken to ibtoken end to end for a batch of amounts and for every pair
+def test_estimated_ib_amounts_out(homora_earn_swap, ibeth, ibusdt, ibusdc, ibdai):
+    amounts_in = [10 ** 9, 10 ** 12, 8 * 10 ** 12]
+    amounts_out = homora_earn_swap.getEstimatedIBAmountsOut(ibusdt, ibusdc, amounts_in)
+    for amount_in, amount_out in zip(amounts_in, amounts_out):
+        underlying_amount_in = homora_earn_swap.ibToToken(ibusdt, amount_in)
+        estimate_amount_out = homora_earn_swap.getEstimatedAmountsOut(ibusdt, ibusdc, underlying_amount_in)[-1]
+        assert amount_out == homora_earn_swap.tokenToIB(ibusdc, estimate_amount_out)
+
+    ib_tokens = homora_earn_swap.getIBTokens()
+    assert ib_tokens == [ibeth, ibusdt, ibusdc, ibdai]
+    matrix = homora_earn_swap.getEstimatedIBAmountsOutMatrix([10 ** 9] * len(ib_tokens))
+    for idx_in, token_in in enumerate(ib_tokens):
+        for idx_out, token_out in enumerate(ib_tokens):
+            if idx_in == idx_out:
+                assert matrix[idx_in][idx_out] == 0
+            else:
+                assert (
+                    matrix[idx_in][idx_out]
+                    == homora_earn_swap.getEstimatedIBAmountsOut(token_in, token_out, [10 ** 9])[0]
+                )
+
+
+# with a second router registered, swaps and quotes use the better one
+def test_best_router(account, homora_earn_swap, uniswap_router, sushiswap_router, weth, usdt, usdc, ibusdt, ibusdc):
+    homora_earn_swap.addRouter(sushiswap_router, {"from": account})
+    assert homora_earn_swap.getRouters() == [uniswap_router, sushiswap_router]
+
     amount_in = 8e12
-    token_in = IBUSDT_ADDRESS
-    token_out = IBETH_ADDRESS
-    # deploy contract and approve input token
-    (homora_earn_swap, _, _, estimate_amount_out, actual_amount_out) = swap_single_check(
-        token_in, token_out, amount_in, account
-    )
-    assert check_expected(actual_amount_out, homora_earn_swap.tokenToIB(token_out, estimate_amount_out), 0.5,)
+    underlying_amount_in = homora_earn_swap.ibToToken(ibusdt, amount_in)
+    path = [usdt, weth, usdc]
+    quotes = {
+        router: router.getAmountsOut(underlying_amount_in, path)[-1] for router in [uniswap_router, sushiswap_router]
+    }
+    assert quotes[sushiswap_router] > quotes[uniswap_router]
+    assert homora_earn_swap.getEstimatedAmountsOut(ibusdt, ibusdc, underlying_amount_in)[-1] == quotes[sushiswap_router]
 
+    ibusdt.approve(homora_earn_swap, 1e36, {"from": account})
+    tx = homora_earn_swap.swap(ibusdt, ibusdc, amount_in, 0, deadline, {"from": account})
+    assert tx.events["RouteSelected"]["router"] == sushiswap_router
+    assert tx.events["RouteSelected"]["amountOut"] == quotes[sushiswap_router]
 
-# swap from ibusdtv2 to ibusdcv2
-def test_general_usdt_usdc(account):
-    # swap parameters
+    # the reverse direction is better on the default router
+    ibusdc.approve(homora_earn_swap, 1e36, {"from": account})
+    tx = homora_earn_swap.swap(ibusdc, ibusdt, amount_in, 0, deadline, {"from": account})
+    assert tx.events["RouteSelected"]["router"] == uniswap_router
+
+
+# a V3 adapter wins the pairs it has a fee tier for when it beats every V2 route, and V2 stays the fallback
+def test_uniswap_v3_adapter(account, homora_earn_swap, uniswap_router, uniswap_v3_adapter, usdt, usdc, ibeth, ibusdt, ibusdc):
+    homora_earn_swap.addAdapter(uniswap_v3_adapter, {"from": account})
+    assert homora_earn_swap.getAdapters() == [uniswap_v3_adapter]
     amount_in = 8e12
-    token_in = IBUSDT_ADDRESS
-    token_out = IBUSDC_ADDRESS
-    # deploy contract and approve input token
-    (homora_earn_swap, _, _, estimate_amount_out, actual_amount_out) = swap_double_check(
-        token_in, token_out, amount_in, account
-    )
-    assert check_expected(actual_amount_out, homora_earn_swap.tokenToIB(token_out, estimate_amount_out), 0.5,)
+    underlying_amount_in = homora_earn_swap.ibToToken(ibusdt, amount_in)
+    (adapter, adapter_quote) = homora_earn_swap.getBestAdapterAmountOut.call(ibusdt, ibusdc, underlying_amount_in)
+    assert adapter == uniswap_v3_adapter
+    assert adapter_quote > homora_earn_swap.getEstimatedAmountsOut(ibusdt, ibusdc, underlying_amount_in)[-1]
+    # the V2 view is a lower bound, while getBestIBAmountOut quotes what swap returns
+    quote = homora_earn_swap.getBestIBAmountOut.call(ibusdt, ibusdc, amount_in)
+    assert quote > homora_earn_swap.getEstimatedIBAmountsOut(ibusdt, ibusdc, [amount_in])[0]
+
+    for ib_token in [ibeth, ibusdt]:
+        ib_token.approve(homora_earn_swap, 1e36, {"from": account})
+    out_before = ibusdc.balanceOf(account)
+    tx = homora_earn_swap.swap(ibusdt, ibusdc, amount_in, 0, deadline, {"from": account})
+    assert tx.events["RouteSelected"]["router"] == uniswap_v3_adapter
+    assert tx.events["RouteSelected"]["path"] == [usdt, usdc]
+    assert tx.events["RouteSelected"]["amountOut"] == adapter_quote
+    assert ibusdc.balanceOf(account) - out_before == tx.return_value == quote
+    assert usdt.balanceOf(uniswap_v3_adapter) == 0
 
+    # pairs without a fee tier, and ETH pairs, go through the V2 router
+    tx = homora_earn_swap.swap(ibeth, ibusdc, 992637183, 0, deadline, {"from": account})
+    assert tx.events["RouteSelected"]["router"] == uniswap_router
+    uniswap_v3_adapter.setFee(usdt, usdc, 0, {"from": account})
+    tx = homora_earn_swap.swap(ibusdt, ibusdc, amount_in, 0, deadline, {"from": account})
+    assert tx.events["RouteSelected"]["router"] == uniswap_router
 
-# swap ibusdtv2 to ibdaiv2
-def test_general_usdt_dai(account):
-    # swap parameters
+    homora_earn_swap.removeAdapter(uniswap_v3_adapter, {"from": account})
+    assert homora_earn_swap.getAdapters() == []
+
+
+def stable_swap_d(balances, rates, amp):
+    """The StableSwap invariant D of pool balances, as computed by Curve's get_D."""
+    xp = [balance * rate // 10 ** 18 for balance, rate in zip(balances, rates)]
+    (n_coins, total) = (len(xp), sum(xp))
+    (d, ann) = (total, amp * n_coins)
+    for _ in range(255):
+        d_p = d
+        for x in xp:
+            d_p = d_p * d // (x * n_coins)
+        (d_prev, d) = (d, (ann * total + d_p * n_coins) * d // ((ann - 1) * d + (n_coins + 1) * d_p))
+        if abs(d - d_prev) <= 1:
+            break
+    return d
+
+
+# stablecoin pairs go through the stable-swap pool at close to 1:1, between the usual withdraw and deposit
+def test_stable_swap_adapter(account, homora_earn_swap, stable_swap_adapter, usdt, dai, ibusdt, ibdai):
+    homora_earn_swap.addAdapter(stable_swap_adapter, {"from": account})
+    pool = MockStableSwapPool.at(stable_swap_adapter.pool())
     amount_in = 8e12
-    token_in = IBUSDT_ADDRESS
-    token_out = IBDAI_ADDRESS
-    # deploy contract and approve input token
-    (homora_earn_swap, _, _, estimate_amount_out, actual_amount_out) = swap_double_check(
-        token_in, token_out, amount_in, account
-    )
-    assert check_expected(actual_amount_out, homora_earn_swap.tokenToIB(token_out, estimate_amount_out), 0.5,)
+    underlying_amount_in = homora_earn_swap.ibToToken(ibusdt, amount_in)
+    quote = stable_swap_adapter.getAmountOut(usdt, dai, underlying_amount_in)
+    assert check_expected(underlying_amount_in * 10 ** 12, quote, 0.1)
+    assert quote > homora_earn_swap.getEstimatedAmountsOut(ibusdt, ibdai, underlying_amount_in)[-1]
+
+    balances_before = [pool.balances(idx) for idx in range(3)]
+    ibusdt.approve(homora_earn_swap, 1e36, {"from": account})
+    tx = homora_earn_swap.swap(ibusdt, ibdai, amount_in, 0, deadline, {"from": account})
+    assert tx.events["RouteSelected"]["router"] == stable_swap_adapter
+    assert tx.events["RouteSelected"]["amountOut"] == quote
+    assert tx.events["Swapped"]["underlyingOut"] == quote
+    assert tx.return_value == homora_earn_swap.tokenToIB(ibdai, quote)
+    assert dai.balanceOf(stable_swap_adapter) == 0
+
+    # the swap moved the pool along its invariant, which grows only by the fee kept in the pool
+    balances_after = [pool.balances(idx) for idx in range(3)]
+    rates = [pool.rates(idx) for idx in range(3)]
+    d_before = stable_swap_d(balances_before, rates, pool.A())
+    d_after = stable_swap_d(balances_after, rates, pool.A())
+    assert d_before < d_after <= d_before + 2 * quote * pool.fee() // 10 ** 10
+
+
+# a governance-set direct usdt/usdc path replaces the route through weth until cleared
+def test_custom_path(account, homora_earn_swap, uniswap_router, usdt, usdc, ibusdt, ibusdc):
+    direct_path = [usdt, usdc]
+    homora_earn_swap.setPath(ibusdt, ibusdc, direct_path, {"from": account})
+    assert homora_earn_swap.getPath(ibusdt, ibusdc) == direct_path
+    # the reverse direction keeps the default routing
+    assert len(homora_earn_swap.getPath(ibusdc, ibusdt)) == 3
 
+    amount_in = 8e12
+    underlying_amount_in = homora_earn_swap.ibToToken(ibusdt, amount_in)
+    estimate = homora_earn_swap.getEstimatedAmountsOut(ibusdt, ibusdc, underlying_amount_in)
+    assert estimate == uniswap_router.getAmountsOut(underlying_amount_in, direct_path)
+
+    ibusdt.approve(homora_earn_swap, 1e36, {"from": account})
+    tx = homora_earn_swap.swap(ibusdt, ibusdc, amount_in, 0, deadline, {"from": account})
+    assert tx.events["RouteSelected"]["path"] == direct_path
+    assert check_expected(tx.return_value, homora_earn_swap.tokenToIB(ibusdc, estimate[-1]), 0.5)
+
+    homora_earn_swap.setPath(ibusdt, ibusdc, [], {"from": account})
+    assert len(homora_earn_swap.getPath(ibusdt, ibusdc)) == 3
+
+
+# zap raw usdt, raw usdt into its own safebox, and native eth into ibtokens
+@pytest.mark.parametrize(
+    "token_in,token_out,amount_in", [("usdt", "ibusdc", 10 ** 9), ("usdt", "ibusdt", 10 ** 9), ("weth", "ibdai", 10 ** 18)]
+)
+def test_zap_in(request, account, homora_earn_swap, weth, token_in, token_out, amount_in):
+    token_in = request.getfixturevalue(token_in)
+    token_out = request.getfixturevalue(token_out)
+    tx_params = {"from": account}
+    if token_in == weth:
+        tx_params["value"] = amount_in
+    else:
+        token_in.mint(account, amount_in, {"from": account})
+        token_in.approve(homora_earn_swap, amount_in, {"from": account})
+    ib_token_in = homora_earn_swap.ibTokenOf(token_in)
+    underlying_out = amount_in
+    if ib_token_in != token_out:
+        underlying_out = homora_earn_swap.getEstimatedAmountsOut(ib_token_in, token_out, amount_in)[-1]
+    out_before = token_out.balanceOf(account)
+    amount_out = homora_earn_swap.zapIn(token_in, token_out, amount_in, 0, deadline, tx_params).return_value
+    assert amount_out == homora_earn_swap.tokenToIB(token_out, underlying_out)
+    assert token_out.balanceOf(account) - out_before == amount_out
+    assert token_out.balanceOf(homora_earn_swap) == 0
+    assert homora_earn_swap.balance() == 0
+
+
+# zap ibtokens out to raw usdc, native eth and their own underlying
+@pytest.mark.parametrize(
+    "token_in,token_out,amount_in", [("ibusdt", "usdc", 10 ** 12), ("ibusdt", "weth", 10 ** 12), ("ibeth", "weth", 10 ** 9)]
+)
+def test_zap_out(request, account, homora_earn_swap, weth, token_in, token_out, amount_in):
+    token_in = request.getfixturevalue(token_in)
+    token_out = request.getfixturevalue(token_out)
+    token_in.approve(homora_earn_swap, amount_in, {"from": account})
+    ib_token_out = homora_earn_swap.ibTokenOf(token_out)
+    expected = homora_earn_swap.ibToToken(token_in, amount_in)
+    if token_in != ib_token_out:
+        expected = homora_earn_swap.getEstimatedAmountsOut(token_in, ib_token_out, expected)[-1]
+    # native eth is received by the account itself, net of gas
+    before = account.balance() if token_out == weth else token_out.balanceOf(account)
+    tx = homora_earn_swap.zapOut(token_in, token_out, amount_in, expected, deadline, {"from": account})
+    after = account.balance() + tx.gas_used * tx.gas_price if token_out == weth else token_out.balanceOf(account)
+    assert tx.return_value == expected
+    assert after - before == expected
+    assert homora_earn_swap.balance() == 0
@@ -0,0 +1,59 @@
+from scripts.trace_profiler import TraceProfile, build_frames, profile_transactions
+
+from conftest import deadline
+
+
+def step(depth, gas, gas_cost=3, contract_name=None):
+    return {"depth": depth, "gas": gas, "gasCost": gas_cost, "contractName": contract_name}
+
+
+# inclusive gas runs from the CALL opcode to the return to the caller's depth
+def test_build_frames():
+    steps = [
+        step(1, 1000),
+        step(1, 990),
+        step(2, 900, contract_name="MockSafeBox"),
+        step(3, 800, contract_name="MockCyToken"),
+        step(3, 700, contract_name="MockCyToken"),
+        step(2, 650, contract_name="MockSafeBox"),
+        step(1, 600),
+        step(1, 500, gas_cost=10),
+    ]
+    subcalls = [{"function": "withdraw(uint256)"}, {"function": "redeem(uint256)"}]
+    root = build_frames(steps, subcalls, "HomoraIBSwap", "swap")
+    assert root.gas == 510
+    (withdraw,) = root.children
+    assert (withdraw.name, withdraw.gas) == ("MockSafeBox.withdraw", 390)
+    (redeem,) = withdraw.children
+    assert (redeem.name, redeem.gas) == ("MockCyToken.redeem", 250)
+    assert withdraw.self_gas == 140
+
+    profile = TraceProfile()
+    profile.add_frames(root, 21510)
+    assert profile.stage_gas == {"overhead": 21000, "logic": 120, "withdraw": 390}
+    assert profile.stage_calls == {"withdraw": 2}
+    assert profile.folded["HomoraIBSwap.swap;withdraw;MockSafeBox.withdraw;MockCyToken.redeem"] == 250
+
+
+# every unit of gas of a swap lands in exactly one stage, and the pipeline stages all show up
+def test_profile_swaps(account, homora_earn_swap, ibeth, ibusdt, ibusdc, tmp_path):
+    for ib_token in [ibeth, ibusdt]:
+        ib_token.approve(homora_earn_swap, 1e36, {"from": account})
+    txs = [
+        homora_earn_swap.swap(ibusdt, ibusdc, 8e12, 0, deadline, {"from": account}),
+        homora_earn_swap.swap(ibeth, ibusdc, 992637183, 0, deadline, {"from": account}),
+    ]
+    profile = profile_transactions(txs)
+    assert profile.transactions == 2
+    assert sum(profile.stage_gas.values()) == sum(tx.gas_used for tx in txs)
+    for stage in ["pull", "withdraw", "swap", "deposit", "transfer"]:
+        assert profile.stage_gas[stage] > 0
+        assert profile.stage_calls[stage] >= 2
+    assert sum(profile.contract_gas.values()) == profile.gas_used - profile.stage_gas["overhead"]
+    assert "withdraw" in profile.report()
+
+    path = tmp_path / "swap.folded"
+    profile.write_folded(path)
+    lines = path.read_text().splitlines()
+    assert all(line.startswith("HomoraIBSwap.swap;") for line in lines)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in lines) == sum(gas for gas in profile.folded.values() if gas > 0)
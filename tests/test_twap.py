@@ -0,0 +1,88 @@
+import brownie
+from brownie import chain
+
+from scripts.twap_keeper import TWAPKeeper
+
+INTERVAL = 3600
+# a minimum rate every slice in these tests beats, in either direction between ibUSDT and ibUSDC
+MIN_RATE = 9 * 10 ** 17
+
+
+# a keeper executes one slice per interval and keeps each slice's bounty, the last slice taking the remainder
+def test_keeper_executes_slices_over_time(account, twap, ibusdt, ibusdc):
+    keeper_account = brownie.accounts[6]
+    ibusdt.approve(twap, 1e36, {"from": account})
+    twap.createOrder(ibusdt, ibusdc, 4 * 10 ** 12 + 3, 4, INTERVAL, MIN_RATE, 30, {"from": account})
+    keeper = TWAPKeeper(twap, keeper_account, chain.time)
+    (owner_before, keeper_before) = (ibusdc.balanceOf(account), ibusdc.balanceOf(keeper_account))
+
+    events = []
+    for slice_idx in range(4):
+        if slice_idx > 0:
+            # the next slice is not due before the interval has passed
+            assert keeper.tick() == []
+            chain.sleep(INTERVAL + 1)
+        (tx,) = keeper.tick()
+        event = tx.events["SliceExecuted"]
+        swapped = tx.events["Swapped"]["amountOut"]
+        assert event["keeper"] == keeper_account
+        assert event["slicesLeft"] == 3 - slice_idx
+        assert event["bounty"] == swapped * 30 // 10000
+        assert event["amountOut"] + event["bounty"] == swapped
+        events.append(event)
+
+    assert [event["amountIn"] for event in events] == [10 ** 12] * 3 + [10 ** 12 + 3]
+    assert ibusdc.balanceOf(account) - owner_before == sum(event["amountOut"] for event in events)
+    assert ibusdc.balanceOf(keeper_account) - keeper_before == sum(event["bounty"] for event in events)
+    assert ibusdt.balanceOf(twap) == 0
+    assert ibusdc.balanceOf(twap) == 0
+    assert twap.orders(0)[0] == brownie.ZERO_ADDRESS
+    assert keeper.metrics() == {"open_orders": 0, "transactions": 4, "executed": 4, "skipped": 0}
+
+
+# due orders share executeSlices transactions; slices below their minimum rate are skipped and retried until
+# the order is cancelled, and cancelled orders are dropped
+def test_keeper_batches_due_orders(account, twap, ibusdt, ibusdc):
+    trader = brownie.accounts[5]
+    ibusdc.transfer(trader, 2 * 10 ** 12, {"from": account})
+    ibusdt.approve(twap, 1e36, {"from": account})
+    ibusdc.approve(twap, 1e36, {"from": trader})
+    twap.createOrder(ibusdt, ibusdc, 2 * 10 ** 12, 2, INTERVAL, MIN_RATE, 10, {"from": account})
+    twap.createOrder(ibusdc, ibusdt, 2 * 10 ** 12, 2, 2 * INTERVAL, MIN_RATE, 10, {"from": trader})
+    # no slice can get 100 ibUSDC per ibUSDT
+    twap.createOrder(ibusdt, ibusdc, 2 * 10 ** 12, 2, INTERVAL, 100 * 10 ** 18, 10, {"from": account})
+    twap.createOrder(ibusdt, ibusdc, 10 ** 12, 1, INTERVAL, MIN_RATE, 0, {"from": account})
+    twap.cancelOrder(3, {"from": account})
+    keeper = TWAPKeeper(twap, brownie.accounts[6], chain.time, batch_size=2)
+
+    txs = keeper.tick()
+    assert [tx.return_value for tx in txs] == [2, 0]
+    assert [event["orderId"] for event in txs[0].events["SliceExecuted"]] == [0, 1]
+    assert keeper.metrics() == {"open_orders": 3, "transactions": 2, "executed": 2, "skipped": 1}
+    assert twap.orders(2)[4] == 2 * 10 ** 12
+
+    chain.sleep(INTERVAL + 1)
+    (tx,) = keeper.tick()
+    assert tx.return_value == 1
+    assert tx.events["SliceExecuted"]["orderId"] == 0
+    assert keeper.metrics() == {"open_orders": 2, "transactions": 3, "executed": 3, "skipped": 2}
+
+    before = ibusdt.balanceOf(account)
+    twap.cancelOrder(2, {"from": account})
+    assert ibusdt.balanceOf(account) - before == 2 * 10 ** 12
+    chain.sleep(INTERVAL + 1)
+    (tx,) = keeper.tick()
+    assert tx.events["SliceExecuted"]["orderId"] == 1
+    assert keeper.metrics() == {"open_orders": 0, "transactions": 4, "executed": 4, "skipped": 3}
+    assert ibusdt.balanceOf(twap) == 0
+    assert ibusdc.balanceOf(twap) == 0
+
+
+# the keeper loop warps through every interval when it sleeps on chain time
+def test_keeper_run(account, twap, ibusdt, ibusdc):
+    ibusdt.approve(twap, 1e36, {"from": account})
+    twap.createOrder(ibusdt, ibusdc, 3 * 10 ** 12, 3, INTERVAL, MIN_RATE, 0, {"from": account})
+    keeper = TWAPKeeper(twap, brownie.accounts[6], chain.time)
+    keeper.run(INTERVAL + 1, ticks=3, sleep=chain.sleep)
+    assert keeper.metrics()["executed"] == 3
+    assert twap.orders(0)[0] == brownie.ZERO_ADDRESS